@@ -34,11 +34,18 @@ As usual, a data entry looks like:
 """
 
 import argparse
-import json
 import os
+import data_store
+import metrics
+import rankings
+import render_cache
+import sentiment_cache
+import sentiment_engine
+import term_matrix
+import token_counter
+import video_query
 import wordcloud_helper
-from collections import OrderedDict
-from nltk.sentiment.vader import SentimentIntensityAnalyzer
+from collections import Counter, OrderedDict
 
 
 #############
@@ -50,48 +57,10 @@ POSITIVE_THRESHOLD = 0.3
 NEGATIVE_THRESHOLD = -0.3
 
 
-##########
-# Scores #
-##########
-def video_score(views, likes, dislikes, num_comments):
-    """
-    Computes an artificial score for a video indicating the video's popularity.
-
-    The current formula in use is:
-    views + (likes * 10) - (dislikes * 10) + (num_comments * 10)
-
-    :param views: int, number of views on a video
-    :param likes: int, number of likes on a video
-    :param dislikes: int, number of dislikes on a video
-    :param num_comments: int, number of comments on the video
-    :return: float, comment score
-    """
-    return views + (likes * 10) - (dislikes * 10) + (num_comments * 10)
-
-
-def comment_score(likes, replies):
-    """
-    Computes an artificial score for a comment indicating its rank.
-    Note that the dataset does not include dislikes, only likes and replies.
-
-    The current formula in use is:
-    (likes * 2) + num_replies
-
-    :param likes: int, number of likes on a comment
-    :param replies: int, number of replies on a comment
-    :return: int, comment score
-    """
-    return (likes * 2) + replies
-
-
 ########
 # Flow #
 ########
-def run(input_path, output_path, category_id):
-    # load data
-    with open(input_path, "r") as data_file:
-        data_entries = json.load(data_file)
-
+def run(input_path, output_path, category_id, cache=None, jobs=1, wordcloud_cache=None, filters=None):
     # open output file
     output_file_name = os.path.join(output_path, category_id + "-" + "output.txt")
     output_file = open(output_file_name, "w")
@@ -100,22 +69,41 @@ def run(input_path, output_path, category_id):
     positive_comments = []
     negative_comments = []
 
-    # filter by category
-    data_entries = {k: v for (k, v) in data_entries.items() if v["category_id"] == category_id}
-    # get top videos
-    top_videos = filter_top_videos(data_entries, NUM_VIDEOS)
+    # get the top videos, and the top comments for each of them
+    video_ids = video_query.select_videos(input_path, filters, category_id=category_id)
+    index_rankings = data_store.load_rankings(input_path)
+    if index_rankings is not None and index_rankings["depth"] >= NUM_COMMENTS:
+        # precomputed by extract.py --rankings, only the top videos have to be read
+        selected = set(video_ids)
+        top_video_ids = [video_id for video_id in index_rankings["videos"].get(category_id, [])
+                         if video_id in selected][:NUM_VIDEOS]
+        top_videos = OrderedDict(data_store.load_video_entries(input_path, top_video_ids))
+        top_indices = [index_rankings["comments"][video_id][:NUM_COMMENTS] for video_id in top_videos]
+    else:
+        # load the videos of this category
+        data_entries = data_store.load_video_entries(input_path, video_ids)
+        top_videos = filter_top_videos(data_entries, NUM_VIDEOS)
+        top_indices = [rankings.top_comment_indices(top_videos[video_id]["comments"], NUM_COMMENTS)
+                       for video_id in top_videos]
+    top_comments = [[top_videos[video_id]["comments"][i] for i in indices]
+                    for (video_id, indices) in zip(top_videos, top_indices)]
+
+    # compute all of the sentiment scores at once
+    all_top_comments = [comment for comments in top_comments for comment in comments]
+    all_sentiment_entries = stored_sentiment_entries(all_top_comments)
+    if all_sentiment_entries is None:
+        all_sentiment_entries = compute_sentiment_entries([comment["comment_text"] for comment in all_top_comments],
+                                                          cache, jobs)
 
     # iterate over each of the top videos
-    for video_id in top_videos:
+    start = 0
+    for video_id, video_top_comments in zip(top_videos, top_comments):
         print("Processing: %s" % video_id)
-
-        # get the top comments for the video
         entry = top_videos[video_id]
-        video_comments = entry["comments"]
-        video_top_comments = filter_top_comments(video_comments, NUM_COMMENTS)
 
-        # compute the sentiment scores for each comment
-        sentiment_entries = compute_sentiment_entries(video_top_comments)
+        # the sentiment scores for each comment
+        sentiment_entries = all_sentiment_entries[start:start + len(video_top_comments)]
+        start += len(video_top_comments)
 
         # sort the sentiment scores
         sentiment_entries = sorted(sentiment_entries, reverse=True, key=lambda score: score[1]["compound"])
@@ -131,9 +119,10 @@ def run(input_path, output_path, category_id):
             comment = sentiment_entry[0]
             score = sentiment_entry[1]
 
-            if score["compound"] > POSITIVE_THRESHOLD:
+            label = sentiment_label(score["compound"])
+            if label == "positive":
                 positive_comments.append(comment)
-            elif score["compound"] < NEGATIVE_THRESHOLD:
+            elif label == "negative":
                 negative_comments.append(comment)
 
             output_file.write(comment + "\n")
@@ -143,74 +132,109 @@ def run(input_path, output_path, category_id):
     # post processing - generate wordclouds
     print("Generating wordclouds")
 
-    positive_wc_text = " ".join(positive_comments)
+    matrix = term_matrix.load_matrix(input_path)
+    if matrix is not None:
+        # the same comments, as rows of the term matrix
+        rows = [row for (video_id, indices) in zip(top_videos, top_indices)
+                for row in matrix.video_rows([video_id])[indices]]
+        labels = [sentiment_label(score["compound"]) for (comment, score) in all_sentiment_entries]
+        counts = matrix.group_counts(rows, labels)
+        positive_wc_counts = counts.get("positive", Counter())
+        negative_wc_counts = counts.get("negative", Counter())
+    else:
+        positive_wc_counts = token_counter.count_tokens(positive_comments)
+        negative_wc_counts = token_counter.count_tokens(negative_comments)
     positive_wc_name = category_id + "-" + "positive"
-    wordcloud_helper.generate_wordcloud(positive_wc_text, positive_wc_name, output_path)
-
-    negative_wc_text = " ".join(negative_comments)
     negative_wc_name = category_id + "-" + "negative"
-    wordcloud_helper.generate_wordcloud(negative_wc_text, negative_wc_name, output_path)
+
+    # both are rendered at once, in jobs processes
+    wordcloud_helper.generate_wordclouds_from_counts([(positive_wc_counts, positive_wc_name, output_path),
+                                                      (negative_wc_counts, negative_wc_name, output_path)], jobs,
+                                                     cache=wordcloud_cache)
 
     output_file.close()
     print("Done")
 
 
+def sentiment_label(compound):
+    """
+    :param compound: float, compound sentiment score of a comment
+    :return: string, "positive" or "negative", or None if the comment is neither
+    """
+    if compound > POSITIVE_THRESHOLD:
+        return "positive"
+    elif compound < NEGATIVE_THRESHOLD:
+        return "negative"
+    return None
+
+
 def filter_top_videos(data_entries, num_videos):
     """
-    Get the top videos from the data entries. Videos are scored according to the video_score() function.
+    Get the top videos from the data entries. Videos are scored according to the rankings.video_score() function.
 
     :param data_entries: dict, of {video id: video data}
     :param num_videos: int, number of videos to return
     :return: dict, of {video id: video data}, of size num_videos
     """
-    ordered = sorted(data_entries.items(), reverse=True,
-                     key=lambda k: video_score(int(k[1]["views"]), int(k[1]["likes"]),
-                                               int(k[1]["dislikes"]), len(k[1]["comments"])))[:num_videos]
-    top_videos = OrderedDict(ordered)
+    top_video_ids = rankings.top_videos(data_entries, num_videos)
+    top_videos = OrderedDict((video_id, data_entries[video_id]) for video_id in top_video_ids)
     return top_videos
 
 
-def filter_top_comments(comments, num_comments):
-    """
-    Get the top comments from a list of comments. Videos are scored according to the comment_score() function.
-
-    :param comments: list of comment entries
-    :param num_comments: int, number of comments to return
-    :return: list of strings, each element representing a sentence from a comment
-    """
-    ordered_comments = sorted(comments, reverse=True,
-                              key=lambda pair: comment_score(int(pair["likes"]), int(pair["replies"])))[
-                       :num_comments]
-    comment_list = list(map(lambda c: c["comment_text"], ordered_comments))
-    return comment_list
-
-
-def compute_sentiment_entries(comment_sentences):
+def compute_sentiment_entries(comment_sentences, cache=None, jobs=1):
     """
     Compute sentiment scores for each sentence in comment_sentences.
     Uses NLTK/Vader, which returns a structure of {"compound": score, "pos": score, "neg": score, "neu": score}.
     Returns a list of tuples, (sentence, sentiment score dict).
 
     :param comment_sentences: list of strings
+    :param cache: sentiment_cache.SentimentCache, or None
+    :param jobs: int, number of processes used to compute the scores
     :return: list of tuples, (sentence, sentiment score dict)
     """
-    all_sentiment_scores = []
-    sid = SentimentIntensityAnalyzer()
-    for sentence in comment_sentences:
-        ss = sid.polarity_scores(sentence)
-        all_sentiment_scores.append((sentence, ss))
-    return all_sentiment_scores
+    scores = sentiment_engine.score_comments(comment_sentences, split_sentences=False, jobs=jobs, cache=cache)
+    return [(sentence, scores.comment_scores(i)) for (i, sentence) in enumerate(comment_sentences)]
+
+
+def stored_sentiment_entries(comments):
+    """
+    Same as compute_sentiment_entries(), but reads the scores stored by extract.py --sentiment.
+
+    :param comments: list of comment entries
+    :return: list of tuples, (sentence, sentiment score dict), or None if the comments have no stored scores
+    """
+    scores = sentiment_engine.stored_scores(comments, split_sentences=False)
+    if scores is None:
+        return None
+    return [(comment["comment_text"], scores.comment_scores(i)) for (i, comment) in enumerate(comments)]
 
 
 ########
 # MAIN #
 ########
-if __name__ == "__main__":
-    # Command line parsing
+def build_parser():
+    """
+    :return: argparse.ArgumentParser, for the command line flags of this script
+    """
     parser = argparse.ArgumentParser(description="Preprocess CSV files")
     parser.add_argument("-i", "--input", help="Specify the input file to use", required=True)
     parser.add_argument("-o", "--output", help="Specify the output directory to use", required=True)
     parser.add_argument("-c", "--cat", help="Specify a category id", required=True)
-    args = parser.parse_args()
+    parser.add_argument("--cache", help="SQLite file used to cache sentiment scores between runs", required=False)
+    parser.add_argument("-j", "--jobs", help="Number of processes used to compute sentiment scores and render the "
+                                             "wordclouds", type=int, default=1)
+    video_query.add_arguments(parser)
+    render_cache.add_arguments(parser)
+    metrics.add_arguments(parser)
+    return parser
 
-    run(args.input, args.output, args.cat)
+
+def main(args):
+    with metrics.run("analysis", args.metrics, args.profile, vars(args)), \
+            sentiment_cache.open_cache(args.cache) as scores_cache:
+        run(args.input, args.output, args.cat, scores_cache, args.jobs, render_cache.from_arguments(args),
+            video_query.filters_from_arguments(args))
+
+
+if __name__ == "__main__":
+    main(build_parser().parse_args())
@@ -0,0 +1,220 @@
+"""
+benchmark.py
+
+End-to-end benchmark: times every stage of the pipeline on a dataset, and writes the results as json so that runs
+can be compared across commits.
+
+Stages:
+- extract: parse and preprocess the csv files (extract.preprocess)
+- write / load: write the preprocessed data with data_store, and load it back
+- tokens: count the tokens of every comment (token_counter)
+- sentiment: score the comments with VADER (sentiment_engine), at most --sentiment-limit of them
+- rankings: top-K videos of every category and top-K comments of every video (rankings)
+- wordcloud: render one wordcloud from the token counts of every comment
+
+Usage:
+python3 main/generate_data.py -o bench --comments 1000000
+python3 main/benchmark.py -d bench -o bench/results.json -j 4
+python3 main/benchmark.py -d bench -o bench/results-new.json -j 4 --compare bench/results.json
+
+With --compare, the exit status is 1 if a stage got slower than the tolerance allows.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import data_store
+import extract
+import generate_data
+import metrics
+import rankings
+import sentiment_engine
+import token_counter
+import wordcloud_helper
+
+STAGES = ("extract", "write", "load", "tokens", "sentiment", "rankings", "wordcloud")
+SENTIMENT_LIMIT = 100000
+# number of top videos / comments, like analysis.py
+TOP_VIDEOS = 20
+TOP_COMMENTS = 30
+# a stage is considered slower when it takes more than (1 + TOLERANCE) times as long as in the compared results
+TOLERANCE = 0.25
+
+
+def git_commit():
+    """
+    :return: string, the commit the code is at, or None if it is not known
+    """
+    main_dir = os.path.dirname(os.path.abspath(__file__))
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=main_dir, stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, universal_newlines=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def timed(stages, name, items, function, *args):
+    """
+    Run function(*args) and record how long it took in stages.
+
+    :param stages: dictionary of {stage name: results}, updated in place
+    :param name: string, stage name
+    :param items: int, number of items (comments, videos) processed by the stage
+    :param function: the stage
+    :return: the result of function
+    """
+    start = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - start
+    stages[name] = {"seconds": elapsed, "items": items}
+    return result
+
+
+def rank_everything(data_entries):
+    """
+    The top-K queries of analysis.py, for every category.
+
+    :param data_entries: dictionary of data entries
+    :return: dictionary of {video_id: list of top comment indices}, for the top videos of every category
+    """
+    categories = {}
+    for video_id in data_entries:
+        categories.setdefault(data_entries[video_id]["category_id"], {})[video_id] = data_entries[video_id]
+    top_comments = {}
+    for category_entries in categories.values():
+        for video_id in rankings.top_videos(category_entries, TOP_VIDEOS):
+            top_comments[video_id] = rankings.top_comment_indices(category_entries[video_id]["comments"],
+                                                                  TOP_COMMENTS)
+    return top_comments
+
+
+def load_everything(path):
+    """
+    :param path: string, preprocessed data
+    :return: int, number of comments loaded
+    """
+    # go over every comment, so that the columnar store (which only decodes a comment when it is accessed) decodes
+    # them all, like the json file
+    return sum(1 for entry in data_store.load_data(path).values() for comment in entry["comments"])
+
+
+def run_benchmark(data_dir, data_set="US", jobs=1, data_format="json", sentiment_limit=SENTIMENT_LIMIT,
+                  stages=STAGES):
+    """
+    :param data_dir: string, directory holding the data directory of the dataset (like the working directory of
+                     extract.py)
+    :param data_set: string, US or GB
+    :param jobs: int, number of processes for the stages that can use several
+    :param data_format: string, one of data_store.FORMATS
+    :param sentiment_limit: int, maximum number of comments scored in the sentiment stage
+    :param stages: list of strings, the STAGES to run (extract always runs, the others need its output)
+    :return: dictionary, the results
+    """
+    input_dir = os.path.join(data_dir, extract.DATA_DIR)
+    comments_csv = os.path.join(input_dir, data_set + "comments.csv")
+    videos_csv = os.path.join(input_dir, data_set + "videos.csv")
+    categories_json = os.path.join(input_dir, data_set + "_category_id.json")
+
+    results = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "jobs": jobs,
+        "format": data_format,
+        "dataset": {"set": data_set, "comments_bytes": os.path.getsize(comments_csv),
+                    "videos_bytes": os.path.getsize(videos_csv)},
+    }
+    timings = {}
+
+    data = timed(timings, "extract", 0, extract.preprocess, comments_csv, videos_csv, categories_json, jobs)
+    texts = [comment["comment_text"] for entry in data.values() for comment in entry["comments"]]
+    timings["extract"]["items"] = len(texts)
+    results["dataset"]["videos"] = len(data)
+    results["dataset"]["comments"] = len(texts)
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        if "write" in stages or "load" in stages:
+            path = os.path.join(output_dir, "data.json" if data_format == "json" else "store")
+            timed(timings, "write", len(texts), data_store.write_data, data, path, data_format)
+            if "load" in stages:
+                timed(timings, "load", len(texts), load_everything, path)
+        counts = None
+        if "tokens" in stages or "wordcloud" in stages:
+            counts = timed(timings, "tokens", len(texts), token_counter.count_tokens, texts)
+        if "sentiment" in stages:
+            sample = texts[:sentiment_limit]
+            timed(timings, "sentiment", len(sample), sentiment_engine.score_comments, sample, True, jobs)
+        if "rankings" in stages:
+            timed(timings, "rankings", len(texts), rank_everything, data)
+        if "wordcloud" in stages:
+            timed(timings, "wordcloud", len(counts), wordcloud_helper.generate_wordcloud_from_counts, counts,
+                  "benchmark", output_dir)
+
+    results["stages"] = {name: timings[name] for name in STAGES if name in timings}
+    for name, stage in results["stages"].items():
+        stage["items_per_second"] = stage["items"] / stage["seconds"] if stage["seconds"] > 0 else None
+        print("%-10s %8.3fs  %d items" % (name, stage["seconds"], stage["items"]))
+    results["max_rss_mb"] = metrics.peak_rss_mb()
+    return results
+
+
+def compare(results, previous, tolerance=TOLERANCE):
+    """
+    Print how every stage compares to the previous results.
+
+    :param results: dictionary, from run_benchmark()
+    :param previous: dictionary, from run_benchmark()
+    :param tolerance: float
+    :return: list of strings, the stages that got slower than the tolerance allows
+    """
+    slower = []
+    print("compared to %s:" % (previous.get("commit") or "previous results"))
+    for name, stage in results["stages"].items():
+        if name not in previous.get("stages", {}):
+            continue
+        ratio = stage["seconds"] / max(previous["stages"][name]["seconds"], 1e-9)
+        regressed = ratio > 1 + tolerance
+        if regressed:
+            slower.append(name)
+        print("%-10s %6.2fx%s" % (name, ratio, "  SLOWER" if regressed else ""))
+    return slower
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time every stage of the pipeline")
+    parser.add_argument("-d", "--data", help="Directory holding the data directory of the dataset", required=True)
+    parser.add_argument("-s", "--set", help="Specify the data set to use", choices=("US", "GB"), default="US")
+    parser.add_argument("-o", "--output", help="Write the results to this .json file", required=False)
+    parser.add_argument("-j", "--jobs", help="Number of processes", type=int, default=1)
+    parser.add_argument("-f", "--format", help="Format of the preprocessed data", choices=data_store.FORMATS,
+                        default="json")
+    parser.add_argument("--stages", help="Stages to run", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--sentiment-limit", help="Maximum number of comments scored", type=int,
+                        default=SENTIMENT_LIMIT)
+    parser.add_argument("--comments", help="Generate a dataset of this many comments first, if there is none",
+                        type=int, required=False)
+    parser.add_argument("--compare", help="Results of an earlier run to compare to", required=False)
+    parser.add_argument("--tolerance", help="Allowed slowdown when comparing, as a fraction", type=float,
+                        default=TOLERANCE)
+    args = parser.parse_args()
+
+    if args.comments is not None and not os.path.exists(os.path.join(args.data, extract.DATA_DIR)):
+        generate_data.generate(args.data, args.set, max(args.comments // 500, 10), args.comments)
+
+    benchmark_results = run_benchmark(args.data, args.set, args.jobs, args.format, args.sentiment_limit, args.stages)
+    if args.output is not None:
+        with open(args.output, "w") as output_file:
+            json.dump(benchmark_results, output_file, indent=2)
+
+    if args.compare is not None:
+        with open(args.compare, "r") as compare_file:
+            if compare(benchmark_results, json.load(compare_file), args.tolerance):
+                sys.exit(1)
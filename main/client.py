@@ -0,0 +1,86 @@
+"""
+client.py
+
+Thin client of service.py: runs one of the scripts in the service, with the same command line flags, e.g.
+
+python3 main/client.py analysis -i output/preprocUS.json -o output/analysisUS -c 24
+
+Every request carries the token that the service writes to its token file when it starts (readable by the user only),
+the service rejects the requests without it.
+
+Only the standard library is imported here, so that starting the client is fast.
+"""
+
+import json
+import os
+import sys
+import urllib.error
+import urllib.request
+
+DEFAULT_SERVER = "http://127.0.0.1:8765"
+# environment variable that overrides DEFAULT_SERVER
+SERVER_VARIABLE = "NLP_FUN_SERVER"
+DEFAULT_TOKEN_FILE = os.path.join(os.path.expanduser("~"), ".nlp_fun_service_token")
+# environment variable that overrides DEFAULT_TOKEN_FILE
+TOKEN_FILE_VARIABLE = "NLP_FUN_TOKEN_FILE"
+# request header that carries the token
+TOKEN_HEADER = "X-Service-Token"
+USAGE = "usage: client.py [--server URL] command [flags of the command]"
+
+
+def read_token(token_file):
+    """
+    :param token_file: string, the token file written by the service
+    :return: string, the token
+    """
+    with open(token_file, "r") as f:
+        return f.read().strip()
+
+
+def run(command, argv, token, server=DEFAULT_SERVER):
+    """
+    :param command: string, name of the script, without .py
+    :param argv: list of strings, command line flags of the script
+    :param token: string, the token of the service, see read_token()
+    :param server: string, url of the service
+    :return: dictionary of {"status": int, "stdout": string, "stderr": string}
+    """
+    body = json.dumps({"command": command, "argv": argv, "cwd": os.getcwd()}).encode("utf-8")
+    request = urllib.request.Request(server + "/run", data=body,
+                                     headers={"Content-Type": "application/json", TOKEN_HEADER: token})
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    server = os.environ.get(SERVER_VARIABLE, DEFAULT_SERVER)
+    if args[:1] == ["--server"]:
+        server = args[1]
+        args = args[2:]
+    if not args or args[0] in ("-h", "--help"):
+        print(USAGE)
+        exit(0 if args else 2)
+
+    # a trailing .py is accepted, so that the script name can be used as is
+    command = args[0][:-3] if args[0].endswith(".py") else args[0]
+    token_file = os.environ.get(TOKEN_FILE_VARIABLE, DEFAULT_TOKEN_FILE)
+    try:
+        token = read_token(token_file)
+    except OSError as e:
+        print("Could not read the token of the service from %s (%s), is service.py running?" % (token_file, e.strerror),
+              file=sys.stderr)
+        exit(1)
+    try:
+        result = run(command, args[1:], token, server)
+    except urllib.error.HTTPError as e:
+        # the service answered, but refused the request
+        print("The service refused the request: %d %s" % (e.code, e.reason), file=sys.stderr)
+        exit(1)
+    except urllib.error.URLError as e:
+        print("Could not reach the service at %s (%s), is service.py running?" % (server, e.reason), file=sys.stderr)
+        exit(1)
+
+    sys.stdout.write(result["stdout"])
+    sys.stderr.write(result["stderr"])
+    exit(result["status"])
@@ -0,0 +1,772 @@
+"""
+data_store.py
+
+Reading and writing of the preprocessed data (the output of extract.py).
+
+Two formats are supported:
+- json: a single .json file holding {video_id: data entry}. This is the original format.
+- columnar: a directory of typed numpy arrays. Numbers are stored as int64 columns, all of the comment text is kept
+  in one contiguous utf-8 buffer with an offsets array, and the comments of video i are the comments in the range
+  [video_comment_starts[i], video_comment_ends[i]). Everything is memory mapped when loaded, so loading takes
+  milliseconds and only the parts that are actually used get read from disk.
+
+Both formats get an index written next to them (see write_index), so a single video or a single category can be
+read with load_video_entry() / load_category_entries() without parsing the rest of the dataset.
+
+append_data() adds data entries to existing data without writing out the entries that are already there (see
+ingest.py).
+
+Use load_data() instead of json.load() - it accepts either format, and returns something that behaves like the
+dictionary of data entries:
+{
+    video_id: {
+        "title": title,
+        "channel_title": channel_title,
+        "category_id": category_id,
+        "category_name": category_name,
+        ...
+        "comments": [
+            {
+                "comment_text": comment_text,
+                "likes": likes,
+                "replies": replies
+            }
+        ]
+    }
+}
+(for the columnar format, the numeric fields are ints instead of strings)
+
+A long-running process (see service.py) can call keep_resident(), so that every dataset and index is only loaded
+once, and then served from memory until its files change.
+"""
+
+import io
+import json
+import mmap
+import os
+from collections.abc import Mapping, Sequence
+
+import numpy as np
+
+import metrics
+import rankings
+
+FORMATS = ("json", "columnar")
+
+# the index of a .json file is kept next to it, the index of a columnar store is kept inside the directory
+INDEX_SUFFIX = ".index.json"
+COLUMNAR_INDEX = "index.json"
+VIDEOS_META = "videos.json"
+COMMENT_TEXT = "comment_text.bin"
+# string columns of a video, kept in VIDEOS_META
+VIDEO_STRING_FIELDS = ("title", "channel_title", "category_id", "category_name", "tags", "thumbnail_link", "date")
+# numeric columns of a video, each kept in video_<field>.npy
+VIDEO_NUMERIC_FIELDS = ("views", "likes", "dislikes", "comment_total")
+# numeric columns of a comment, each kept in comment_<field>.npy
+COMMENT_NUMERIC_FIELDS = ("likes", "replies")
+# sentiment columns of a comment (see sentiment_engine.add_sentiments), each kept in comment_<field>.npy, plus the
+# compound score of every sentence in sentence_compound.npy, with a comment_sentence_offsets.npy offsets array
+SENTIMENT_FIELDS = ("compound", "pos", "neg", "neu")
+# columns of every video kept in the index, for video_query.py. num_comments is the number of comments of the video
+TABLE_STRING_FIELDS = ("title", "channel_title", "category_id", "category_name", "date")
+TABLE_NUMERIC_FIELDS = VIDEO_NUMERIC_FIELDS + ("num_comments",)
+
+# {(kind, absolute path): (file signature, loaded object)} once keep_resident() is called, None otherwise
+resident = None
+
+
+###########
+# Writing #
+###########
+@metrics.stage("write")
+def write_data(data_entries, path, data_format="json", with_rankings=False):
+    """
+    Write out the data entries to path, in the given format.
+
+    :param data_entries: dictionary of data entries
+    :param path: string, output file (json) or directory (columnar)
+    :param data_format: string, one of FORMATS
+    :param with_rankings: bool, whether to precompute the rankings of videos and comments in the index
+    """
+    if data_format == "json":
+        video_offsets = write_json(data_entries, path)
+    elif data_format == "columnar":
+        write_columnar(data_entries, path)
+        video_offsets = None
+    else:
+        raise ValueError("Unknown data format: %s" % data_format)
+    write_index(data_entries, path, video_offsets, with_rankings)
+
+
+def write_json(data_entries, path):
+    """
+    Write out the data entries as a .json file. The output is the same as json.dump(), but the position of every
+    data entry in the file is recorded along the way. json.dumps() escapes non-ascii characters, so string lengths
+    are byte lengths.
+
+    :param data_entries: dictionary of data entries
+    :param path: string, output filename
+    :return: dictionary of {video_id: [byte offset, byte length]}
+    """
+    video_offsets = {}
+    with open(path, "w") as outfile:
+        outfile.write("{")
+        offset = 1
+        for i, video_id in enumerate(data_entries):
+            key = (", " if i > 0 else "") + json.dumps(video_id) + ": "
+            value = json.dumps(data_entries[video_id])
+            outfile.write(key)
+            outfile.write(value)
+            video_offsets[video_id] = [offset + len(key), len(value)]
+            offset += len(key) + len(value)
+        outfile.write("}")
+    return video_offsets
+
+
+def write_index(data_entries, path, video_offsets=None, with_rankings=False):
+    """
+    Write out the index for the data at path. The index looks like:
+    {
+        "signature": file_signature() of the data, used to detect an index that is out of date,
+        "videos": {video_id: [byte offset, byte length]}, only for the json format
+        "categories": {category_id: [video_id, ...]},
+        "table": see video_table(),
+        "rankings": see rankings.build_rankings(), plus the "depth" of the comment rankings, only if with_rankings
+    }
+
+    :param data_entries: dictionary of data entries
+    :param path: string, the .json file or columnar store directory
+    :param video_offsets: dictionary of {video_id: [byte offset, byte length]}, or None
+    :param with_rankings: bool, whether to precompute the rankings of videos and comments
+    """
+    categories = {}
+    for video_id in data_entries:
+        categories.setdefault(data_entries[video_id]["category_id"], []).append(video_id)
+
+    index = {"categories": categories, "table": video_table(data_entries)}
+    if with_rankings:
+        index["rankings"] = rankings.build_rankings(data_entries)
+        index["rankings"]["depth"] = rankings.RANK_DEPTH
+    index["signature"] = file_signature(path)
+    if video_offsets is not None:
+        index["videos"] = video_offsets
+    with open(index_path(path), "w") as index_file:
+        json.dump(index, index_file)
+
+
+def video_table(data_entries):
+    """
+    :param data_entries: dictionary of data entries
+    :return: dictionary of {"video_ids": list of strings, field: list of the values of each video}, for the
+             TABLE_STRING_FIELDS and TABLE_NUMERIC_FIELDS (as ints)
+    """
+    table = {"video_ids": list(data_entries)}
+    entries = [data_entries[video_id] for video_id in table["video_ids"]]
+    for field in TABLE_STRING_FIELDS:
+        table[field] = [entry[field] for entry in entries]
+    for field in VIDEO_NUMERIC_FIELDS:
+        table[field] = [int(entry[field]) for entry in entries]
+    table["num_comments"] = [len(entry["comments"]) for entry in entries]
+    return table
+
+
+def index_path(path):
+    """
+    :param path: string, the .json file or columnar store directory
+    :return: string, filename of its index
+    """
+    if os.path.isdir(path):
+        return os.path.join(path, COLUMNAR_INDEX)
+    return path + INDEX_SUFFIX
+
+
+def write_columnar(data_entries, output_dir):
+    """
+    Write out the data entries as a columnar store in output_dir.
+
+    :param data_entries: dictionary of data entries
+    :param output_dir: string, output directory, created if needed
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    has_sentiments = any("sentiment" in comment for entry in data_entries.values() for comment in entry["comments"])
+    with open(os.path.join(output_dir, COMMENT_TEXT), "wb") as text_file:
+        strings, columns = build_columns(data_entries, text_file, has_sentiments)
+    columns["comment_text_offsets"] = np.concatenate([[0], columns["comment_text_offsets"]])
+    if has_sentiments:
+        columns["comment_sentence_offsets"] = np.concatenate([[0], columns["comment_sentence_offsets"]])
+
+    with open(os.path.join(output_dir, VIDEOS_META), "w") as meta_file:
+        json.dump({"video_ids": list(data_entries), "fields": strings}, meta_file)
+    for name, column in columns.items():
+        np.save(os.path.join(output_dir, name + ".npy"), column)
+
+
+def build_columns(data_entries, text_file, has_sentiments, first_comment=0, first_text=0, first_sentence=0):
+    """
+    Write out the comment text of the data entries to text_file, and build their other columns.
+
+    :param data_entries: dictionary of data entries
+    :param text_file: file handle, opened in binary mode
+    :param has_sentiments: bool, whether to build the sentiment columns as well
+    :param first_comment: int, index in the store of the first comment of the data entries
+    :param first_text: int, offset in the comment text of the first comment
+    :param first_sentence: int, index in sentence_compound of the first sentence
+    :return: tuple of (dictionary of {field: list of strings} for the VIDEO_STRING_FIELDS, dictionary of
+             {column name: numpy array}). The offsets columns (comment_text_offsets and comment_sentence_offsets)
+             only hold the offset after each comment, without the 0 they start with.
+    """
+    strings = {field: [] for field in VIDEO_STRING_FIELDS}
+    columns = {"video_" + field: np.zeros(len(data_entries), dtype=np.int64) for field in VIDEO_NUMERIC_FIELDS}
+    columns["video_comment_starts"] = np.zeros(len(data_entries), dtype=np.int64)
+    columns["video_comment_ends"] = np.zeros(len(data_entries), dtype=np.int64)
+
+    num_comments = sum(len(entry["comments"]) for entry in data_entries.values())
+    for field in COMMENT_NUMERIC_FIELDS:
+        columns["comment_" + field] = np.zeros(num_comments, dtype=np.int64)
+    columns["comment_text_offsets"] = np.zeros(num_comments, dtype=np.int64)
+    if has_sentiments:
+        for field in SENTIMENT_FIELDS:
+            columns["comment_" + field] = np.zeros(num_comments, dtype=np.float64)
+        columns["comment_sentence_offsets"] = np.zeros(num_comments, dtype=np.int64)
+    sentence_compound = []
+
+    comment_index = 0
+    text_offset = first_text
+    for i, entry in enumerate(data_entries.values()):
+        for field in VIDEO_STRING_FIELDS:
+            strings[field].append(entry[field])
+        for field in VIDEO_NUMERIC_FIELDS:
+            columns["video_" + field][i] = int(entry[field])
+
+        columns["video_comment_starts"][i] = first_comment + comment_index
+        for comment in entry["comments"]:
+            for field in COMMENT_NUMERIC_FIELDS:
+                columns["comment_" + field][comment_index] = int(comment[field])
+            if has_sentiments:
+                for field in SENTIMENT_FIELDS:
+                    columns["comment_" + field][comment_index] = comment["sentiment"][field]
+                sentence_compound.extend(comment["sentiment"]["sentences"])
+                columns["comment_sentence_offsets"][comment_index] = first_sentence + len(sentence_compound)
+            encoded = comment["comment_text"].encode("utf-8")
+            text_file.write(encoded)
+            text_offset += len(encoded)
+            columns["comment_text_offsets"][comment_index] = text_offset
+            comment_index += 1
+        columns["video_comment_ends"][i] = first_comment + comment_index
+
+    if has_sentiments:
+        columns["sentence_compound"] = np.array(sentence_compound, dtype=np.float64)
+    return strings, columns
+
+
+#############
+# Appending #
+#############
+@metrics.stage("write")
+def append_data(data_entries, path, with_rankings=False):
+    """
+    Add data entries to the data at path, without writing out the entries that are already there. The entry of a
+    video that is already in the data replaces it (the video keeps its position), the other entries come after the
+    last one. The data must have an up to date index, which is then updated for the added entries only.
+
+    The files only grow at the end: in a .json file, the replaced entry is written again as a whole after the last
+    one (json.load() keeps the last value of a key, at the position of the first one), and in a columnar store, the
+    comments of the replaced entry are copied after the last comment, so that they stay one range. Once more than
+    half of the data is taken up by replaced entries, everything is written out again instead.
+
+    :param data_entries: dictionary of data entries
+    :param path: string, the .json file or columnar store directory
+    :param with_rankings: bool, whether to precompute the rankings of videos and comments in the index. The index
+                          of the data must already have them.
+    """
+    index = load_index(path)
+    if index is None:
+        raise ValueError("The index of %s is missing or out of date" % path)
+
+    if os.path.isdir(path):
+        append_columnar(data_entries, path)
+        store = ColumnarStore(path)
+        live_size = int(np.sum(store.video_comment_ends - store.video_comment_starts))
+        total_size = len(store.comment_likes)
+        del store
+    else:
+        index["videos"].update(append_json(data_entries, path))
+        live_size = sum(length for (offset, length) in index["videos"].values())
+        total_size = os.path.getsize(path)
+    update_index(index, data_entries, path, with_rankings)
+
+    if live_size * 2 < total_size:
+        stored = read_data(path)
+        all_data = {video_id: dict(stored[video_id], comments=list(stored[video_id]["comments"]))
+                    for video_id in stored}
+        del stored
+        write_data(all_data, path, "columnar" if os.path.isdir(path) else "json", with_rankings)
+
+
+def update_index(index, data_entries, path, with_rankings=False):
+    """
+    Update the index of the data at path for the data entries that were just added to it, see append_data(). Only
+    the table rows and comment rankings of those videos, and the video rankings of their categories, are computed
+    again.
+
+    :param index: dictionary, the index of the data before the data entries were added
+    :param data_entries: dictionary of data entries
+    :param path: string, the .json file or columnar store directory
+    :param with_rankings: bool, whether to precompute the rankings of videos and comments
+    """
+    table = index["table"]
+    positions = {video_id: i for (i, video_id) in enumerate(table["video_ids"])}
+    rows = video_table(data_entries)
+    changed_categories = set(rows["category_id"])
+    for j, video_id in enumerate(rows["video_ids"]):
+        if video_id in positions:
+            i = positions[video_id]
+            changed_categories.add(table["category_id"][i])
+            for field in table:
+                table[field][i] = rows[field][j]
+        else:
+            positions[video_id] = len(table["video_ids"])
+            for field in table:
+                table[field].append(rows[field][j])
+
+    categories = {}
+    for video_id, category_id in zip(table["video_ids"], table["category_id"]):
+        categories.setdefault(category_id, []).append(video_id)
+    index["categories"] = categories
+
+    if with_rankings:
+        def table_score(video_id):
+            i = positions[video_id]
+            return rankings.video_score(table["views"][i], table["likes"][i], table["dislikes"][i],
+                                        table["num_comments"][i])
+
+        video_rankings = index["rankings"]["videos"]
+        for category_id in changed_categories:
+            if category_id in categories:
+                video_rankings[category_id] = sorted(categories[category_id], reverse=True, key=table_score)
+            else:
+                video_rankings.pop(category_id, None)
+        for video_id in data_entries:
+            index["rankings"]["comments"][video_id] = rankings.top_comment_indices(data_entries[video_id]["comments"],
+                                                                                   index["rankings"]["depth"])
+    else:
+        index.pop("rankings", None)
+    index["signature"] = file_signature(path)
+    with open(index_path(path), "w") as index_file:
+        json.dump(index, index_file)
+
+
+def append_json(data_entries, path):
+    """
+    Add the data entries at the end of a .json file, see append_data().
+
+    :param data_entries: dictionary of data entries
+    :param path: string, a .json file written by write_json()
+    :return: dictionary of {video_id: [byte offset, byte length]}, for the added entries
+    """
+    video_offsets = {}
+    with open(path, "r+b") as data_file:
+        # overwrite the closing brace
+        offset = data_file.seek(-1, os.SEEK_END)
+        if data_file.read(1) != b"}":
+            raise ValueError("Not a data file: %s" % path)
+        data_file.seek(offset)
+        for video_id in data_entries:
+            key = (", " if offset > 1 else "") + json.dumps(video_id) + ": "
+            value = json.dumps(data_entries[video_id])
+            data_file.write((key + value).encode("ascii"))
+            video_offsets[video_id] = [offset + len(key), len(value)]
+            offset += len(key) + len(value)
+        data_file.write(b"}")
+    return video_offsets
+
+
+def append_columnar(data_entries, path):
+    """
+    Add the data entries to a columnar store, see append_data(). The columns of the videos that are already in the
+    store are updated in place, everything else is appended.
+
+    :param data_entries: dictionary of data entries
+    :param path: string, a columnar store directory
+    """
+    store = ColumnarStore(path)
+    first_sentence = len(store.sentence_compound) if store.has_sentiments else 0
+    with open(os.path.join(path, COMMENT_TEXT), "ab") as text_file:
+        strings, columns = build_columns(data_entries, text_file, store.has_sentiments, len(store.comment_likes),
+                                         len(store.text), first_sentence)
+
+    positions = [store.video_index.get(video_id) for video_id in data_entries]
+    replaced = np.array([i for (i, position) in enumerate(positions) if position is not None], dtype=np.int64)
+    added = np.array([i for (i, position) in enumerate(positions) if position is None], dtype=np.int64)
+    for name, column in columns.items():
+        if name.startswith("video_"):
+            patch_array(os.path.join(path, name + ".npy"), [positions[i] for i in replaced], column[replaced])
+            append_array(os.path.join(path, name + ".npy"), column[added])
+        else:
+            append_array(os.path.join(path, name + ".npy"), column)
+
+    video_ids = store.video_ids + [video_id for (video_id, position) in zip(data_entries, positions)
+                                   if position is None]
+    fields = store.fields
+    for field in VIDEO_STRING_FIELDS:
+        for i in replaced:
+            fields[field][positions[i]] = strings[field][i]
+        fields[field].extend(strings[field][i] for i in added)
+    del store
+    with open(os.path.join(path, VIDEOS_META), "w") as meta_file:
+        json.dump({"video_ids": video_ids, "fields": fields}, meta_file)
+
+
+def append_array(npy_path, values):
+    """
+    Append values to the 1-d array in a .npy file, in place. np.save() leaves room in the header for the length of
+    the array to grow, so only the header and the values are written, unless the header does not fit anymore.
+
+    :param npy_path: string, a .npy file
+    :param values: numpy array
+    """
+    with open(npy_path, "r+b") as npy_file:
+        version = np.lib.format.read_magic(npy_file)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(npy_file)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(npy_file)
+        header_size = npy_file.tell()
+        header = io.BytesIO()
+        header_data = {"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": fortran_order,
+                       "shape": (shape[0] + len(values),)}
+        if version == (1, 0):
+            np.lib.format.write_array_header_1_0(header, header_data)
+        else:
+            np.lib.format.write_array_header_2_0(header, header_data)
+        if len(header.getvalue()) == header_size:
+            npy_file.seek(0, os.SEEK_END)
+            npy_file.write(np.asarray(values, dtype=dtype).tobytes())
+            npy_file.seek(0)
+            npy_file.write(header.getvalue())
+            return
+    np.save(npy_path, np.concatenate([np.load(npy_path), np.asarray(values, dtype=dtype)]))
+
+
+def patch_array(npy_path, positions, values):
+    """
+    Overwrite some values of the array in a .npy file, in place.
+
+    :param npy_path: string, a .npy file
+    :param positions: list of ints
+    :param values: numpy array, the new values at those positions
+    """
+    if len(positions) == 0:
+        return
+    array = np.load(npy_path, mmap_mode="r+")
+    array[positions] = values
+    array.flush()
+    del array
+
+
+###########
+# Loading #
+###########
+@metrics.stage("load")
+def load_data(path):
+    """
+    Load the preprocessed data written by extract.py, in either format.
+
+    :param path: string, a .json file or a columnar store directory
+    :return: dictionary (or dictionary-like ColumnarStore) of data entries
+    """
+    if resident is not None:
+        return load_resident("data", path, read_data)
+    return read_data(path)
+
+
+def read_data(path):
+    """
+    :param path: string, a .json file or a columnar store directory
+    :return: dictionary (or dictionary-like ColumnarStore) of data entries
+    """
+    if os.path.isdir(path):
+        return ColumnarStore(path)
+    with open(path, "r") as data_file:
+        return json.load(data_file)
+
+
+@metrics.stage("load")
+def load_index(path):
+    """
+    Load the index for the data at path. Returns None if there is no index, or if it is out of date.
+
+    :param path: string, the .json file or columnar store directory
+    :return: dictionary, or None
+    """
+    if resident is not None:
+        index = load_resident("index", path, read_index)
+    else:
+        index = read_index(path)
+    # an index written before the signature was added to it is out of date as well
+    if index is None or index_signature(index) != file_signature(path):
+        return None
+    return index
+
+
+def index_signature(index):
+    """
+    :param index: dictionary, see write_index()
+    :return: tuple, the file_signature() of the data when the index was written, or None
+    """
+    if index.get("signature") is None:
+        return None
+    return tuple(tuple(signature) for signature in index["signature"])
+
+
+def read_index(path):
+    """
+    :param path: string, the .json file or columnar store directory
+    :return: dictionary, or None if there is no index
+    """
+    try:
+        with open(index_path(path), "r") as index_file:
+            return json.load(index_file)
+    except FileNotFoundError:
+        return None
+
+
+@metrics.stage("load")
+def load_video_entry(path, video_id):
+    """
+    Load the data entry of a single video. Only that entry is parsed when an index is available.
+
+    :param path: string, the .json file or columnar store directory
+    :param video_id: string
+    :return: dictionary, the data entry, or None if the video id was not found
+    """
+    if resident is not None or os.path.isdir(path):
+        return load_data(path).get(video_id)
+
+    index = load_index(path)
+    if index is None:
+        return load_data(path).get(video_id)
+    if video_id not in index["videos"]:
+        return None
+    with open(path, "rb") as data_file:
+        return read_json_entry(data_file, index["videos"][video_id])
+
+
+@metrics.stage("load")
+def load_category_entries(path, category_id):
+    """
+    Load the data entries of all videos of a category. Only those entries are parsed when an index is available.
+
+    :param path: string, the .json file or columnar store directory
+    :param category_id: string
+    :return: dictionary of {video_id: data entry}
+    """
+    index = load_index(path)
+    if index is None:
+        data_entries = load_data(path)
+        return {k: v for (k, v) in data_entries.items() if v["category_id"] == category_id}
+
+    return load_video_entries(path, index["categories"].get(category_id, []), index)
+
+
+@metrics.stage("load")
+def load_video_entries(path, video_ids, index=None):
+    """
+    Load the data entries of some videos. Only those entries are parsed when an index is available.
+
+    :param path: string, the .json file or columnar store directory
+    :param video_ids: list of strings, video ids that are in the data
+    :param index: dictionary, the index of the data if it is already loaded
+    :return: dictionary of {video_id: data entry}, in the same order as video_ids
+    """
+    if resident is not None or os.path.isdir(path):
+        data_entries = load_data(path)
+        return {video_id: data_entries[video_id] for video_id in video_ids}
+
+    if index is None:
+        index = load_index(path)
+    if index is None:
+        data_entries = load_data(path)
+        return {video_id: data_entries[video_id] for video_id in video_ids}
+
+    # read the entries in file order, and hand them back in the original order
+    offsets = index["videos"]
+    entries = {}
+    with open(path, "rb") as data_file:
+        for video_id in sorted(video_ids, key=lambda v: offsets[v][0]):
+            entries[video_id] = read_json_entry(data_file, offsets[video_id])
+    return {video_id: entries[video_id] for video_id in video_ids}
+
+
+def load_rankings(path):
+    """
+    :param path: string, the .json file or columnar store directory
+    :return: dictionary, the precomputed rankings (see write_index), or None if there are none
+    """
+    index = load_index(path)
+    if index is None:
+        return None
+    return index.get("rankings")
+
+
+def keep_resident():
+    """
+    From now on, keep every dataset and index loaded by this process in memory. They are loaded again when their
+    files change. The data entries are then shared between callers, so they must not be modified.
+    """
+    global resident
+    if resident is None:
+        resident = {}
+
+
+def load_resident(kind, path, loader, files=None):
+    """
+    :param kind: string, "data" or "index", or the kind of another object derived from the data
+    :param path: string, the .json file or columnar store directory
+    :param loader: function of path, that loads the object when it is not resident yet or out of date
+    :param files: list of strings, the files the object is loaded again for when they change. Defaults to the index
+                  for "index", and to the data otherwise.
+    :return: the loaded object
+    """
+    key = (kind, os.path.abspath(path))
+    if files is None:
+        files = [index_path(path) if kind == "index" else path]
+    signature = tuple(file_signature(f) for f in files)
+    if key in resident and resident[key][0] == signature:
+        return resident[key][1]
+    loaded = loader(path)
+    resident[key] = (signature, loaded)
+    return loaded
+
+
+def file_signature(path):
+    """
+    :param path: string, a file or a columnar store directory
+    :return: tuple, that changes whenever the file (or the store) is written, or None if it does not exist
+    """
+    if os.path.isdir(path):
+        paths = [os.path.join(path, VIDEOS_META), os.path.join(path, COMMENT_TEXT)]
+    else:
+        paths = [path]
+    try:
+        return tuple((os.stat(p).st_mtime_ns, os.stat(p).st_size) for p in paths)
+    except FileNotFoundError:
+        return None
+
+
+def read_json_entry(data_file, offset):
+    """
+    :param data_file: file handle of a .json file, opened in binary mode
+    :param offset: list of [byte offset, byte length]
+    :return: dictionary, the data entry stored at that position
+    """
+    data_file.seek(offset[0])
+    return json.loads(data_file.read(offset[1]))
+
+
+class ColumnarStore(Mapping):
+    """
+    Read-only, memory mapped view of a columnar store. Behaves like the dictionary of data entries, building each
+    entry on access. The numpy columns are also available directly as attributes, for code that wants to work on
+    whole columns at once:
+    - video_<field> for the VIDEO_NUMERIC_FIELDS, and video_comment_starts / video_comment_ends
+    - comment_<field> for the COMMENT_NUMERIC_FIELDS, and comment_text_offsets
+    - if the store has sentiment scores: comment_<field> for the SENTIMENT_FIELDS, comment_sentence_offsets and
+      sentence_compound
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, VIDEOS_META), "r") as meta_file:
+            meta = json.load(meta_file)
+        self.video_ids = meta["video_ids"]
+        self.fields = meta["fields"]
+        self.video_index = {video_id: i for (i, video_id) in enumerate(self.video_ids)}
+
+        for field in VIDEO_NUMERIC_FIELDS:
+            setattr(self, "video_" + field, self._load_array("video_%s.npy" % field))
+        for field in COMMENT_NUMERIC_FIELDS:
+            setattr(self, "comment_" + field, self._load_array("comment_%s.npy" % field))
+        self.video_comment_starts = self._load_array("video_comment_starts.npy")
+        self.video_comment_ends = self._load_array("video_comment_ends.npy")
+        self.comment_text_offsets = self._load_array("comment_text_offsets.npy")
+        self.has_sentiments = os.path.exists(os.path.join(path, "sentence_compound.npy"))
+        if self.has_sentiments:
+            for field in SENTIMENT_FIELDS:
+                setattr(self, "comment_" + field, self._load_array("comment_%s.npy" % field))
+            self.comment_sentence_offsets = self._load_array("comment_sentence_offsets.npy")
+            self.sentence_compound = self._load_array("sentence_compound.npy")
+
+        self.text = b""
+        with open(os.path.join(path, COMMENT_TEXT), "rb") as text_file:
+            if os.fstat(text_file.fileno()).st_size > 0:
+                self.text = mmap.mmap(text_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _load_array(self, name):
+        return np.load(os.path.join(self.path, name), mmap_mode="r")
+
+    def __len__(self):
+        return len(self.video_ids)
+
+    def __iter__(self):
+        return iter(self.video_ids)
+
+    def __contains__(self, video_id):
+        return video_id in self.video_index
+
+    def __getitem__(self, video_id):
+        i = self.video_index[video_id]
+        entry = {field: self.fields[field][i] for field in VIDEO_STRING_FIELDS}
+        for field in VIDEO_NUMERIC_FIELDS:
+            entry[field] = int(getattr(self, "video_" + field)[i])
+        entry["comments"] = CommentList(self, int(self.video_comment_starts[i]), int(self.video_comment_ends[i]))
+        return entry
+
+    def comment_text(self, comment_index):
+        """
+        :param comment_index: int, index of a comment in the whole store
+        :return: string, the comment text
+        """
+        start = int(self.comment_text_offsets[comment_index])
+        end = int(self.comment_text_offsets[comment_index + 1])
+        return self.text[start:end].decode("utf-8")
+
+    def comment(self, comment_index):
+        """
+        :param comment_index: int, index of a comment in the whole store
+        :return: dictionary, the comment entry
+        """
+        comment = {"comment_text": self.comment_text(comment_index)}
+        for field in COMMENT_NUMERIC_FIELDS:
+            comment[field] = int(getattr(self, "comment_" + field)[comment_index])
+        if self.has_sentiments:
+            sentiment = {field: float(getattr(self, "comment_" + field)[comment_index]) for field in SENTIMENT_FIELDS}
+            start = int(self.comment_sentence_offsets[comment_index])
+            end = int(self.comment_sentence_offsets[comment_index + 1])
+            sentiment["sentences"] = self.sentence_compound[start:end].tolist()
+            comment["sentiment"] = sentiment
+        return comment
+
+
+class CommentList(Sequence):
+    """
+    The comments of one video in a ColumnarStore, decoded on access.
+    """
+
+    def __init__(self, store, start, end):
+        self.store = store
+        self.start = start
+        self.end = end
+
+    def __len__(self):
+        return self.end - self.start
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("comment index out of range")
+        return self.store.comment(self.start + i)
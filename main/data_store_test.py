@@ -0,0 +1,209 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import numpy as np
+import data_store
+
+DATA = {
+    "v1": {"title": "t1", "channel_title": "c1", "category_id": "1", "category_name": "Film", "tags": "a|b",
+           "views": "100", "likes": "5", "dislikes": "1", "comment_total": "2", "thumbnail_link": "l1",
+           "date": "13.09",
+           "comments": [{"comment_text": "hello", "likes": "3", "replies": "0"},
+                        {"comment_text": "ünïcode 💕", "likes": "0", "replies": "2"}]},
+    "v2": {"title": "t2", "channel_title": "c2", "category_id": "24", "category_name": "Entertainment", "tags": "",
+           "views": "7", "likes": "0", "dislikes": "0", "comment_total": "0", "thumbnail_link": "l2",
+           "date": "14.09",
+           "comments": [{"comment_text": "", "likes": "1", "replies": "1"}]}
+}
+
+
+class TestColumnarStore(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_round_trip(self):
+        path = os.path.join(self.dir, "store")
+        data_store.write_data(DATA, path, "columnar")
+        store = data_store.load_data(path)
+
+        self.assertEqual(["v1", "v2"], list(store))
+        self.assertIn("v2", store)
+        entry = store["v1"]
+        self.assertEqual("Film", entry["category_name"])
+        self.assertEqual(100, entry["views"])
+        self.assertEqual([{"comment_text": "hello", "likes": 3, "replies": 0},
+                          {"comment_text": "ünïcode 💕", "likes": 0, "replies": 2}], list(entry["comments"]))
+        self.assertEqual("ünïcode 💕", entry["comments"][-1]["comment_text"])
+        self.assertEqual([""], [c["comment_text"] for c in store["v2"]["comments"]])
+
+    def test_sentiments(self):
+        data = json.loads(json.dumps(DATA))
+        for i, comment in enumerate(c for entry in data.values() for c in entry["comments"]):
+            comment["sentiment"] = {"compound": 0.1 * i, "pos": 0.5, "neg": 0.0, "neu": 0.5,
+                                    "sentences": [0.1 * i] * i}
+        path = os.path.join(self.dir, "store")
+        data_store.write_data(data, path, "columnar")
+        store = data_store.load_data(path)
+        self.assertEqual(data["v1"]["comments"], [dict(c, likes=str(c["likes"]), replies=str(c["replies"]))
+                                                  for c in store["v1"]["comments"]])
+        self.assertEqual([0.2, 0.2], store["v2"]["comments"][0]["sentiment"]["sentences"])
+
+    def test_json(self):
+        path = os.path.join(self.dir, "data.json")
+        data_store.write_data(DATA, path, "json")
+        self.assertEqual(DATA, data_store.load_data(path))
+        with open(path) as f:
+            self.assertEqual(json.dumps(DATA), f.read())
+
+
+class TestIndex(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def check_lookups(self, path):
+        self.assertEqual("t2", data_store.load_video_entry(path, "v2")["title"])
+        self.assertIsNone(data_store.load_video_entry(path, "nope"))
+        self.assertEqual(["v1"], list(data_store.load_category_entries(path, "1")))
+        self.assertEqual({}, data_store.load_category_entries(path, "99"))
+        comments = data_store.load_video_entry(path, "v1")["comments"]
+        self.assertEqual("ünïcode 💕", comments[1]["comment_text"])
+
+    def test_json_lookups(self):
+        path = os.path.join(self.dir, "data.json")
+        data_store.write_data(DATA, path, "json")
+        self.assertIsNotNone(data_store.load_index(path))
+        self.check_lookups(path)
+
+    def test_columnar_lookups(self):
+        path = os.path.join(self.dir, "store")
+        data_store.write_data(DATA, path, "columnar")
+        self.check_lookups(path)
+
+    def test_rankings(self):
+        for data_format, name in (("json", "data.json"), ("columnar", "store")):
+            path = os.path.join(self.dir, name)
+            data_store.write_data(DATA, path, data_format)
+            self.assertIsNone(data_store.load_rankings(path))
+            data_store.write_data(DATA, path, data_format, with_rankings=True)
+            rankings = data_store.load_rankings(path)
+            self.assertEqual({"1": ["v1"], "24": ["v2"]}, rankings["videos"])
+            self.assertEqual({"v1": [0, 1], "v2": [0]}, rankings["comments"])
+            entries = data_store.load_video_entries(path, ["v2", "v1"])
+            self.assertEqual(["v2", "v1"], list(entries))
+            self.assertEqual("t1", entries["v1"]["title"])
+
+    def test_stale_index_ignored(self):
+        path = os.path.join(self.dir, "data.json")
+        data_store.write_data(DATA, path, "json")
+        with open(path, "w") as f:
+            json.dump({"v2": DATA["v2"]}, f)
+        self.assertIsNone(data_store.load_index(path))
+        self.assertEqual([], list(data_store.load_category_entries(path, "1")))
+
+    def test_same_size_rewrite(self):
+        # the same entries in another order: the file has the same size, but the offsets changed
+        path = os.path.join(self.dir, "data.json")
+        data_store.write_data(DATA, path, "json")
+        self.assertIsNotNone(data_store.load_index(path))
+        time.sleep(0.01)
+        size = os.path.getsize(path)
+        with open(path, "w") as f:
+            json.dump({"v2": DATA["v2"], "v1": DATA["v1"]}, f)
+        self.assertEqual(size, os.path.getsize(path))
+        self.assertIsNone(data_store.load_index(path))
+        self.assertEqual("t2", data_store.load_video_entry(path, "v2")["title"])
+
+    def test_columnar_stale_index(self):
+        path = os.path.join(self.dir, "store")
+        data_store.write_data(DATA, path, "columnar")
+        self.assertIsNotNone(data_store.load_index(path))
+        time.sleep(0.01)
+        data_store.write_columnar({"v2": DATA["v2"]}, path)
+        self.assertIsNone(data_store.load_index(path))
+
+
+class TestAppend(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        more = {"comment_text": "more", "likes": "9", "replies": "0"}
+        self.v1 = dict(DATA["v1"], views="300", comments=DATA["v1"]["comments"] + [more])
+        self.v3 = dict(DATA["v2"], title="t3", category_id="1", category_name="Film")
+        self.expected = {"v1": self.v1, "v2": DATA["v2"], "v3": self.v3}
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def check_same_as_write(self, path, full, data_format):
+        data_store.write_data(self.expected, full, data_format, with_rankings=True)
+        expected = data_store.load_data(full)
+        data = data_store.load_data(path)
+        self.assertEqual(list(expected), list(data))
+        for video_id in expected:
+            self.assertEqual(dict(expected[video_id], comments=list(expected[video_id]["comments"])),
+                             dict(data[video_id], comments=list(data[video_id]["comments"])))
+        index = data_store.load_index(path)
+        expected_index = data_store.load_index(full)
+        for key in ("categories", "table", "rankings"):
+            self.assertEqual(expected_index[key], index[key])
+
+    def check_append(self, data_format, name):
+        path = os.path.join(self.dir, name)
+        data_store.write_data(DATA, path, data_format, with_rankings=True)
+        data_store.append_data({"v1": self.v1, "v3": self.v3}, path, with_rankings=True)
+        self.check_same_as_write(path, os.path.join(self.dir, "full_" + name), data_format)
+        self.assertEqual(["v1", "v3"], data_store.load_rankings(path)["videos"]["1"])
+        self.assertEqual("t3", data_store.load_video_entry(path, "v3")["title"])
+        return path
+
+    def test_json(self):
+        path = self.check_append("json", "data.json")
+        with open(path) as f:
+            # the first entries are left as they were
+            self.assertTrue(f.read().startswith(json.dumps(DATA)[:-1]))
+
+    def test_columnar(self):
+        path = self.check_append("columnar", "store")
+        self.assertEqual(["v1", "v2", "v3"], list(data_store.load_data(path)))
+
+    def test_moved_category(self):
+        path = os.path.join(self.dir, "data.json")
+        data_store.write_data(DATA, path, "json", with_rankings=True)
+        self.expected = {"v1": self.v1, "v2": dict(DATA["v2"], category_id="1", category_name="Film")}
+        data_store.append_data({"v2": self.expected["v2"]}, path, with_rankings=True)
+        data_store.append_data({"v1": self.v1}, path, with_rankings=True)
+        self.check_same_as_write(path, os.path.join(self.dir, "full.json"), "json")
+        self.assertNotIn("24", data_store.load_rankings(path)["videos"])
+
+    def test_compaction(self):
+        for data_format, name in (("json", "data.json"), ("columnar", "store")):
+            path = os.path.join(self.dir, name)
+            full = os.path.join(self.dir, "full_" + name)
+            data_store.write_data(DATA, path, data_format)
+            data_store.write_data(self.expected, full, data_format)
+            for i in range(5):
+                data_store.append_data({"v1": self.v1, "v3": self.v3}, path)
+            self.assertEqual(list(data_store.load_data(full)), list(data_store.load_data(path)))
+            if data_format == "json":
+                self.assertLess(os.path.getsize(path), 2 * os.path.getsize(full))
+            else:
+                self.assertLess(len(data_store.load_data(path).comment_likes), 2 * 5)
+
+    def test_append_array(self):
+        path = os.path.join(self.dir, "a.npy")
+        np.save(path, np.arange(5, dtype=np.int64))
+        data_store.append_array(path, np.array([7, 8]))
+        data_store.append_array(path, np.array([], dtype=np.int64))
+        self.assertEqual([0, 1, 2, 3, 4, 7, 8], np.load(path).tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
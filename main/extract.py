@@ -6,9 +6,17 @@ Objective of this file is to read input data and output it all into a file that
 
 import argparse
 import os
-import json
 
+import data_store
+import ingest
+import metrics
+import quarantine
+import sentiment_cache
+import sentiment_engine
+import term_matrix
+import time_series
 from extract_helpers import extract_video_data, extract_categories_data, parse_comments_data
+from extract_parallel import parse_comments_data_parallel
 
 DATA_DIR = "data"
 US_COMMENTS = "UScomments.csv"
@@ -19,21 +27,35 @@ GB_VIDEOS = "GBvideos.csv"
 GB_CATEGORIES = "GB_category_id.json"
 
 
-def preprocess(comments_csv, videos_csv, categories_json):
+def preprocess(comments_csv, videos_csv, categories_json, jobs=1, time_series=None, quarantine_rows=None):
     """
     Preprocessing input files.
+    With more than one job, the comments file is split into shards that are parsed in parallel.
 
     :param comments_csv: string, filename
     :param videos_csv: string, filename
     :param categories_json: string, filename
+    :param jobs: int, number of processes to use for parsing the comments
+    :param time_series: time_series.TimeSeriesBuilder that collects every row of the videos file, or None
+    :param quarantine_rows: quarantine.Quarantine that collects the rows that cannot be ingested, or None
     :return:
     """
-    with open(comments_csv, "r") as comments_file, \
-            open(videos_csv, "r") as videos_file, \
+    # the csv files are streamed through a csv reader, which needs newline="" to handle multi-line fields. Bytes that
+    # are not utf-8 are replaced (as in the parallel path), the rest of their row is kept.
+    with open(comments_csv, "r", newline="", encoding="utf-8", errors="replace") as comments_file, \
+            open(videos_csv, "r", newline="", encoding="utf-8", errors="replace") as videos_file, \
             open(categories_json, "r") as categories_file:
-        video_data = extract_video_data(videos_file)
-        categories_data = extract_categories_data(categories_file)
-        all_data = parse_comments_data(video_data, categories_data, comments_file)
+        with metrics.stage("videos"):
+            video_data = extract_video_data(videos_file, time_series=time_series, quarantine_rows=quarantine_rows)
+            categories_data = extract_categories_data(categories_file)
+        with metrics.stage("comments"):
+            if jobs > 1:
+                all_data = parse_comments_data_parallel(video_data, categories_data, comments_csv, jobs,
+                                                        quarantine_rows)
+            else:
+                all_data = parse_comments_data(video_data, categories_data, comments_file, quarantine_rows)
+    if quarantine_rows is not None:
+        quarantine_rows.flush()
     return all_data
 
 
@@ -42,6 +64,22 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Preprocess CSV files")
     parser.add_argument("-s", "--set", help="Specify the data set to use", required=True)
     parser.add_argument("-o", "--output", help="Specify the output file path to use", required=True)
+    parser.add_argument("-f", "--format", help="Output format, a .json file or a columnar store directory",
+                        choices=data_store.FORMATS, default="json")
+    parser.add_argument("-j", "--jobs", help="Number of processes used to parse (and score) the comments", type=int,
+                        default=1)
+    parser.add_argument("--sentiment", help="Compute the sentiment scores of every comment, and store them in the "
+                                            "output", action="store_true")
+    parser.add_argument("--cache", help="SQLite file used to cache sentiment scores between runs", required=False)
+    parser.add_argument("--rankings", help="Precompute the rankings of videos per category and comments per video",
+                        action="store_true")
+    parser.add_argument("--terms", help="Tokenize every comment once, into a term matrix stored next to the output "
+                                        "that the wordcloud scripts count tokens from", action="store_true")
+    parser.add_argument("--incremental", help="Only ingest the rows added to the input files since the last "
+                                              "incremental run into the existing output", action="store_true")
+    parser.add_argument("--quarantine", help="File that the rows that cannot be ingested are written to, defaults to "
+                                             "one next to the output", required=False)
+    metrics.add_arguments(parser)
     args = parser.parse_args()
 
     # Construct input file names
@@ -65,11 +103,45 @@ if __name__ == "__main__":
     videos_csv_file = os.path.join(os.getcwd(), DATA_DIR, videos_filename)
     categories_json_file = os.path.join(os.getcwd(), DATA_DIR, categories_filename)
 
-    # Run preprocessing
-    data = preprocess(comments_csv_file, videos_csv_file, categories_json_file)
+    with metrics.run("extract", args.metrics, args.profile, vars(args)), \
+            sentiment_cache.open_cache(args.cache) as scores_cache:
+        quarantine_file = args.quarantine
+        if quarantine_file is None:
+            quarantine_file = quarantine.quarantine_path(args.output)
+        # an incremental run adds to the rows quarantined by the earlier runs
+        quarantine_rows = quarantine.Quarantine(quarantine_file, append=args.incremental)
 
-    # Write out data to file
-    with open(args.output, "w") as outfile:
-        json.dump(data, outfile)
+        if args.incremental:
+            added = ingest.ingest(args.output, args.format, comments_csv_file, videos_csv_file, categories_json_file,
+                                  args.jobs, args.sentiment, scores_cache, args.rankings, quarantine_rows)
+            quarantine_rows.flush()
+            if quarantine_rows.total() > 0:
+                print(quarantine_rows.summary())
+            if added is None:
+                print("incremental: %s is up to date" % args.output)
+            else:
+                print("incremental: ingested %d comments and %d videos" % added)
+            # the term matrix is out of date once rows were ingested
+            if args.terms and term_matrix.load_matrix(args.output) is None:
+                term_matrix.write_matrix(term_matrix.build_matrix(data_store.load_data(args.output)), args.output)
+            exit(0)
+
+        # Run preprocessing
+        series = time_series.TimeSeriesBuilder()
+        data = preprocess(comments_csv_file, videos_csv_file, categories_json_file, args.jobs, series, quarantine_rows)
+        if quarantine_rows.total() > 0:
+            print(quarantine_rows.summary())
+
+        # Optional enrichment - score every comment once here, instead of in every report
+        if args.sentiment:
+            sentiment_engine.add_sentiments(data, args.jobs, scores_cache)
+
+        # Write out data to file
+        data_store.write_data(data, args.output, args.format, args.rankings)
+        time_series.write_time_series(series.build(), args.output)
+        if args.terms:
+            term_matrix.write_matrix(term_matrix.build_matrix(data), args.output)
+        # the output no longer matches the manifest of an earlier incremental run
+        ingest.remove_manifest(args.output)
 
     exit(0)
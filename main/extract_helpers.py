@@ -1,11 +1,23 @@
+import collections
 import csv
+import functools
 import json
+import os
 import re
 
+import metrics
+import quarantine
+
+# number of csv rows handed out at a time when streaming an input file
+CHUNK_SIZE = 10000
+# a quoted field that runs over more lines than this is taken for a stray quote
+MAX_RECORD_LINES = 100
+
+
 ###################
 # Data Extraction #
 ###################
-def extract_video_data(videos_file):
+def extract_video_data(videos_file, has_header=True, time_series=None, quarantine_rows=None, first_line=1):
     """
     Extract video data.
 
@@ -17,41 +29,57 @@ def extract_video_data(videos_file):
             ...
         }
     }
+    The numeric fields (views, likes, dislikes, comment_total) are converted to ints.
+    A video has a row for every date it was trending on, only the last one is kept here. Every row can be collected
+    in a time_series.TimeSeriesBuilder as well. Malformed rows are set aside in quarantine_rows.
     :param videos_file: file handler
+    :param has_header: bool, whether the first row is a header
+    :param time_series: time_series.TimeSeriesBuilder, or None
+    :param quarantine_rows: quarantine.Quarantine, or None
+    :param first_line: int, line number of the first line of videos_file in the videos file
     :return: dictionary
     """
     videos_data = {}
-    for i, line in enumerate(videos_file):
-        if i == 0:
-            continue
-
-        # Parse line
-        line = line.strip()
-        fields = separate_csv_line(line)
-        video_id = fields[0]
-        title = fields[1]
-        channel_title = fields[2]
-        category_id = fields[3]
-        tags = fields[4]
-        views = fields[5]
-        likes = fields[6]
-        dislikes = fields[7]
-        comment_total = fields[8]
-        thumbnail_link = fields[9]
-        date = fields[10]
-
-        videos_data[video_id] = {
-            "title": title,
-            "channel_title": channel_title,
-            "category_id": category_id,
-            "tags": tags,
-            "views": views,
-            "likes": likes,
-            "dislikes": dislikes,
-            "comment_total": comment_total,
-            "thumbnail_link": thumbnail_link,
-            "date": date
-        }
+    source = file_name(videos_file)
+    bad_row = None if quarantine_rows is None else functools.partial(quarantine_rows.add, source)
+    for line_numbers, chunk in read_numbered_chunks(videos_file, has_header=has_header, first_line=first_line,
+                                                    bad_row=bad_row):
+        metrics.count("video_rows_read", len(chunk))
+        for line, fields in zip(line_numbers, chunk):
+            try:
+                video_id = fields[0]
+                title = fields[1]
+                channel_title = fields[2]
+                category_id = fields[3]
+                tags = fields[4]
+                views = int(fields[5])
+                likes = int(fields[6])
+                dislikes = int(fields[7])
+                comment_total = int(fields[8])
+                thumbnail_link = fields[9]
+                date = fields[10]
+            except (IndexError, ValueError):
+                if quarantine_rows is not None:
+                    quarantine_rows.add(source, line, malformed_reason(fields, 11), fields)
+                continue
+            if time_series is not None:
+                added = time_series.add(video_id, category_id, date, (views, likes, dislikes, comment_total))
+                if not added and quarantine_rows is not None:
+                    # the video is kept, but the row is left out of the time series
+                    quarantine_rows.add(source, line, quarantine.BAD_DATE, fields)
+
+            videos_data[video_id] = {
+                "title": title,
+                "channel_title": channel_title,
+                "category_id": category_id,
+                "tags": tags,
+                "views": views,
+                "likes": likes,
+                "dislikes": dislikes,
+                "comment_total": comment_total,
+                "thumbnail_link": thumbnail_link,
+                "date": date
+            }
     return videos_data
 
 
@@ -76,7 +104,7 @@ def extract_categories_data(categories_file):
     return categories_data
 
 
-def parse_comments_data(videos_data, categories_data, comments_file):
+def parse_comments_data(videos_data, categories_data, comments_file, quarantine_rows=None):
     """
     Parse comments.
     Requires having the videos_data and categories_data available, so that we can combine all the data from these
@@ -99,68 +127,308 @@ def parse_comments_data(videos_data, categories_data, comments_file):
             ]
         }
     }
+    Malformed rows, and the comments of unknown videos (or of videos of an unknown category), are skipped and set aside
+    in quarantine_rows.
     :param videos_data: dictionary
     :param categories_data: dictionary
     :param comments_file: file handle
+    :param quarantine_rows: quarantine.Quarantine, or None
     :return: dictionary containing all data entries
     """
     all_data = {}
-    for i, line in enumerate(comments_file):
-        if i == 0:
-            # first line of the file is the header
-            continue
-
-        # Parse line
-        line = line.strip()
-        try:
-            fields = separate_csv_line(line)
-            video_id = fields[0]
-            comment_text = fields[1]
-            likes = fields[2]
-            replies = fields[3]
-        except Exception as e:
-            # There are a bunch of exceptions that will come up due to bad input data. Simply skip these entries
-            print("warning: exception encountered when parsing the comments file", e)
-            continue
-
-        comment_entry = {
-            # make sure to preprocess the comment text
-            "comment_text": preprocess_string(comment_text),
-            "likes": likes,
-            "replies": replies
-        }
-        # If video_id of this comment already exists in the dictionary, add the comment to its comment list
-        if video_id in all_data:
-            all_data[video_id]["comments"].append(comment_entry)
-        # Otherwise, create a new entry - make sure to fetch the appropriate video and category data
-        else:
-            # this stuff is done to avoid keyerrors that may arise (for GB dataset)
-            cat_id = videos_data[video_id]["category_id"]
-            if cat_id not in categories_data:
+    num_rows = 0
+    num_malformed = 0
+    num_parsed = 0
+    source = file_name(comments_file)
+    bad_row = None if quarantine_rows is None else functools.partial(quarantine_rows.add, source)
+    for line_numbers, chunk in read_numbered_chunks(comments_file, bad_row=bad_row):
+        num_rows += len(chunk)
+        for line, fields in zip(line_numbers, chunk):
+            parsed = create_comment_entry(fields)
+            if parsed is None:
+                num_malformed += 1
+                if quarantine_rows is not None:
+                    quarantine_rows.add(source, line, malformed_reason(fields, 4), fields)
                 continue
+            video_id, comment_entry = parsed
+
+            # If video_id of this comment already exists in the dictionary, add the comment to its comment list
+            if video_id in all_data:
+                all_data[video_id]["comments"].append(comment_entry)
+            # Otherwise, create a new entry - make sure to fetch the appropriate video and category data
+            else:
+                video_data = create_video_entry(video_id, videos_data, categories_data)
+                if video_data is None:
+                    if quarantine_rows is not None:
+                        quarantine_rows.add(source, line, video_reason(video_id, videos_data, categories_data),
+                                            fields)
+                    continue
+                video_data["comments"].append(comment_entry)
+                all_data[video_id] = video_data
+            num_parsed += 1
+
+    count_comment_rows(num_rows, num_malformed, num_parsed)
+    return all_data
 
-            video_data = {
-                "title": videos_data[video_id]["title"],
-                "channel_title": videos_data[video_id]["channel_title"],
-                "category_id": videos_data[video_id]["category_id"],
-                "category_name": categories_data[videos_data[video_id]["category_id"]],
-                "tags": videos_data[video_id]["tags"],
-                "views": videos_data[video_id]["views"],
-                "likes": videos_data[video_id]["likes"],
-                "dislikes": videos_data[video_id]["dislikes"],
-                "comment_total": videos_data[video_id]["comment_total"],
-                "thumbnail_link": videos_data[video_id]["thumbnail_link"],
-                "date": videos_data[video_id]["date"],
-                "comments": [comment_entry]
-            }
-            all_data[video_id] = video_data
 
-    return all_data
+def count_comment_rows(num_rows, num_malformed, num_parsed):
+    """
+    Record the rows of the comments file in the metrics of the run.
+
+    :param num_rows: int, number of rows read
+    :param num_malformed: int, number of rows that could not be parsed
+    :param num_parsed: int, number of comments kept (the others belong to videos that are skipped)
+    """
+    metrics.count("rows_read", num_rows)
+    metrics.count("rows_parsed", num_parsed)
+    metrics.count("rows_skipped", num_rows - num_parsed)
+    metrics.count("rows_malformed", num_malformed)
+
+
+def create_comment_entry(fields):
+    """
+    Create a comment entry out of the fields of a row of the comments file.
+    Returns a tuple of (video id, comment entry), or None if the row is malformed (see malformed_reason()).
+    The likes and replies are converted to ints.
+
+    :param fields: list of strings
+    :return: tuple of (string, dictionary), or None
+    """
+    try:
+        video_id = fields[0]
+        comment_text = fields[1]
+        likes = int(fields[2])
+        replies = int(fields[3])
+    except (IndexError, ValueError):
+        # There are a bunch of bad rows in the input data. Simply skip these entries
+        return None
+
+    comment_entry = {
+        # make sure to preprocess the comment text
+        "comment_text": preprocess_string(comment_text),
+        "likes": likes,
+        "replies": replies
+    }
+    return video_id, comment_entry
+
+
+def create_video_entry(video_id, videos_data, categories_data):
+    """
+    Create a new data entry for video_id, combining the video and category data. The comment list starts out empty.
+    Returns None if the video is unknown, or if its category is unknown (this happens for the GB dataset), see
+    video_reason().
+
+    :param video_id: string
+    :param videos_data: dictionary
+    :param categories_data: dictionary
+    :return: dictionary, or None
+    """
+    video = videos_data.get(video_id)
+    if video is None:
+        return None
+    cat_id = video["category_id"]
+    if cat_id not in categories_data:
+        return None
+
+    return {
+        "title": video["title"],
+        "channel_title": video["channel_title"],
+        "category_id": cat_id,
+        "category_name": categories_data[cat_id],
+        "tags": video["tags"],
+        "views": video["views"],
+        "likes": video["likes"],
+        "dislikes": video["dislikes"],
+        "comment_total": video["comment_total"],
+        "thumbnail_link": video["thumbnail_link"],
+        "date": video["date"],
+        "comments": []
+    }
+
+
+def malformed_reason(fields, num_fields):
+    """
+    :param fields: list of strings, a row that could not be parsed
+    :param num_fields: int, number of fields a row should have
+    :return: string, the quarantine reason
+    """
+    return quarantine.MISSING_FIELDS if len(fields) < num_fields else quarantine.BAD_NUMBER
+
+
+def video_reason(video_id, videos_data, categories_data):
+    """
+    :param video_id: string, a video for which create_video_entry() returned None
+    :param videos_data: dictionary
+    :param categories_data: dictionary
+    :return: string, the quarantine reason
+    """
+    return quarantine.UNKNOWN_VIDEO if video_id not in videos_data else quarantine.UNKNOWN_CATEGORY
+
+
+def video_status(videos_data, categories_data):
+    """
+    Same as video_reason(), for every video, in a form that is cheap to hand to worker processes.
+
+    :param videos_data: dictionary
+    :param categories_data: dictionary
+    :return: dictionary of {video_id: None if its comments are kept, otherwise the quarantine reason}
+    """
+    return {video_id: None if video["category_id"] in categories_data else quarantine.UNKNOWN_CATEGORY
+            for (video_id, video) in videos_data.items()}
 
 
 ###########
 # Utility #
 ###########
+def read_csv_chunks(csv_file, chunk_size=CHUNK_SIZE, has_header=True, bad_row=None):
+    """
+    Stream the rows of a csv file, chunk_size rows at a time.
+    A single csv reader runs over the whole file, so quoted fields that span several lines are parsed correctly
+    (the file should be opened with newline=""). The header row is skipped. A record that cannot be right (a stray
+    quote) is not taken as a row, see read_numbered_chunks().
+
+    :param csv_file: file handle
+    :param chunk_size: int, maximum number of rows per chunk
+    :param has_header: bool, whether the first row is a header that should be skipped
+    :param bad_row: function called for every line that is skipped, see read_numbered_chunks(), or None
+    :return: generator of lists of rows, each row being a list of strings
+    """
+    for line_numbers, chunk in read_numbered_chunks(csv_file, chunk_size, has_header, bad_row=bad_row):
+        yield chunk
+
+
+def read_numbered_chunks(csv_file, chunk_size=CHUNK_SIZE, has_header=True, first_line=1, bad_row=None):
+    """
+    Same as read_csv_chunks(), along with the line number at which each row starts (rows may span several lines).
+
+    A stray quote in a field opens a quoted field that csv runs on into the rows after it, up to the next quote (or
+    up to its field limit, where it gives up). So a record that spans several lines is only taken as a row if its
+    quoting is right (see record_reason()). Otherwise its first line is skipped, and reading resynchronises at the
+    line after it, which is read again, as are the other lines of the record.
+
+    :param csv_file: file handle
+    :param chunk_size: int, maximum number of rows per chunk
+    :param has_header: bool, whether the first row is a header that should be skipped
+    :param first_line: int, line number of the first line of csv_file
+    :param bad_row: function called with (line number, quarantine reason, list of the line) for every line that is
+                    skipped, after the rows before it have been handed out, or None
+    :return: generator of tuples of (list of line numbers, list of rows)
+    """
+    lines = RecordLines(csv_file)
+    reader = csv.reader(lines, delimiter=",")
+    line = first_line
+    skip = has_header
+    line_numbers = []
+    chunk = []
+    while True:
+        try:
+            fields = next(reader)
+            reason = record_reason(lines.record, lines.at_end)
+        except StopIteration:
+            break
+        except csv.Error:
+            # a field larger than the field limit of csv
+            fields, reason = None, quarantine.BAD_QUOTING
+        record = lines.take_record()
+        if reason is not None:
+            lines.read_again(record[1:])
+            record = record[:1]
+            if not skip and bad_row is not None:
+                if chunk:
+                    yield line_numbers, chunk
+                    line_numbers = []
+                    chunk = []
+                bad_row(line, reason, [record[0].rstrip("\r\n")])
+        elif not skip:
+            line_numbers.append(line)
+            chunk.append(fields)
+            if len(chunk) == chunk_size:
+                yield line_numbers, chunk
+                line_numbers = []
+                chunk = []
+        skip = False
+        line += len(record)
+    if chunk:
+        yield line_numbers, chunk
+
+
+def record_reason(record, at_end):
+    """
+    Check the quoting of a record read by csv. A quoted field that is still open at the end of the file, that runs
+    over more than MAX_RECORD_LINES lines, or that is followed by something else than a delimiter (csv keeps such
+    characters when it is not strict), most likely starts at a stray quote.
+
+    :param record: list of strings, the lines of the record
+    :param at_end: bool, whether the end of the file was reached while reading the record
+    :return: string, the quarantine reason, or None if the record is fine
+    """
+    if at_end:
+        return quarantine.UNCLOSED_QUOTE
+    if len(record) == 1:
+        return None
+    if len(record) > MAX_RECORD_LINES:
+        return quarantine.BAD_QUOTING
+    try:
+        for fields in csv.reader(record, delimiter=",", strict=True):
+            pass
+    except csv.Error:
+        return quarantine.BAD_QUOTING
+    return None
+
+
+class RecordLines(object):
+    """
+    The lines of a csv file, as handed to a csv reader. The lines of the record being read are kept, so that they
+    can be read again when the record turns out to be bad (see read_numbered_chunks()).
+    """
+    def __init__(self, csv_file):
+        """
+        :param csv_file: file handle
+        """
+        self.lines = iter(csv_file)
+        self.again = collections.deque()
+        self.record = []
+        self.at_end = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.again:
+            line = self.again.popleft()
+        else:
+            line = next(self.lines, None)
+            if line is None:
+                self.at_end = True
+                raise StopIteration
+        self.record.append(line)
+        return line
+
+    def take_record(self):
+        """
+        :return: list of strings, the lines of the record that was just read
+        """
+        record = self.record
+        self.record = []
+        self.at_end = False
+        return record
+
+    def read_again(self, record_lines):
+        """
+        :param record_lines: list of strings, lines to hand out again, before the lines that follow them
+        """
+        self.again.extendleft(reversed(record_lines))
+
+
+def file_name(csv_file):
+    """
+    :param csv_file: file handle
+    :return: string, the name of the file (without its directory), or None for an in-memory file
+    """
+    name = getattr(csv_file, "name", None)
+    return os.path.basename(name) if isinstance(name, str) else None
+
+
 def separate_csv_line(s):
     """
     Split a line of a csv file.
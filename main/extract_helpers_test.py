@@ -1,3 +1,4 @@
+import io
 import unittest
 import extract_helpers
 
@@ -22,6 +23,93 @@ class TestSeparateCSVLine(unittest.TestCase):
         self.assertEqual(expected, actual)
 
 
+class TestReadCSVChunks(unittest.TestCase):
+    def test_skips_header(self):
+        f = io.StringIO('a,b\n1,2\n3,4\n')
+        expected = [[['1', '2'], ['3', '4']]]
+        actual = list(extract_helpers.read_csv_chunks(f))
+        self.assertEqual(expected, actual)
+
+    def test_chunking(self):
+        f = io.StringIO('a\n1\n2\n3\n')
+        expected = [[['1'], ['2']], [['3']]]
+        actual = list(extract_helpers.read_csv_chunks(f, chunk_size=2))
+        self.assertEqual(expected, actual)
+
+    def test_multiline_field(self):
+        f = io.StringIO('a,b\n"hello\nworld",1\nnext,2\n')
+        expected = [[['hello\nworld', '1'], ['next', '2']]]
+        actual = list(extract_helpers.read_csv_chunks(f))
+        self.assertEqual(expected, actual)
+
+    def read_numbered(self, text):
+        bad = []
+        rows = [(line, fields)
+                for (line_numbers, chunk) in extract_helpers.read_numbered_chunks(io.StringIO(text, newline=""),
+                                                                                bad_row=lambda *row: bad.append(row))
+                for (line, fields) in zip(line_numbers, chunk)]
+        return rows, bad
+
+    def test_stray_quote(self):
+        # the stray quote would swallow the next row, up to the quote of the row after it
+        rows, bad = self.read_numbered('a,b,c,d\nv1,"great,3,4\nv2,ok,1,0\nv3,"x",2,0\n')
+        self.assertEqual([(3, ['v2', 'ok', '1', '0']), (4, ['v3', 'x', '2', '0'])], rows)
+        self.assertEqual([(2, "bad_quoting", ['v1,"great,3,4'])], bad)
+
+    def test_unclosed_quote(self):
+        rows, bad = self.read_numbered('a,b,c,d\nv1,"hello\nworld",1,0\nv1,"great,3,4\nv2,ok,1,0\n')
+        self.assertEqual([(2, ['v1', 'hello\nworld', '1', '0']), (5, ['v2', 'ok', '1', '0'])], rows)
+        self.assertEqual([(4, "unclosed_quote", ['v1,"great,3,4'])], bad)
+
+    def test_field_limit(self):
+        # csv gives up on a field that is larger than its field limit
+        rows, bad = self.read_numbered('a,b,c,d\nv1,"great,3,4\n' + 'v2,ok,1,0\n' * 20000 + 'v3,"x",2,0\n')
+        self.assertEqual(20001, len(rows))
+        self.assertEqual((20003, ['v3', 'x', '2', '0']), rows[-1])
+        self.assertEqual([(2, "bad_quoting", ['v1,"great,3,4'])], bad)
+
+    def test_too_many_lines(self):
+        text = 'a,b\nv1,"line\n' + 'line\n' * (extract_helpers.MAX_RECORD_LINES - 1) + 'end",0\nv2,ok\n'
+        rows, bad = self.read_numbered(text)
+        self.assertEqual([(2, "bad_quoting", ['v1,"line'])], bad)
+        self.assertEqual((extract_helpers.MAX_RECORD_LINES + 3, ['v2', 'ok']), rows[-1])
+
+
+class TestParseCommentsData(unittest.TestCase):
+    VIDEOS = {
+        "v1": {"title": "t", "channel_title": "c", "category_id": "1", "tags": "", "views": "10", "likes": "2",
+               "dislikes": "1", "comment_total": "3", "thumbnail_link": "", "date": "13.09"},
+        "v2": {"title": "t2", "channel_title": "c2", "category_id": "99", "tags": "", "views": "5", "likes": "0",
+               "dislikes": "0", "comment_total": "1", "thumbnail_link": "", "date": "14.09"}
+    }
+    CATEGORIES = {"1": "Film"}
+
+    def test_join(self):
+        f = io.StringIO('video_id,comment_text,likes,replies\nv1,"first\nline",4,0\nv1, second ,1,2\n')
+        data = extract_helpers.parse_comments_data(self.VIDEOS, self.CATEGORIES, f)
+        self.assertEqual(["v1"], list(data))
+        self.assertEqual("Film", data["v1"]["category_name"])
+        self.assertEqual(["firstline", "second"], [c["comment_text"] for c in data["v1"]["comments"]])
+
+    def test_skips_unknown_category_and_bad_rows(self):
+        f = io.StringIO('video_id,comment_text,likes,replies\nv2,hi,1,0\nbroken\nv1,bad,x,0\nv1,ok,1,0\n')
+        data = extract_helpers.parse_comments_data(self.VIDEOS, self.CATEGORIES, f)
+        self.assertEqual(["v1"], list(data))
+        self.assertEqual([{"comment_text": "ok", "likes": 1, "replies": 0}], data["v1"]["comments"])
+
+
+class TestExtractVideoData(unittest.TestCase):
+    def test_typed_numbers(self):
+        f = io.StringIO('video_id,title,channel_title,category_id,tags,views,likes,dislikes,comment_total,'
+                        'thumbnail_link,date\n'
+                        'v1,"a, title",chan,24,tag1|tag2,100,5,1,2,http://x,13.09\n')
+        data = extract_helpers.extract_video_data(f)
+        self.assertEqual("a, title", data["v1"]["title"])
+        self.assertEqual("24", data["v1"]["category_id"])
+        self.assertEqual((100, 5, 1, 2), (data["v1"]["views"], data["v1"]["likes"], data["v1"]["dislikes"],
+                                          data["v1"]["comment_total"]))
+
+
 class TestPreprocessingString(unittest.TestCase):
     def test_remove_whitespace(self):
         s = "      hello world "
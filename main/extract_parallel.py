@@ -0,0 +1,313 @@
+"""
+extract_parallel.py
+
+Parallel version of the comments parsing done in extract_helpers.parse_comments_data.
+
+The comments file is split into byte ranges that start and end on record boundaries (a quoted comment may span
+several lines, so a newline is only a record boundary when it is not inside quotes). Each range is parsed and
+preprocessed in a process pool, and the per-video comment lists are merged in file order, so that the output is
+identical to the serial path.
+
+The boundaries are found by counting quotes, which a stray quote in an unquoted field throws off. They are checked
+twice: find_shard_ranges only keeps the boundaries where a well-formed row starts, and a range that ends inside a
+quoted field (so the next boundary was not one) is parsed again serially, up to the end (see parse_shards).
+"""
+
+import csv
+import io
+import os
+from multiprocessing import Pool
+
+import quarantine
+from extract_helpers import count_comment_rows, create_comment_entry, create_video_entry, malformed_reason, \
+    read_numbered_chunks, video_status
+
+# size of the blocks read when looking for record boundaries
+BLOCK_SIZE = 1 << 20
+# number of bytes read to check the record at a boundary
+RECORD_CHECK_SIZE = 1 << 16
+# number of shards per worker process, more shards balance the load better
+SHARDS_PER_JOB = 4
+
+# the status of the videos in a worker process, see init_worker()
+worker_status = None
+
+
+def find_shard_ranges(comments_path, num_shards, block_size=BLOCK_SIZE, start=None, end=None):
+    """
+    Split the comments file into (at most) num_shards byte ranges, each starting at the beginning of a record.
+    The header line is not part of any range. With start/end, only the records in [start, end) are split up
+    (start has to be the beginning of a record, end the end of one).
+
+    Quotes are counted to know whether a newline is inside a quoted field. Inside a quoted field, a literal quote is
+    escaped by doubling it, so the parity of the number of quotes seen so far tells us if we are inside quotes.
+    A stray quote in an unquoted field (which csv keeps as a literal character) throws the count off for the rest of
+    the file though, and the boundaries after it can then be newlines inside quoted comments. So a boundary is only
+    kept if a well-formed record starts there (see record_starts_at). A range whose start is dropped is merged into
+    the range before it, and parsed serially along with it.
+
+    :param comments_path: string, filename of the comments csv file
+    :param num_shards: int, number of ranges to split the file into
+    :param block_size: int, number of bytes read at a time
+    :param start: int, offset of the first record, defaults to the one after the header
+    :param end: int, offset after the last record, defaults to the size of the file
+    :return: list of tuples, (start offset, end offset)
+    """
+    size = os.path.getsize(comments_path) if end is None else end
+    with open(comments_path, "rb") as comments_file:
+        if start is None:
+            start = len(comments_file.readline())
+        else:
+            comments_file.seek(start)
+        boundaries = [start]
+
+        in_quotes = False
+        searching = False
+        pos = start
+        while len(boundaries) < num_shards and pos < size:
+            block = comments_file.read(min(block_size, size - pos))
+            if not block:
+                break
+
+            i = 0
+            while len(boundaries) < num_shards:
+                if not searching:
+                    # skip ahead to the next target offset, keeping track of the quote parity
+                    target = start + (size - start) * len(boundaries) // num_shards
+                    if target >= pos + len(block):
+                        break
+                    local_target = max(target - pos, i)
+                    in_quotes ^= block.count(b'"', i, local_target) % 2 == 1
+                    i = local_target
+                    searching = True
+
+                # find the first newline after the target that is not inside quotes
+                newline = block.find(b"\n", i)
+                if newline == -1:
+                    break
+                in_quotes ^= block.count(b'"', i, newline) % 2 == 1
+                i = newline + 1
+                if not in_quotes and pos + i < size:
+                    boundaries.append(pos + i)
+                    searching = False
+
+            in_quotes ^= block.count(b'"', i) % 2 == 1
+            pos += len(block)
+
+        boundaries = boundaries[:1] + [offset for offset in boundaries[1:]
+                                       if record_starts_at(comments_file, offset, size)]
+
+    boundaries.append(size)
+    return [(s, e) for (s, e) in zip(boundaries, boundaries[1:]) if s < e]
+
+
+def record_starts_at(comments_file, offset, end):
+    """
+    Whether the record that starts at offset is a well-formed comment row. When offset is wrongly taken for a record
+    boundary, the "record" there is the end of a quoted comment, which does not have the fields of a row.
+    A row that is malformed to begin with fails this check as well, its range is then just merged with the one before.
+
+    :param comments_file: file handle, opened in binary mode
+    :param offset: int
+    :param end: int, offset after the last record
+    :return: bool
+    """
+    comments_file.seek(offset)
+    text = comments_file.read(min(RECORD_CHECK_SIZE, end - offset)).decode("utf-8", errors="replace")
+    fields = next(csv.reader(io.StringIO(text, newline="")), None)
+    return fields is not None and create_comment_entry(fields) is not None
+
+
+def init_worker(status):
+    """
+    Set the status of the videos (see extract_helpers.video_status) in a worker process. The worker processes are
+    forked, so the table is not copied for every shard.
+
+    :param status: dictionary of {video_id: None or quarantine reason}, or None to keep every comment
+    """
+    global worker_status
+    worker_status = status
+
+
+def parse_comments_shard(shard):
+    """
+    Parse and preprocess the comments in one byte range of the comments file.
+    Returns the comments grouped by video id, with video ids in the order they first appear in the range.
+
+    :param shard: tuple of (comments filename, start offset, end offset)
+    :return: dictionary of {video_id: list of comment entries}
+    """
+    return parse_counted_shard(shard, None)[0]
+
+
+def parse_counted_shard(shard, status=False):
+    """
+    Same as parse_comments_shard(), but the rows that are not kept are returned as well (for the quarantine and the
+    metrics of the run, which are only kept in the main process).
+
+    With the status of the videos, the comments of unknown videos, or of videos of an unknown category, are not kept.
+    The line numbers of the rows start at 1 at the start of the range, the caller knows where the range starts.
+
+    :param shard: tuple of (comments filename, start offset, end offset)
+    :param status: dictionary of {video_id: None or quarantine reason}, None to keep every comment, defaults to the
+                   one given to init_worker()
+    :return: tuple of (dictionary of {video_id: list of comment entries}, number of rows, number of lines,
+             list of (line number, quarantine reason, fields) of the rows that are not kept, dictionary of
+             {video_id: line number of its first comment}, bool, whether the range ends inside a quoted field)
+    """
+    if status is False:
+        status = worker_status
+    comments_path, start, end = shard
+    with open(comments_path, "rb") as comments_file:
+        comments_file.seek(start)
+        text = comments_file.read(end - start).decode("utf-8", errors="replace")
+
+    comments_by_video = {}
+    num_rows = 0
+    rejected = []
+    first_lines = {}
+    for line_numbers, chunk in read_numbered_chunks(io.StringIO(text, newline=""), has_header=False,
+                                                    bad_row=lambda *row: rejected.append(row)):
+        num_rows += len(chunk)
+        for line, fields in zip(line_numbers, chunk):
+            parsed = create_comment_entry(fields)
+            if parsed is None:
+                rejected.append((line, malformed_reason(fields, 4), fields))
+                continue
+            video_id, comment_entry = parsed
+            if status is not None:
+                reason = status.get(video_id, quarantine.UNKNOWN_VIDEO)
+                if reason is not None:
+                    rejected.append((line, reason, fields))
+                    continue
+            if video_id not in comments_by_video:
+                comments_by_video[video_id] = []
+                first_lines[video_id] = line
+            comments_by_video[video_id].append(comment_entry)
+    # a quoted field that is still open at the end of the range may go on in the next range
+    open_end = any(reason == quarantine.UNCLOSED_QUOTE for (line, reason, fields) in rejected)
+    return comments_by_video, num_rows, text.count("\n"), rejected, first_lines, open_end
+
+
+def parse_shards(pool, shards, status):
+    """
+    Parse the shards in a process pool, see parse_counted_shard(). The first shard starts on a record boundary, and
+    so does every shard after a shard that does not end inside a quoted field. When a shard does end inside a quoted
+    field, the boundaries after it are not to be trusted: everything from the start of that shard is parsed serially
+    in this process instead.
+
+    :param pool: multiprocessing.Pool, its workers initialized with the status (see init_worker())
+    :param shards: list of tuples of (comments filename, start offset, end offset), consecutive ranges
+    :param status: dictionary of {video_id: None or quarantine reason}, or None
+    :return: generator of the results of parse_counted_shard() (without the last value), in file order
+    """
+    for shard, result in zip(shards, pool.imap(parse_counted_shard, shards)):
+        comments_path, start, end = shard
+        # find_shard_ranges only keeps a boundary where the quote count says we are outside quotes and a well-formed
+        # row starts (record_starts_at). After a stray quote the count is off, and a line inside a quoted comment
+        # that looks like a row fools both checks. The range before such a boundary ends inside the quoted comment,
+        # its last record is still open at the end of the range (so is the one of a range that ends on a stray
+        # quote). Only then are the results of the workers dropped, from this range on, and the rest of the file is
+        # parsed here in one go, like the serial path would.
+        if result[-1] and end != shards[-1][2]:
+            yield parse_counted_shard((comments_path, start, shards[-1][2]), status)[:-1]
+            return
+        yield result[:-1]
+
+
+def count_rejected_rows(num_rows, rejected, num_parsed):
+    """
+    Record the rows of the comments file in the metrics of the run.
+
+    :param num_rows: int, number of rows read
+    :param rejected: list of (line number, quarantine reason, fields), the rows that were not kept
+    :param num_parsed: int, number of comments kept
+    """
+    malformed = (quarantine.MISSING_FIELDS, quarantine.BAD_NUMBER)
+    count_comment_rows(num_rows, sum(1 for (line, reason, fields) in rejected if reason in malformed), num_parsed)
+
+
+def parse_comments_range(comments_path, start, end, jobs=1, status=None, first_line=1, quarantine_rows=None):
+    """
+    Parse and preprocess the comments in [start, end) of the comments file, in jobs processes.
+
+    :param comments_path: string, filename of the comments csv file
+    :param start: int, offset of the first record
+    :param end: int, offset after the last record
+    :param jobs: int, number of worker processes, 1 to parse in this process
+    :param status: dictionary of {video_id: None or quarantine reason} (see extract_helpers.video_status), or None
+                   to keep the comments of every video
+    :param first_line: int, line number of the line at start
+    :param quarantine_rows: quarantine.Quarantine, or None
+    :return: tuple of (dictionary of {video_id: list of comment entries}, dictionary of {video_id: line number of
+             its first comment}, list of (line number, quarantine reason, fields) of the rows that are not kept), see
+             parse_shard_results()
+    """
+    source = os.path.basename(comments_path)
+    if jobs <= 1:
+        shard_results = [parse_counted_shard((comments_path, start, end), status)[:-1]]
+        return parse_shard_results(shard_results, first_line, source, quarantine_rows)
+
+    shards = [(comments_path, s, e)
+              for (s, e) in find_shard_ranges(comments_path, jobs * SHARDS_PER_JOB, start=start, end=end)]
+    with Pool(jobs, initializer=init_worker, initargs=(status,)) as pool:
+        return parse_shard_results(parse_shards(pool, shards, status), first_line, source, quarantine_rows)
+
+
+def parse_shard_results(shard_results, first_line, source, quarantine_rows=None):
+    """
+    Merge the results of parse_counted_shard() for consecutive shards, in file order.
+
+    :param shard_results: iterable of the results of parse_counted_shard() (without the last value)
+    :param first_line: int, line number of the first line of the first shard
+    :param source: string, name of the comments file, for the quarantine
+    :param quarantine_rows: quarantine.Quarantine, or None
+    :return: tuple of (dictionary of {video_id: list of comment entries}, dictionary of {video_id: line number of
+             its first comment}, list of (line number, quarantine reason, fields) of the rows that are not kept)
+    """
+    comments_by_video = {}
+    first_lines = {}
+    num_rows = 0
+    rejected = []
+    for shard_comments, shard_rows, shard_lines, shard_rejected, shard_first_lines in shard_results:
+        num_rows += shard_rows
+        rejected.extend((line + first_line - 1, reason, fields) for (line, reason, fields) in shard_rejected)
+        if quarantine_rows is not None:
+            quarantine_rows.add_rows(source, shard_rejected, first_line)
+        for video_id, comments in shard_comments.items():
+            if video_id not in comments_by_video:
+                comments_by_video[video_id] = []
+                first_lines[video_id] = shard_first_lines[video_id] + first_line - 1
+            comments_by_video[video_id].extend(comments)
+        first_line += shard_lines
+
+    count_rejected_rows(num_rows, rejected, sum(len(comments) for comments in comments_by_video.values()))
+    return comments_by_video, first_lines, rejected
+
+
+def parse_comments_data_parallel(videos_data, categories_data, comments_path, jobs, quarantine_rows=None):
+    """
+    Parallel equivalent of extract_helpers.parse_comments_data. Returns the same data entries, in the same order.
+
+    :param videos_data: dictionary
+    :param categories_data: dictionary
+    :param comments_path: string, filename of the comments csv file
+    :param jobs: int, number of worker processes
+    :param quarantine_rows: quarantine.Quarantine, or None
+    :return: dictionary containing all data entries
+    """
+    shards = [(comments_path, start, end)
+              for (start, end) in find_shard_ranges(comments_path, jobs * SHARDS_PER_JOB)]
+    # the comments of skipped videos are dropped by the workers
+    status = video_status(videos_data, categories_data)
+    with Pool(jobs, initializer=init_worker, initargs=(status,)) as pool:
+        # imap hands the shards back in file order, so the merge is deterministic. Line 1 is the header.
+        comments_by_video = parse_shard_results(parse_shards(pool, shards, status), 2,
+                                                os.path.basename(comments_path), quarantine_rows)[0]
+
+    all_data = {}
+    for video_id, comments in comments_by_video.items():
+        video_data = create_video_entry(video_id, videos_data, categories_data)
+        video_data["comments"].extend(comments)
+        all_data[video_id] = video_data
+    return all_data
@@ -0,0 +1,185 @@
+import csv
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import extract
+import extract_helpers
+import extract_parallel
+import quarantine
+
+HEADER = 'video_id,comment_text,likes,replies\n'
+COMMENTS = (
+    'v1,"hello\nworld, ""quoted""",1,0\n'
+    'v2,plain,2,1\n'
+    'v1,"multi\nline\ncomment",3,0\n'
+    'broken\n'
+    'v3,unknown category,0,0\n'
+    'v2,"a, b",4,2\n'
+    'v9,not in the videos file,0,0\n'
+)
+
+
+class TestShardedExtract(unittest.TestCase):
+    VIDEOS = {
+        video_id: {"title": video_id, "channel_title": "c", "category_id": category_id, "tags": "", "views": "1",
+                   "likes": "1", "dislikes": "0", "comment_total": "1", "thumbnail_link": "", "date": "13.09"}
+        for (video_id, category_id) in [("v1", "1"), ("v2", "1"), ("v3", "99")]
+    }
+    CATEGORIES = {"1": "Film"}
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "comments.csv")
+        with open(self.path, "w", newline="") as f:
+            f.write(HEADER + COMMENTS * 20)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_ranges_are_record_aligned(self):
+        with open(self.path, "rb") as f:
+            content = f.read()
+        for num_shards in [1, 2, 3, 7, 50]:
+            rows = []
+            ranges = extract_parallel.find_shard_ranges(self.path, num_shards, block_size=16)
+            for (start, end) in ranges:
+                shard = io.StringIO(content[start:end].decode("utf-8"), newline="")
+                for chunk in extract_helpers.read_csv_chunks(shard, has_header=False):
+                    rows.extend(chunk)
+            with open(self.path, newline="") as f:
+                expected = [row for chunk in extract_helpers.read_csv_chunks(f) for row in chunk]
+            self.assertEqual(expected, rows)
+
+    def test_same_as_serial(self):
+        with open(self.path, newline="") as f:
+            expected = extract_helpers.parse_comments_data(self.VIDEOS, self.CATEGORIES, f)
+        actual = extract_parallel.parse_comments_data_parallel(self.VIDEOS, self.CATEGORIES, self.path, 2)
+        self.assertEqual(list(expected), list(actual))
+        self.assertEqual(expected, actual)
+
+    def test_same_quarantine_as_serial(self):
+        expected = quarantine.Quarantine()
+        with open(self.path, newline="") as f:
+            extract_helpers.parse_comments_data(self.VIDEOS, self.CATEGORIES, f, expected)
+        self.assertEqual({quarantine.MISSING_FIELDS: 20, quarantine.UNKNOWN_CATEGORY: 20,
+                          quarantine.UNKNOWN_VIDEO: 20}, dict(expected.counts))
+
+        for jobs in [2, 3]:
+            path = os.path.join(self.dir, "quarantine-%d.csv" % jobs)
+            actual = quarantine.Quarantine(path)
+            extract_parallel.parse_comments_data_parallel(self.VIDEOS, self.CATEGORIES, self.path, jobs, actual)
+            actual.flush()
+            self.assertEqual(expected.counts, actual.counts)
+            rows = quarantine.read_quarantine(path)
+            # every copy of COMMENTS is 10 lines long, the header is line 1
+            expected_rows = []
+            for i in range(20):
+                expected_rows.extend([
+                    (os.path.basename(self.path), 8 + 10 * i, quarantine.MISSING_FIELDS, ["broken"]),
+                    (os.path.basename(self.path), 9 + 10 * i, quarantine.UNKNOWN_CATEGORY,
+                     ["v3", "unknown category", "0", "0"]),
+                    (os.path.basename(self.path), 11 + 10 * i, quarantine.UNKNOWN_VIDEO,
+                     ["v9", "not in the videos file", "0", "0"])])
+            self.assertEqual(expected_rows, rows)
+
+    def test_stray_quote(self):
+        # the quote in the unquoted field of the first row throws off the quote count for the rest of the file
+        path = os.path.join(self.dir, "stray.csv")
+        with open(path, "w", newline="") as f:
+            f.write(HEADER + 'v2,say "hi,5,0\n' + COMMENTS * 20)
+        with open(path, "rb") as f:
+            content = f.read()
+        for num_shards in [2, 7, 50]:
+            ranges = extract_parallel.find_shard_ranges(path, num_shards, block_size=16)
+            # only the boundaries where a well-formed row starts are kept
+            for (start, end) in ranges:
+                first = next(csv.reader(io.StringIO(content[start:end].decode("utf-8"), newline="")))
+                self.assertIsNotNone(extract_helpers.create_comment_entry(first))
+
+        with open(path, newline="") as f:
+            expected = extract_helpers.parse_comments_data(self.VIDEOS, self.CATEGORIES, f)
+        for jobs in [2, 3, 12]:
+            actual = extract_parallel.parse_comments_data_parallel(self.VIDEOS, self.CATEGORIES, path, jobs)
+            self.assertEqual(expected, actual)
+        start = len(HEADER)
+        expected = extract_parallel.parse_comments_shard((path, start, len(content)))
+        self.assertEqual(expected, extract_parallel.parse_comments_range(path, start, len(content), 3)[0])
+
+    def test_bad_input(self):
+        # a stray quote followed by more than the field limit of csv without a quote, and bytes that are not utf-8
+        comments = os.path.join(self.dir, "bad.csv")
+        with open(comments, "wb") as f:
+            f.write((HEADER + 'v1,"stray,1,0\n' + 'v2,plain,2,1\n' * 12000 + COMMENTS).encode("utf-8") +
+                    b'v2,caf\xe9,1,0\n')
+        videos = os.path.join(self.dir, "videos.csv")
+        with open(videos, "wb") as f:
+            f.write(b'video_id,title,channel_title,category_id,tags,views,likes,dislikes,comment_total,'
+                    b'thumbnail_link,date\n'
+                    b'v1,t\xff1,c,1,,1,1,0,1,,13.09\nv2,t2,c,1,,1,1,0,1,,13.09\nv3,t3,c,99,,1,1,0,1,,13.09\n')
+        categories = os.path.join(self.dir, "categories.json")
+        with open(categories, "w") as f:
+            f.write('{"items": [{"id": "1", "snippet": {"title": "Film"}}]}')
+
+        results = []
+        for jobs in [1, 3]:
+            rows = quarantine.Quarantine(os.path.join(self.dir, "quarantine-%d.csv" % jobs))
+            results.append((extract.preprocess(comments, videos, categories, jobs, quarantine_rows=rows),
+                            quarantine.read_quarantine(rows.path)))
+        self.assertEqual(results[0], results[1])
+        data, rows = results[0]
+        self.assertEqual("t\ufffd1", data["v1"]["title"])
+        self.assertEqual(12000 + 2 + 1, len(data["v2"]["comments"]))
+        self.assertEqual("caf\ufffd", data["v2"]["comments"][-1]["comment_text"])
+        self.assertEqual(("bad.csv", 2, quarantine.BAD_QUOTING, ['v1,"stray,1,0']), rows[0])
+
+    def test_quoted_newline_at_boundary(self):
+        # the middle of the file, where the boundary of two ranges is looked for, is the newline of a quoted comment
+        before = 'v2,plain,2,1\n' * 50
+        quoted = 'v1,"quoted\nv2,looks like a row,1,0",1,0\n'
+        # a row of the length that puts the middle of the file there
+        length = len(before) + 2 * quoted.index('\n') - len(quoted)
+        after = 'v2,' + 'x' * (length - len('v2,,0,0\n')) + ',0,0\n'
+        path = os.path.join(self.dir, "boundary.csv")
+        with open(path, "w", newline="") as f:
+            f.write(HEADER + before + quoted + after)
+        start = len(HEADER)
+        end = os.path.getsize(path)
+        self.assertEqual(start + len(before) + quoted.index('\n'), start + (end - start) // 2)
+        self.assertEqual([(start, start + len(before) + len(quoted)), (start + len(before) + len(quoted), end)],
+                         extract_parallel.find_shard_ranges(path, 2))
+
+        with open(path, newline="") as f:
+            expected = extract_helpers.parse_comments_data(self.VIDEOS, self.CATEGORIES, f)
+        self.assertEqual(["v2", "v1"], list(expected))
+        self.assertEqual(["quotedv2,looks like a row,1,0"], [c["comment_text"] for c in expected["v1"]["comments"]])
+        self.assertEqual(expected, extract_parallel.parse_comments_data_parallel(self.VIDEOS, self.CATEGORIES, path, 2))
+
+    def test_open_end(self):
+        # the second range would start inside the first quoted comment
+        split = len(HEADER) + COMMENTS.index("world")
+        self.assertTrue(extract_parallel.parse_counted_shard((self.path, len(HEADER), split), None)[-1])
+        split = len(HEADER) + COMMENTS.index("v2")
+        self.assertFalse(extract_parallel.parse_counted_shard((self.path, len(HEADER), split), None)[-1])
+
+    def test_range(self):
+        # the records of the last 10 copies of COMMENTS
+        start = len(HEADER) + len((COMMENTS * 10).encode("utf-8"))
+        end = os.path.getsize(self.path)
+        expected = extract_parallel.parse_comments_shard((self.path, start, end))
+        self.assertEqual(10, len(expected["v3"]))
+        for jobs in [1, 2]:
+            self.assertEqual(expected, extract_parallel.parse_comments_range(self.path, start, end, jobs)[0])
+        # the line numbers of the first comments (and of the rejected rows) do not depend on the shards
+        serial = extract_parallel.parse_comments_range(self.path, start, end, 1, first_line=100)
+        self.assertEqual(serial, extract_parallel.parse_comments_range(self.path, start, end, 3, first_line=100))
+        self.assertEqual(100, min(serial[1].values()))
+        for num_shards in [2, 5]:
+            ranges = extract_parallel.find_shard_ranges(self.path, num_shards, block_size=16, start=start, end=end)
+            self.assertEqual(start, ranges[0][0])
+            self.assertEqual(end, ranges[-1][1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,281 @@
+"""
+generate_data.py
+
+Generates a synthetic dataset, in the same format as the kaggle files that extract.py reads:
+<output dir>/data/<set>videos.csv, <set>comments.csv and <set>_category_id.json
+
+Usage:
+python3 main/generate_data.py -o bench -s US --videos 5000 --comments 10000000
+cd bench && python3 ../main/extract.py -s US -o output/preprocUS.json
+
+The data looks like the real thing, as far as the scripts are concerned:
+- every video trends for a few consecutive dates, with growing views/likes/dislikes/comment counts, and the videos
+  file has one row per video and date
+- the number of comments per video, and the words of the comments, follow Zipf distributions. Comments are made of
+  one or more sentences, with punctuation, some emoji, some positive and negative words (for VADER), and some of them
+  span several lines
+- a small fraction of the rows of the comments file are malformed, like in the real files
+
+Everything is generated from a seed, so the same arguments always give the same files. The files are written in
+batches, so tens of millions of comments can be generated without keeping them in memory.
+"""
+
+import argparse
+import csv
+import json
+import os
+
+import numpy as np
+
+DATA_DIR = "data"
+BATCH_SIZE = 100000
+
+# (category id, category name, relative number of videos), the assignable categories of the real files
+CATEGORIES = (
+    ("1", "Film & Animation", 4), ("2", "Autos & Vehicles", 2), ("10", "Music", 15), ("15", "Pets & Animals", 2),
+    ("17", "Sports", 6), ("19", "Travel & Events", 1), ("20", "Gaming", 1), ("22", "People & Blogs", 11),
+    ("23", "Comedy", 9), ("24", "Entertainment", 20), ("25", "News & Politics", 8), ("26", "Howto & Style", 11),
+    ("27", "Education", 4), ("28", "Science & Technology", 6), ("29", "Nonprofits & Activism", 1),
+)
+# the most frequent words come first, the vocabulary is completed with made up words
+COMMON_WORDS = (
+    "the i you a to and is it this of that in so my for love me on be like was with are your just video all have "
+    "he not but what she we they lol so omg at can one when his her great no good she's it's i'm don't can't "
+    "song people best really more how who get why know would new watch first music now amazing see from time "
+    "beautiful do there him if will funny make them awesome thank thanks cute about cool much up out think best "
+    "look hate bad terrible worst sad ugly stupid boring awful wow nice happy perfect wonderful fantastic channel "
+    "please subscribe again day year fan back right still go never always make got want need life world"
+).split()
+EMOJI = ("\U0001f602", "❤", "\U0001f60d", "\U0001f62d", "\U0001f44d", "\U0001f525", "\U0001f631")
+SYLLABLES = ("ka", "lo", "mi", "ra", "ten", "vo", "shi", "pa", "dor", "qui", "ne", "zu", "bel", "tor", "an", "es")
+
+NUM_DATES = 40
+FIRST_DAY = 13
+FIRST_MONTH = 9
+
+
+def make_vocabulary(size, rng):
+    """
+    :param size: int, number of words
+    :param rng: numpy random Generator
+    :return: list of strings, COMMON_WORDS followed by made up words
+    """
+    words = list(dict.fromkeys(COMMON_WORDS))
+    seen = set(words)
+    while len(words) < size:
+        # made up words have 2 to 5 syllables
+        lengths = rng.integers(2, 6, size=size).tolist()
+        syllables = rng.integers(0, len(SYLLABLES), size=(size, 5)).tolist()
+        for length, word_syllables in zip(lengths, syllables):
+            word = "".join([SYLLABLES[k] for k in word_syllables[:length]])
+            if word not in seen and len(words) < size:
+                seen.add(word)
+                words.append(word)
+    return words
+
+
+def zipf_probabilities(size, exponent=1.1):
+    """
+    :param size: int, number of items
+    :param exponent: float
+    :return: float array, the probability of each item, decreasing with its rank
+    """
+    weights = 1.0 / np.arange(1, size + 1) ** exponent
+    return weights / weights.sum()
+
+
+def make_date(index):
+    """
+    :param index: int, number of days after the first date
+    :return: string, "DD.MM", like the dates of the real files (months are assumed to have 30 days)
+    """
+    day = FIRST_DAY - 1 + index
+    return "%02d.%02d" % (day % 30 + 1, FIRST_MONTH + day // 30)
+
+
+def make_video_id(rng):
+    """
+    :param rng: numpy random Generator
+    :return: string, 11 characters like a youtube video id
+    """
+    alphabet = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_"
+    return "".join(alphabet[i] for i in rng.integers(0, len(alphabet), size=11))
+
+
+###########
+# Writing #
+###########
+def write_categories(path):
+    """
+    :param path: string, output filename
+    """
+    items = [{"kind": "youtube#videoCategory", "id": category_id,
+              "snippet": {"title": name, "assignable": True}} for (category_id, name, _) in CATEGORIES]
+    with open(path, "w") as categories_file:
+        json.dump({"kind": "youtube#videoCategoryListResponse", "items": items}, categories_file, indent=1)
+
+
+def write_videos(path, num_videos, vocabulary, rng):
+    """
+    Write the videos file. Every video trends for a few consecutive dates, and has a row for each of them.
+
+    :param path: string, output filename
+    :param num_videos: int
+    :param vocabulary: list of strings
+    :param rng: numpy random Generator
+    :return: list of strings, the video ids
+    """
+    video_ids = []
+    seen = set()
+    while len(video_ids) < num_videos:
+        video_id = make_video_id(rng)
+        if video_id not in seen:
+            seen.add(video_id)
+            video_ids.append(video_id)
+
+    weights = np.array([weight for (_, _, weight) in CATEGORIES], dtype=np.float64)
+    categories = rng.choice(len(CATEGORIES), size=num_videos, p=weights / weights.sum())
+    first_dates = rng.integers(0, NUM_DATES, size=num_videos)
+    num_dates = np.minimum(rng.integers(1, 8, size=num_videos), NUM_DATES - first_dates)
+    views = rng.lognormal(12, 1.5, size=num_videos).astype(np.int64) + 100
+
+    rows = []
+    for i, video_id in enumerate(video_ids):
+        title = " ".join(vocabulary[j] for j in rng.integers(0, 300, size=rng.integers(2, 9))).title()
+        channel_title = "".join(vocabulary[j] for j in rng.integers(0, 1000, size=2)).title()
+        tags = "|".join(vocabulary[j] for j in rng.integers(0, 1000, size=rng.integers(0, 10)))
+        video_views = int(views[i])
+        for k in range(int(num_dates[i])):
+            likes = video_views // int(rng.integers(20, 60))
+            dislikes = likes // int(rng.integers(5, 50))
+            comment_total = likes // int(rng.integers(3, 10))
+            rows.append((first_dates[i] + k, [video_id, title, channel_title, CATEGORIES[categories[i]][0], tags,
+                                              video_views, likes, dislikes, comment_total,
+                                              "https://i.ytimg.com/vi/%s/default.jpg" % video_id,
+                                              make_date(first_dates[i] + k)]))
+            video_views += int(video_views * rng.uniform(0.05, 0.5))
+
+    # the rows of a date come together, like in the daily snapshots of the real files
+    rows.sort(key=lambda row: row[0])
+    with open(path, "w", newline="") as videos_file:
+        writer = csv.writer(videos_file, lineterminator="\n")
+        writer.writerow(["video_id", "title", "channel_title", "category_id", "tags", "views", "likes", "dislikes",
+                         "comment_total", "thumbnail_link", "date"])
+        writer.writerows(row for (_, row) in rows)
+    return video_ids
+
+
+def make_comment(words, draws, emoji):
+    """
+    Turn a list of words into a comment: split into sentences, with punctuation, capitals, emoji and line breaks.
+
+    :param words: list of strings
+    :param draws: list of floats in [0, 1), 3 per word, the random draws used to decorate the words
+    :param emoji: int, index of the emoji added at the end, or a negative number for none
+    :return: string
+    """
+    parts = []
+    sentence_length = 0
+    for i, word in enumerate(words):
+        capital, end, punctuation = draws[3 * i:3 * i + 3]
+        if sentence_length == 0 and capital < 0.5:
+            word = word.capitalize()
+        sentence_length += 1
+        if sentence_length >= 4 and end < 0.2:
+            word += "." if punctuation < 0.6 else "!!" if punctuation < 0.8 else "?"
+            if end < 0.01:
+                word += "\n"
+            sentence_length = 0
+        parts.append(word)
+    if emoji >= 0:
+        parts.append(EMOJI[emoji])
+    return " ".join(parts).replace("\n ", "\n")
+
+
+def write_comments(path, num_comments, video_ids, vocabulary, rng, broken_rate=0.0005, batch_size=BATCH_SIZE):
+    """
+    Write the comments file, batch_size comments at a time.
+
+    :param path: string, output filename
+    :param num_comments: int
+    :param video_ids: list of strings
+    :param vocabulary: list of strings
+    :param rng: numpy random Generator
+    :param broken_rate: float, fraction of malformed rows
+    :param batch_size: int
+    """
+    video_probabilities = zipf_probabilities(len(video_ids), exponent=0.9)
+    word_probabilities = zipf_probabilities(len(vocabulary))
+
+    with open(path, "w", newline="") as comments_file:
+        writer = csv.writer(comments_file, lineterminator="\n")
+        writer.writerow(["video_id", "comment_text", "likes", "replies"])
+        for start in range(0, num_comments, batch_size):
+            size = min(batch_size, num_comments - start)
+            videos = rng.choice(len(video_ids), size=size, p=video_probabilities)
+            lengths = rng.geometric(0.08, size=size)
+            words = rng.choice(len(vocabulary), size=int(lengths.sum()), p=word_probabilities)
+            draws = rng.random(3 * len(words)).tolist()
+            # one comment out of 10 gets an emoji
+            emoji = rng.integers(-9 * len(EMOJI), len(EMOJI), size=size)
+            likes = rng.zipf(2.0, size=size) - 1
+            replies = rng.zipf(2.5, size=size) - 1
+            broken = rng.random(size) < broken_rate
+
+            # the comments of a video come together, like in the real file
+            order = np.argsort(videos, kind="stable")
+            offsets = np.concatenate(([0], np.cumsum(lengths)))
+            rows = []
+            for i in order:
+                start_word, end_word = offsets[i], offsets[i + 1]
+                text = make_comment([vocabulary[j] for j in words[start_word:end_word].tolist()],
+                                    draws[3 * start_word:3 * end_word], emoji[i])
+                if broken[i]:
+                    rows.append([text])
+                else:
+                    rows.append([video_ids[videos[i]], text, int(likes[i]), int(replies[i])])
+            writer.writerows(rows)
+
+
+def generate(output_dir, data_set, num_videos, num_comments, seed=0, vocabulary_size=20000, broken_rate=0.0005):
+    """
+    Generate the three input files of a dataset in output_dir/data.
+
+    :param output_dir: string, directory, created if needed
+    :param data_set: string, prefix of the filenames (US, GB)
+    :param num_videos: int
+    :param num_comments: int
+    :param seed: int
+    :param vocabulary_size: int, number of distinct words
+    :param broken_rate: float, fraction of malformed rows in the comments file
+    :return: tuple of (comments filename, videos filename, categories filename)
+    """
+    rng = np.random.default_rng(seed)
+    data_dir = os.path.join(output_dir, DATA_DIR)
+    os.makedirs(data_dir, exist_ok=True)
+    comments_csv = os.path.join(data_dir, data_set + "comments.csv")
+    videos_csv = os.path.join(data_dir, data_set + "videos.csv")
+    categories_json = os.path.join(data_dir, data_set + "_category_id.json")
+
+    vocabulary = make_vocabulary(vocabulary_size, rng)
+    write_categories(categories_json)
+    video_ids = write_videos(videos_csv, num_videos, vocabulary, rng)
+    write_comments(comments_csv, num_comments, video_ids, vocabulary, rng, broken_rate)
+    return comments_csv, videos_csv, categories_json
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic dataset")
+    parser.add_argument("-o", "--output", help="Output directory, the files are written in its data directory",
+                        required=True)
+    parser.add_argument("-s", "--set", help="Name of the data set", choices=("US", "GB"), default="US")
+    parser.add_argument("--videos", help="Number of videos", type=int, default=2000)
+    parser.add_argument("--comments", help="Number of comments", type=int, default=1000000)
+    parser.add_argument("--seed", help="Random seed", type=int, default=0)
+    parser.add_argument("--vocabulary", help="Number of distinct words", type=int, default=20000)
+    parser.add_argument("--broken-rate", help="Fraction of malformed comment rows", type=float, default=0.0005)
+    args = parser.parse_args()
+
+    paths = generate(args.output, args.set, args.videos, args.comments, args.seed, args.vocabulary, args.broken_rate)
+    for path in paths:
+        print("Wrote %s (%d bytes)" % (path, os.path.getsize(path)))
@@ -0,0 +1,55 @@
+import contextlib
+import filecmp
+import io
+import shutil
+import tempfile
+import unittest
+import benchmark
+import extract
+import generate_data
+import quarantine
+
+
+class TestGenerateData(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_extract_reads_generated_data(self):
+        paths = generate_data.generate(self.dir, "US", 20, 1000, broken_rate=0.01)
+        rows = quarantine.Quarantine()
+        data = extract.preprocess(*paths, quarantine_rows=rows)
+        num_broken = rows.total()
+        self.assertEqual({quarantine.MISSING_FIELDS: num_broken}, dict(rows.counts))
+        self.assertGreater(num_broken, 0)
+        self.assertEqual(20, len(data))
+        self.assertEqual(1000 - num_broken, sum(len(entry["comments"]) for entry in data.values()))
+        for entry in data.values():
+            self.assertIn(entry["category_id"], {category[0] for category in generate_data.CATEGORIES})
+            self.assertGreater(entry["views"], 0)
+
+    def test_same_seed_same_data(self):
+        first = generate_data.generate(self.dir + "/a", "US", 5, 200, seed=3)
+        second = generate_data.generate(self.dir + "/b", "US", 5, 200, seed=3)
+        for first_path, second_path in zip(first, second):
+            self.assertTrue(filecmp.cmp(first_path, second_path, shallow=False))
+
+    def test_benchmark(self):
+        generate_data.generate(self.dir, "US", 10, 500)
+        stages = ("extract", "write", "load", "tokens", "rankings")
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = benchmark.run_benchmark(self.dir, stages=stages)
+            self.assertEqual([], benchmark.compare(results, results))
+        self.assertEqual(list(stages), list(results["stages"]))
+        self.assertEqual(500, results["dataset"]["comments"])
+        self.assertEqual(500, results["stages"]["tokens"]["items"])
+
+        slower = {"stages": {"tokens": {"seconds": results["stages"]["tokens"]["seconds"] / 2}}}
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(["tokens"], benchmark.compare(results, slower))
+
+
+if __name__ == '__main__':
+    unittest.main()
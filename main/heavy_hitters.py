@@ -0,0 +1,113 @@
+"""
+heavy_hitters.py
+
+Approximate token counts in a fixed amount of memory, for the wordclouds of very large categories (which only show
+the most frequent tokens anyway).
+
+SpaceSaving keeps at most capacity tokens, with an estimated count and a maximum error for each of them (Metwally et
+al., "Efficient Computation of Frequent and Top-k Elements in Data Streams"). The tokens are counted exactly a batch
+at a time (see token_counter.py), and each batch is merged into the summary:
+- a token that is already kept gets its batch count added,
+- a new token starts at the smallest kept count (which bounds the count of every token that is not kept), plus its
+  batch count. That smallest count is its maximum error.
+Then only the capacity tokens with the largest counts are kept.
+
+Guarantees, N being the number of tokens counted:
+- a kept token's true count is between count - error and count,
+- a token that is not kept occurs at most min_count() times, and min_count() <= N / capacity,
+- so every token that occurs more than N / capacity times is kept. With fewer distinct tokens than capacity, the
+  counts are exact.
+"""
+
+import heapq
+from collections import Counter
+from operator import itemgetter
+
+
+class SpaceSaving:
+    """
+    Summary of the most frequent tokens, see the module docstring.
+
+    Attributes:
+    - counts: Counter of {token: estimated count}, at most capacity tokens
+    - errors: dictionary of {token: maximum overestimate of its count}
+    - total: int, number of tokens counted
+    - dropped: bool, whether a token was ever left out (if not, the counts are exact)
+    """
+
+    def __init__(self, capacity):
+        """
+        :param capacity: int, maximum number of tokens kept
+        """
+        if capacity < 1:
+            raise ValueError("the capacity must be at least 1")
+        self.capacity = capacity
+        self.counts = Counter()
+        self.errors = {}
+        self.total = 0
+        self.dropped = False
+
+    def update(self, batch_counts):
+        """
+        Merge the exact counts of a batch of tokens.
+
+        :param batch_counts: dictionary of {token: count}
+        """
+        counts = self.counts
+        errors = self.errors
+        floor = self.min_count()
+        for token in batch_counts.keys() & counts.keys():
+            counts[token] += batch_counts[token]
+        # in batch order, so that ties are always broken the same way
+        new_tokens = [token for token in batch_counts if token not in counts]
+        if len(counts) + len(new_tokens) > self.capacity:
+            # only the capacity new tokens with the highest counts can be kept
+            new_tokens = sorted(new_tokens, key=batch_counts.__getitem__, reverse=True)[:self.capacity]
+            self.dropped = True
+        for token in new_tokens:
+            counts[token] = floor + batch_counts[token]
+        errors.update(dict.fromkeys(new_tokens, floor))
+        self.total += sum(batch_counts.values())
+        if len(counts) > self.capacity:
+            self.counts = Counter(dict(heapq.nlargest(self.capacity, counts.items(), key=itemgetter(1))))
+            self.errors = {token: errors[token] for token in self.counts}
+            self.dropped = True
+
+    def min_count(self):
+        """
+        :return: int, the highest count a token that is not kept can have (0 while the summary is not full)
+        """
+        if not self.dropped and len(self.counts) < self.capacity:
+            return 0
+        return min(self.counts.values())
+
+    def max_error(self):
+        """
+        :return: int, the highest overestimate of the count of a kept token
+        """
+        return max(self.errors.values(), default=0)
+
+    def top(self, n):
+        """
+        :param n: int
+        :return: tuple of (list of tuples of (token, count), the n highest counts, int, how many of these tokens are
+                 certain to be among the n most frequent tokens)
+        """
+        ranked = heapq.nlargest(n + 1, self.counts.items(), key=itemgetter(1))
+        top = ranked[:n]
+        # the next token, or any token that is not kept, has at most this count
+        threshold = max(ranked[n][1] if len(ranked) > n else 0, self.min_count())
+        certain = sum(1 for (token, count) in top if count - self.errors[token] >= threshold)
+        return top, certain
+
+    def report(self, n):
+        """
+        :param n: int, number of tokens shown (in a wordcloud)
+        :return: string, one line about the accuracy of the counts
+        """
+        top, certain = self.top(n)
+        if not self.dropped:
+            return "exact counts: %d distinct tokens, %d tokens" % (len(self.counts), self.total)
+        return ("approximate counts: %d distinct tokens kept, out of %d tokens. Counts are at most %d too high, the "
+                "tokens left out occur at most %d times, %d of the top %d tokens are certain" % (
+                    len(self.counts), self.total, self.max_error(), self.min_count(), certain, len(top)))
@@ -0,0 +1,97 @@
+import random
+import unittest
+from collections import Counter
+import heavy_hitters
+import token_counter
+
+
+def zipf_batches(num_batches, batch_size, vocabulary, seed=0):
+    """
+    :return: list of Counters, batches of tokens with a few frequent ones and many rare ones
+    """
+    rng = random.Random(seed)
+    weights = [1.0 / (rank + 1) for rank in range(vocabulary)]
+    tokens = ["w%d" % rank for rank in range(vocabulary)]
+    return [Counter(rng.choices(tokens, weights, k=batch_size)) for i in range(num_batches)]
+
+
+class TestSpaceSaving(unittest.TestCase):
+    def test_exact_under_capacity(self):
+        summary = heavy_hitters.SpaceSaving(10)
+        summary.update({"a": 3, "b": 1})
+        summary.update({"a": 1, "c": 2})
+        self.assertEqual({"a": 4, "b": 1, "c": 2}, summary.counts)
+        self.assertEqual(0, summary.max_error())
+        self.assertEqual(0, summary.min_count())
+        self.assertEqual(7, summary.total)
+        self.assertTrue(summary.report(2).startswith("exact counts"))
+
+    def test_bounds(self):
+        batches = zipf_batches(40, 500, 2000)
+        exact = sum(batches, Counter())
+        summary = heavy_hitters.SpaceSaving(100)
+        for batch in batches:
+            summary.update(batch)
+
+        self.assertEqual(100, len(summary.counts))
+        self.assertEqual(sum(exact.values()), summary.total)
+        self.assertLessEqual(summary.min_count(), summary.total / 100)
+        for token, count in summary.counts.items():
+            self.assertLessEqual(count - summary.errors[token], exact[token])
+            self.assertLessEqual(exact[token], count)
+        for token, count in exact.items():
+            if token not in summary.counts:
+                self.assertLessEqual(count, summary.min_count())
+            if count > summary.total / 100:
+                self.assertIn(token, summary.counts)
+
+    def test_top(self):
+        batches = zipf_batches(40, 500, 2000)
+        exact = sum(batches, Counter())
+        summary = heavy_hitters.SpaceSaving(200)
+        for batch in batches:
+            summary.update(batch)
+
+        top, certain = summary.top(10)
+        self.assertEqual(10, len(top))
+        self.assertGreater(certain, 0)
+        # the most frequent tokens are found, with their counts (nearly) right
+        self.assertEqual([token for (token, count) in exact.most_common(5)], [token for (token, count) in top[:5]])
+        self.assertIn("of the top 10 tokens are certain", summary.report(10))
+
+    def test_single_batch_over_capacity(self):
+        summary = heavy_hitters.SpaceSaving(2)
+        summary.update({"a": 5, "b": 3, "c": 1})
+        self.assertEqual({"a": 5, "b": 3}, summary.counts)
+        self.assertEqual(0, summary.max_error())
+        self.assertEqual(3, summary.min_count())
+        self.assertTrue(summary.report(2).startswith("approximate counts"))
+
+    def test_capacity(self):
+        with self.assertRaises(ValueError):
+            heavy_hitters.SpaceSaving(0)
+
+
+class TestApproximateCounts(unittest.TestCase):
+    def test_same_as_exact_under_capacity(self):
+        texts = ["'Quoted' words, don't", "more words", "quoted"]
+        expected = token_counter.count_tokens(texts, stopwords=set())
+        actual = token_counter.count_tokens(texts, stopwords=set(), capacity=100)
+        self.assertEqual(expected, actual.counts)
+        self.assertEqual(expected, token_counter.counts_to_render(actual, "test"))
+
+    def test_by_group(self):
+        grouped = [("a", ["x y z"]), ("b", ["y"]), ("a", ["x"])]
+        actual = token_counter.count_tokens_by_group(grouped, stopwords=set(), capacity=2)
+        self.assertEqual({"x": 2, "y": 1}, actual["a"].counts)
+        self.assertEqual({"y": 1}, actual["b"].counts)
+
+    def test_bounded(self):
+        texts = ["common w%d" % i for i in range(5000)]
+        summary = token_counter.count_tokens(texts, stopwords=set(), capacity=50)
+        self.assertEqual(50, len(summary.counts))
+        self.assertEqual(5000, summary.counts["common"] - summary.errors["common"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,371 @@
+"""
+ingest.py
+
+Incremental ingest of the input files into an existing preprocessed store (see extract.py --incremental).
+
+New trending snapshots are appended to the csv files. A manifest kept next to the store records, for each input
+file, how far it has been ingested (byte offset and number of entries) and a sha1 hash of that ingested part. The next
+run checks the hash of that same part of the file: if it is unchanged, only the rows after it are parsed,
+preprocessed (and scored), and the new comments are appended to the data entries. If it has changed (the file was
+replaced or edited), or if there is no manifest yet, everything is ingested again from scratch.
+
+The manifest also keeps the parsed rows of the videos that are not in the store (yet), since comments that show up in
+a later snapshot may belong to a video of an earlier one. The videos that are in the store are listed in its index.
+Whether the store has sentiment scores and rankings is kept as well, so that a later run keeps them up to date.
+
+The comments of a video that is unknown (or of an unknown category) are quarantined, and kept pending in the manifest.
+Every run checks them again: once a later snapshot has the row of their video, they are ingested (before the new
+comments, in file order) and taken out of the quarantine file, as a full run would have kept them. The entries of a
+full run are in the order of the first comment of each video, so the manifest keeps the line of the first comment of
+every video in the store; when a video of a pending comment would come before the last video of the store, the store
+is written out again in that order.
+
+Only the entries of the videos with new comments or new video rows are written, at the end of the store, and only
+their part of the index is updated (see data_store.append_data). The result is the same as a full run of extract.py
+on the same files.
+"""
+
+import hashlib
+import io
+import json
+import os
+
+import data_store
+import metrics
+import sentiment_engine
+import time_series
+import quarantine
+from extract_helpers import create_comment_entry, create_video_entry, extract_categories_data, extract_video_data, \
+    video_status
+from extract_parallel import parse_comments_range
+
+# the manifest of a .json file is kept next to it, the manifest of a columnar store is kept inside the directory
+MANIFEST_SUFFIX = ".manifest.json"
+COLUMNAR_MANIFEST = "manifest.json"
+MANIFEST_VERSION = 4
+# size of the blocks read when hashing a file
+HASH_BLOCK_SIZE = 1 << 20
+
+
+############
+# Manifest #
+############
+def manifest_path(path):
+    """
+    :param path: string, the .json file or columnar store directory
+    :return: string, filename of its manifest
+    """
+    if os.path.isdir(path):
+        return os.path.join(path, COLUMNAR_MANIFEST)
+    return path + MANIFEST_SUFFIX
+
+
+def load_manifest(path):
+    """
+    Load the manifest of the store at path. Returns None if there is no store or manifest, or if they do not match.
+
+    :param path: string, the .json file or columnar store directory
+    :return: dictionary, or None
+    """
+    try:
+        with open(manifest_path(path), "r") as manifest_file:
+            manifest = json.load(manifest_file)
+    except FileNotFoundError:
+        return None
+    # the signature of the store (see data_store.file_signature) tells if it was rewritten without its manifest (e.g.
+    # by a full run of extract.py)
+    if manifest.get("version") != MANIFEST_VERSION or \
+            tuple(tuple(signature) for signature in manifest["store"]) != data_store.file_signature(path):
+        return None
+    return manifest
+
+
+def write_manifest(path, manifest):
+    """
+    :param path: string, the .json file or columnar store directory
+    :param manifest: dictionary, written out along with the signature of the store
+    """
+    manifest = dict(manifest, version=MANIFEST_VERSION, store=data_store.file_signature(path))
+    with open(manifest_path(path), "w") as manifest_file:
+        json.dump(manifest, manifest_file)
+
+
+def remove_manifest(path):
+    """
+    Remove the manifest of the store at path, if there is one.
+
+    :param path: string, the .json file or columnar store directory
+    """
+    try:
+        os.remove(manifest_path(path))
+    except FileNotFoundError:
+        pass
+
+
+#########
+# Files #
+#########
+def file_update(csv_path, state):
+    """
+    Find the part of an input file that has not been ingested yet.
+
+    :param csv_path: string, filename
+    :param state: dictionary of {"path", "end", "rows", "sha1"} from the manifest, or None
+    :return: tuple of (start offset, end offset, new state, line number at the start offset). The start offset is
+             None if the ingested part of the file has changed, in which case the file has to be ingested again from
+             the start. For a new file, it is the offset after the header.
+    """
+    sha1 = hashlib.sha1()
+    with open(csv_path, "rb") as csv_file:
+        end = os.fstat(csv_file.fileno()).st_size
+        if state is not None and state["path"] == csv_path and state["end"] <= end:
+            num_lines = hash_range(csv_file, sha1, state["end"])
+            if sha1.hexdigest() == state["sha1"]:
+                hash_range(csv_file, sha1, end - state["end"])
+                return state["end"], end, dict(state, end=end, sha1=sha1.hexdigest()), num_lines + 1
+        # a new or changed file, hash the rest of it
+        hash_range(csv_file, sha1, end)
+
+    new_state = {"path": csv_path, "end": end, "rows": 0, "sha1": sha1.hexdigest()}
+    # line 1 is the header
+    return (len_header(csv_path) if state is None else None), end, new_state, 2
+
+
+def hash_range(binary_file, sha1, length):
+    """
+    Add the next length bytes of binary_file to sha1.
+
+    :param binary_file: file handle, opened in binary mode
+    :param sha1: hashlib sha1 object, updated in place
+    :param length: int, number of bytes
+    :return: int, number of newlines in those bytes
+    """
+    num_lines = 0
+    while length > 0:
+        block = binary_file.read(min(HASH_BLOCK_SIZE, length))
+        if not block:
+            break
+        sha1.update(block)
+        num_lines += block.count(b"\n")
+        length -= len(block)
+    return num_lines
+
+
+def read_video_rows(videos_csv, start, end, series=None, first_line=2, quarantine_rows=None):
+    """
+    :param videos_csv: string, filename
+    :param start: int, offset of the first record to read (after the header)
+    :param end: int, offset after the last record
+    :param series: time_series.TimeSeriesBuilder, or None
+    :param first_line: int, line number at the start offset
+    :param quarantine_rows: quarantine.Quarantine, or None
+    :return: dictionary of video data, see extract_helpers.extract_video_data
+    """
+    with open(videos_csv, "rb") as videos_file:
+        videos_file.seek(start)
+        text = videos_file.read(end - start).decode("utf-8", errors="replace")
+    videos_text = io.StringIO(text, newline="")
+    videos_text.name = videos_csv
+    return extract_video_data(videos_text, has_header=False, time_series=series, quarantine_rows=quarantine_rows,
+                              first_line=first_line)
+
+
+##########
+# Ingest #
+##########
+def ingest(output, data_format, comments_csv, videos_csv, categories_json, jobs=1, score=False, cache=None,
+           with_rankings=False, quarantine_rows=None):
+    """
+    Bring the store at output up to date with the input files, only ingesting what is new since the last run.
+
+    If the store already has sentiment scores (or rankings), the new comments are scored (and ranked) as well, so
+    that every comment has them. Asking for them when the store does not have them yet ingests everything again.
+
+    :param output: string, the .json file or columnar store directory
+    :param data_format: string, one of data_store.FORMATS
+    :param comments_csv: string, filename
+    :param videos_csv: string, filename
+    :param categories_json: string, filename
+    :param jobs: int, number of processes used to parse (and score) the new comments
+    :param score: bool, whether to compute the sentiment scores of the new comments
+    :param cache: sentiment_cache.SentimentCache, or None
+    :param with_rankings: bool, whether to precompute the rankings in the index
+    :param quarantine_rows: quarantine.Quarantine that the rows that cannot be ingested are added to, or None. It is
+                            cleared when everything is ingested from scratch.
+    :return: tuple of (number of new comments, number of videos in the new video rows), or None if there was nothing
+             new
+    """
+    manifest = None
+    if os.path.exists(output):
+        manifest = load_manifest(output)
+    index = previous_series = None
+    if manifest is not None:
+        index = data_store.load_index(output)
+        previous_series = time_series.load_time_series(output)
+        # the comments that are in the store have no scores (or rankings) yet
+        missing = (score and not manifest["sentiment"]) or (with_rankings and not manifest["rankings"])
+        score = score or manifest["sentiment"]
+        with_rankings = with_rankings or manifest["rankings"]
+        if manifest["format"] != data_format or index is None or previous_series is None or missing:
+            manifest = None
+    files = manifest["files"] if manifest is not None else {}
+
+    comments_start, comments_end, comments_state, comments_line = file_update(comments_csv, files.get("comments"))
+    videos_start, videos_end, videos_state, videos_line = file_update(videos_csv, files.get("videos"))
+
+    if manifest is None or comments_start is None or videos_start is None:
+        # nothing usable from the previous runs, start over
+        print("incremental: ingesting everything from scratch")
+        manifest = None
+        comments_start = len_header(comments_csv)
+        videos_start = len_header(videos_csv)
+        comments_line = videos_line = 2
+        comments_state["rows"] = videos_state["rows"] = 0
+        if quarantine_rows is not None:
+            quarantine_rows.clear()
+    elif comments_start == comments_end and videos_start == videos_end:
+        return None
+
+    with open(categories_json, "r") as categories_file:
+        categories_data = extract_categories_data(categories_file)
+    # the time series of the earlier runs is extended with the new video rows
+    series = time_series.TimeSeriesBuilder()
+    if manifest is not None:
+        series.add_series(previous_series)
+    with metrics.stage("videos"):
+        new_videos = read_video_rows(videos_csv, videos_start, videos_end, series, videos_line, quarantine_rows)
+    videos_data = manifest["videos"] if manifest is not None else {}
+    videos_data.update(new_videos)
+
+    stored_ids = index["table"]["video_ids"] if manifest is not None else []
+    status = dict.fromkeys(stored_ids)
+    status.update(video_status(videos_data, categories_data))
+    if any(status[video_id] is not None for video_id in stored_ids):
+        # a video of the store moved to an unknown category: a full run leaves it out, and quarantines its comments
+        remove_manifest(output)
+        return ingest(output, data_format, comments_csv, videos_csv, categories_json, jobs, score, cache,
+                      with_rankings, quarantine_rows)
+
+    pending = manifest["pending"] if manifest is not None else []
+    comments_by_video, first_lines, pending, reasons = check_pending(pending, status)
+    with metrics.stage("comments"):
+        # the comments of videos that are not in the videos file (or of an unknown category) are quarantined
+        new_comments, new_first_lines, rejected = parse_comments_range(comments_csv, comments_start, comments_end,
+                                                                       jobs, status, comments_line, quarantine_rows)
+    pending.extend([line, reason, fields] for (line, reason, fields) in rejected
+                   if reason in (quarantine.UNKNOWN_VIDEO, quarantine.UNKNOWN_CATEGORY))
+    for video_id, comments in new_comments.items():
+        comments_by_video.setdefault(video_id, []).extend(comments)
+        first_lines.setdefault(video_id, new_first_lines[video_id])
+    if quarantine_rows is not None:
+        quarantine_rows.update_rows(os.path.basename(comments_csv), reasons)
+    num_comments = sum(len(comments) for comments in comments_by_video.values())
+    if score:
+        sentiment_engine.add_sentiments({video_id: {"comments": comments}
+                                         for (video_id, comments) in comments_by_video.items()}, jobs, cache)
+
+    # the entries of the stored videos with new comments or new video rows are written again as a whole
+    updated_ids = [video_id for video_id in stored_ids if video_id in comments_by_video or video_id in new_videos]
+    stored = data_store.load_video_entries(output, updated_ids, index) if manifest is not None else {}
+    data_entries = {}
+    for video_id, entry in stored.items():
+        comments = list(entry["comments"])
+        if video_id in new_videos:
+            # newer video rows replace the metadata
+            entry = create_video_entry(video_id, videos_data, categories_data)
+        data_entries[video_id] = dict(entry, comments=comments)
+    for video_id, comments in comments_by_video.items():
+        if video_id not in data_entries:
+            data_entries[video_id] = create_video_entry(video_id, videos_data, categories_data)
+        data_entries[video_id]["comments"].extend(comments)
+
+    stored_lines = manifest["first_lines"] if manifest is not None else []
+    added_lines = [first_lines[video_id] for video_id in data_entries if video_id not in stored]
+    if manifest is None:
+        data_store.write_data(data_entries, output, data_format, with_rankings)
+        stored_lines = added_lines
+    elif stored_lines and added_lines and added_lines[0] < stored_lines[-1]:
+        # a video whose pending comments are ingested now goes before the last video of the store
+        stored_lines, data_entries = merge_entries(output, stored_ids, stored_lines, data_entries, first_lines)
+        data_store.write_data(data_entries, output, data_format, with_rankings)
+    else:
+        data_store.append_data(data_entries, output, with_rankings)
+        stored_lines = stored_lines + added_lines
+    time_series.write_time_series(series.build(), output)
+
+    # the rows of the videos that are in the store now are not needed anymore
+    in_store = set(stored_ids)
+    in_store.update(data_entries)
+    videos_data = {video_id: video for (video_id, video) in videos_data.items() if video_id not in in_store}
+    comments_state["rows"] += num_comments
+    videos_state["rows"] += len(new_videos)
+    write_manifest(output, {"format": data_format, "files": {"comments": comments_state, "videos": videos_state},
+                            "videos": videos_data, "pending": pending, "first_lines": stored_lines,
+                            "sentiment": score, "rankings": with_rankings})
+    return num_comments, len(new_videos)
+
+
+def check_pending(pending, status):
+    """
+    Check the pending comments of the earlier runs again.
+
+    :param pending: list of [line number, quarantine reason, fields], the comments that were not ingested because
+                    their video was unknown (or of an unknown category), in file order
+    :param status: dictionary of {video_id: None or quarantine reason}, see extract_helpers.video_status
+    :return: tuple of (dictionary of {video_id: list of comment entries} of the comments that can be ingested now,
+             dictionary of {video_id: line number of its first comment} for those, list of the comments that are
+             still pending, dictionary of {line number: new quarantine reason, or None} of the rows of the quarantine
+             file to update)
+    """
+    comments_by_video = {}
+    first_lines = {}
+    still_pending = []
+    reasons = {}
+    for line, reason, fields in pending:
+        video_id, comment = create_comment_entry(fields)
+        new_reason = status.get(video_id, quarantine.UNKNOWN_VIDEO)
+        if new_reason is None:
+            comments_by_video.setdefault(video_id, []).append(comment)
+            first_lines.setdefault(video_id, line)
+        else:
+            still_pending.append([line, new_reason, fields])
+        if new_reason != reason:
+            reasons[line] = new_reason
+    return comments_by_video, first_lines, still_pending, reasons
+
+
+def merge_entries(output, stored_ids, stored_lines, data_entries, first_lines):
+    """
+    Merge the data entries into all of the entries of the store, in the order of the first comment of each video.
+
+    :param output: string, the .json file or columnar store directory
+    :param stored_ids: list of strings, the video ids of the store, in order
+    :param stored_lines: list of ints, the line of the first comment of each video of the store
+    :param data_entries: dictionary of data entries, that replace or are added to the ones of the store
+    :param first_lines: dictionary of {video_id: line number of its first comment}, for the added videos
+    :return: tuple of (list of ints, the line of the first comment of each video, dictionary of data entries)
+    """
+    lines = dict(zip(stored_ids, stored_lines))
+    for video_id in data_entries:
+        # the videos of the store that only have new video rows have no first line in first_lines
+        if video_id not in lines:
+            lines[video_id] = first_lines[video_id]
+    order = sorted(lines, key=lines.get)
+
+    stored = data_store.load_data(output)
+    all_data = {}
+    for video_id in order:
+        if video_id in data_entries:
+            all_data[video_id] = data_entries[video_id]
+        else:
+            all_data[video_id] = dict(stored[video_id], comments=list(stored[video_id]["comments"]))
+    return [lines[video_id] for video_id in order], all_data
+
+
+def len_header(csv_path):
+    """
+    :param csv_path: string, filename
+    :return: int, length in bytes of the header line of the file
+    """
+    with open(csv_path, "rb") as csv_file:
+        return len(csv_file.readline())
@@ -0,0 +1,251 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import data_store
+import extract
+import ingest
+import quarantine
+import sentiment_engine
+import time_series
+
+COMMENTS_HEADER = 'video_id,comment_text,likes,replies\n'
+COMMENTS = [
+    'v1,"hello\nworld, ""quoted""",1,0\n'
+    'v2,plain,2,1\n'
+    'broken\n',
+    'v1,"multi\nline",3,0\n'
+    'v3,a new video,0,0\n'
+    'v4,unknown category,0,0\n',
+]
+VIDEOS_HEADER = 'video_id,title,channel_title,category_id,tags,views,likes,dislikes,comment_total,thumbnail_link,date\n'
+VIDEOS = [
+    'v1,t1,c1,1,,10,1,0,2,l1,13.09\n'
+    'v2,t2,c2,1,,20,2,0,1,l2,13.09\n'
+    'v3,t3,c3,1,,30,3,0,1,l3,13.09\n'
+    'v4,t4,c4,99,,40,4,0,1,l4,13.09\n',
+    'v1,t1,c1,1,,15,1,0,2,l1,14.09\n',
+]
+CATEGORIES = {"items": [{"id": "1", "snippet": {"title": "Film"}}]}
+
+
+class TestIngest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.comments = os.path.join(self.dir, "comments.csv")
+        self.videos = os.path.join(self.dir, "videos.csv")
+        self.categories = os.path.join(self.dir, "categories.json")
+        with open(self.categories, "w") as f:
+            json.dump(CATEGORIES, f)
+        self.write_snapshot(0, "w")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write_snapshot(self, i, mode="a"):
+        with open(self.comments, mode, newline="") as f:
+            f.write((COMMENTS_HEADER if mode == "w" else "") + COMMENTS[i])
+        with open(self.videos, mode, newline="") as f:
+            f.write((VIDEOS_HEADER if mode == "w" else "") + VIDEOS[i])
+
+    def run_ingest(self, path, data_format="json"):
+        return ingest.ingest(path, data_format, self.comments, self.videos, self.categories)
+
+    def check_same_as_full_run(self, path):
+        expected = extract.preprocess(self.comments, self.videos, self.categories)
+        data = data_store.load_data(path)
+        self.assertEqual(list(expected), list(data))
+        for video_id in expected:
+            self.assertEqual(expected[video_id], dict(data[video_id], comments=list(data[video_id]["comments"])))
+
+    def check_appended_snapshot(self, path, data_format):
+        self.assertEqual((2, 4), self.run_ingest(path, data_format))
+        self.assertIsNone(self.run_ingest(path, data_format))
+
+        self.write_snapshot(1)
+        # the comment of v4 (an unknown category) is quarantined
+        self.assertEqual((2, 1), self.run_ingest(path, data_format))
+        self.check_same_as_full_run(path)
+        self.assertEqual(15, data_store.load_video_entry(path, "v1")["views"])
+        self.assertEqual(["v1", "v2", "v3"], list(data_store.load_category_entries(path, "1")))
+        manifest = ingest.load_manifest(path)
+        self.assertEqual(4, manifest["files"]["comments"]["rows"])
+        # only the rows of the videos that are not in the store are kept
+        self.assertEqual(["v4"], list(manifest["videos"]))
+        series = time_series.load_time_series(path)
+        self.assertEqual([("13.09", 10), ("14.09", 15)], series.series("v1"))
+        self.assertEqual(["v1", "v2", "v3", "v4"], series.video_ids)
+
+    def test_appended_snapshot_json(self):
+        self.check_appended_snapshot(os.path.join(self.dir, "data.json"), "json")
+
+    def test_appended_snapshot_columnar(self):
+        self.check_appended_snapshot(os.path.join(self.dir, "store"), "columnar")
+
+    def test_changed_file_ingested_again(self):
+        path = os.path.join(self.dir, "data.json")
+        self.run_ingest(path)
+        with open(self.comments, "w", newline="") as f:
+            f.write(COMMENTS_HEADER + COMMENTS[1])
+        self.assertEqual((2, 4), self.run_ingest(path))
+        self.check_same_as_full_run(path)
+
+    def test_quarantine(self):
+        path = os.path.join(self.dir, "data.json")
+        quarantine_path = quarantine.quarantine_path(path)
+        rows = quarantine.Quarantine(quarantine_path)
+        ingest.ingest(path, "json", self.comments, self.videos, self.categories, quarantine_rows=rows)
+        rows.flush()
+        self.assertEqual([("comments.csv", 5, quarantine.MISSING_FIELDS, ["broken"])],
+                         quarantine.read_quarantine(quarantine_path))
+
+        # a comment of a video that is not in the videos file, in an appended snapshot
+        with open(self.comments, "a", newline="") as f:
+            f.write(COMMENTS[1] + 'orphan,"who\nam i",0,0\n')
+        with open(self.videos, "a", newline="") as f:
+            f.write(VIDEOS[1])
+        rows = quarantine.Quarantine(quarantine_path, append=True)
+        self.assertEqual((2, 1), ingest.ingest(path, "json", self.comments, self.videos, self.categories,
+                                               quarantine_rows=rows))
+        rows.flush()
+        self.assertEqual({quarantine.UNKNOWN_CATEGORY: 1, quarantine.UNKNOWN_VIDEO: 1}, dict(rows.counts))
+        self.assertEqual([("comments.csv", 5, quarantine.MISSING_FIELDS, ["broken"]),
+                          ("comments.csv", 9, quarantine.UNKNOWN_CATEGORY, ["v4", "unknown category", "0", "0"]),
+                          ("comments.csv", 10, quarantine.UNKNOWN_VIDEO, ["orphan", "who\nam i", "0", "0"])],
+                         quarantine.read_quarantine(quarantine_path))
+
+    def test_pending_comments(self):
+        for data_format, name in (("json", "data.json"), ("columnar", "store")):
+            path = os.path.join(self.dir, name)
+            quarantine_path = quarantine.quarantine_path(path)
+            self.write_snapshot(0, "w")
+            self.write_snapshot(1)
+            # the video of the orphan comment only shows up in a later snapshot, after v5 is in the store
+            with open(self.comments, "a", newline="") as f:
+                f.write('orphan,"who\nam i",0,0\nv5,after the orphan,0,0\n')
+            with open(self.videos, "a", newline="") as f:
+                f.write('v5,t5,c5,1,,50,5,0,1,l5,14.09\n')
+            rows = quarantine.Quarantine(quarantine_path)
+            ingest.ingest(path, data_format, self.comments, self.videos, self.categories, quarantine_rows=rows)
+            rows.flush()
+            self.assertEqual((10, quarantine.UNKNOWN_VIDEO), quarantine.read_quarantine(quarantine_path)[-1][1:3])
+
+            # first with an unknown category, the comment is still quarantined
+            for category_id in ("99", "1"):
+                with open(self.videos, "a", newline="") as f:
+                    f.write('orphan,t6,c6,%s,,60,6,0,1,l6,15.09\n' % category_id)
+                rows = quarantine.Quarantine(quarantine_path, append=True)
+                self.assertEqual(1 if category_id == "1" else 0, ingest.ingest(
+                    path, data_format, self.comments, self.videos, self.categories, quarantine_rows=rows)[0])
+                rows.flush()
+                self.check_same_as_full_run(path)
+                if category_id == "99":
+                    self.assertEqual((10, quarantine.UNKNOWN_CATEGORY),
+                                     quarantine.read_quarantine(quarantine_path)[-1][1:3])
+            self.assertEqual(["v1", "v2", "v3", "orphan", "v5"], list(data_store.load_data(path)))
+            self.assertEqual([(5, quarantine.MISSING_FIELDS), (9, quarantine.UNKNOWN_CATEGORY)],
+                             [row[1:3] for row in quarantine.read_quarantine(quarantine_path)])
+            self.assertEqual(1, len(ingest.load_manifest(path)["pending"]))
+
+            # the store is appended to again afterwards
+            self.write_snapshot(1)
+            self.run_ingest(path, data_format)
+            self.check_same_as_full_run(path)
+
+    def test_overlapping_snapshots(self):
+        # the comments of day 1 include some of a video that only trends (and gets a video row) on day 2, and the
+        # videos of day 1 trend again on day 2 without new comments
+        days = [('v1,t1,c1,1,,10,1,0,2,l1,13.09\n'
+                 'v2,t2,c2,1,,20,2,0,1,l2,13.09\n',
+                 'v1,first,1,0\n'
+                 'v3,"early\ncomment",0,0\n'
+                 'v2,second,2,1\n'),
+                ('v1,t1,c1,1,,15,1,0,2,l1,14.09\n'
+                 'v2,t2,c2,1,,25,2,0,1,l2,14.09\n'
+                 'v3,t3,c3,1,,30,3,0,1,l3,14.09\n',
+                 'v3,later comment,1,0\n')]
+        for data_format, name in (("json", "data.json"), ("columnar", "store")):
+            path = os.path.join(self.dir, name)
+            for i, (videos, comments) in enumerate(days):
+                with open(self.videos, "w" if i == 0 else "a", newline="") as f:
+                    f.write((VIDEOS_HEADER if i == 0 else "") + videos)
+                with open(self.comments, "w" if i == 0 else "a", newline="") as f:
+                    f.write((COMMENTS_HEADER if i == 0 else "") + comments)
+                self.run_ingest(path, data_format)
+                self.check_same_as_full_run(path)
+            self.assertEqual(["v1", "v3", "v2"], list(data_store.load_data(path)))
+            self.assertEqual(25, data_store.load_video_entry(path, "v2")["views"])
+
+    def test_bad_input(self):
+        # a snapshot with a stray quote followed by more than the field limit of csv, and bytes that are not utf-8
+        for jobs in [1, 3]:
+            path = os.path.join(self.dir, "data-%d.json" % jobs)
+            self.write_snapshot(0, "w")
+            self.run_ingest(path)
+            with open(self.comments, "ab") as f:
+                f.write(('v1,"stray,1,0\n' + 'v2,plain,2,1\n' * 12000).encode("utf-8") + b'v3,caf\xe9,1,0\n')
+            with open(self.videos, "ab") as f:
+                f.write(b'v3,t\xff3,c3,1,,35,3,0,1,l3,14.09\n')
+            rows = quarantine.Quarantine(quarantine.quarantine_path(path))
+            self.assertEqual((12001, 1), ingest.ingest(path, "json", self.comments, self.videos, self.categories,
+                                                       jobs, quarantine_rows=rows))
+            rows.flush()
+            self.check_same_as_full_run(path)
+            self.assertEqual("t\ufffd3", data_store.load_video_entry(path, "v3")["title"])
+            self.assertEqual([("comments.csv", 6, quarantine.BAD_QUOTING, ['v1,"stray,1,0'])],
+                             quarantine.read_quarantine(rows.path))
+
+    def test_rankings_kept(self):
+        path = os.path.join(self.dir, "data.json")
+        ingest.ingest(path, "json", self.comments, self.videos, self.categories, with_rankings=True)
+        self.write_snapshot(1)
+        # a later run without the option keeps the rankings up to date
+        self.run_ingest(path)
+        self.check_same_as_full_run(path)
+        rankings = data_store.load_rankings(path)
+        self.assertEqual(["v3", "v2", "v1"], rankings["videos"]["1"])
+        self.assertEqual([1, 0], rankings["comments"]["v1"])
+
+    def test_scores_kept(self):
+        path = os.path.join(self.dir, "store")
+        ingest.ingest(path, "columnar", self.comments, self.videos, self.categories, score=True)
+        self.write_snapshot(1)
+        self.run_ingest(path, "columnar")
+        expected = extract.preprocess(self.comments, self.videos, self.categories)
+        sentiment_engine.add_sentiments(expected)
+        data = data_store.load_data(path)
+        for video_id in expected:
+            self.assertEqual([c["sentiment"] for c in expected[video_id]["comments"]],
+                             [c["sentiment"] for c in data[video_id]["comments"]])
+
+    def test_moved_to_unknown_category(self):
+        for data_format, name in (("json", "data.json"), ("columnar", "store")):
+            path = os.path.join(self.dir, name)
+            self.write_snapshot(0, "w")
+            self.run_ingest(path, data_format)
+            with open(self.videos, "a", newline="") as f:
+                f.write('v2,t2,c2,99,,25,2,0,1,l2,14.09\n')
+            # a full run leaves v2 out, so everything is ingested again
+            self.assertEqual((1, 4), self.run_ingest(path, data_format))
+            self.check_same_as_full_run(path)
+            self.assertNotIn("v2", data_store.load_data(path))
+
+    def test_rewritten_store_ingested_again(self):
+        path = os.path.join(self.dir, "data.json")
+        self.run_ingest(path)
+        data_store.write_data({}, path)
+        self.assertIsNone(ingest.load_manifest(path))
+        self.assertEqual((2, 4), self.run_ingest(path))
+
+        # written out again with the same size
+        with open(path, "rb") as f:
+            content = f.read()
+        with open(path, "wb") as f:
+            f.write(content)
+        os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 10 ** 9))
+        self.assertIsNone(ingest.load_manifest(path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,238 @@
+"""
+metrics.py
+
+Instrumentation of the scripts: wall time, CPU time, peak memory and counters, per stage of a run.
+
+A run is started by the scripts with --metrics (and/or --profile), see run(). While a run is active, the library
+functions record their stages (load, comments, sentiment, tokens, wordcloud, ...) and counters (rows read, comments
+scored, clouds rendered, ...). A stage that is entered several times accumulates. When no run is active, stage()
+and count() do nothing, so the instrumentation costs nothing outside of instrumented runs.
+
+At the end of a run, the metrics are written to a json file, and a compact summary is printed to stderr:
+{
+    "run": "extract",
+    "arguments": {"set": "US", "jobs": 4, ...},
+    "wall_seconds": 12.3, "cpu_seconds": 20.1, "peak_rss_mb": 850.2,
+    "counters": {"rows_read": 691400, "rows_skipped": 412, ...},
+    "stages": {
+        "comments": {"calls": 1, "wall_seconds": 9.8, "cpu_seconds": 17.5, "peak_rss_mb": 810.4,
+                     "counters": {"rows_read": 691400, ...}},
+        ...
+    }
+}
+The CPU time includes the worker processes of the stage (once they have exited). Peak memory is the high-water mark
+of this process at the end of the stage, so it only grows from stage to stage. Both come from the resource module,
+which windows does not have: there, the CPU time is the one of this process only, and peak memory is left out.
+
+With --profile, the run is profiled with cProfile as well, and the statistics are written to that file (for pstats or
+snakeviz).
+"""
+
+import contextlib
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+
+try:
+    import resource
+except ImportError:
+    # not available on windows, the CPU time of the worker processes and the peak memory are then left out
+    resource = None
+
+# the active run, see run()
+current = None
+
+
+class RunMetrics(object):
+    """
+    The metrics of one run, see the module docstring.
+    """
+    def __init__(self, name, arguments=None):
+        self.name = name
+        self.arguments = arguments
+        self.counters = OrderedDict()
+        self.stages = OrderedDict()
+        # names of the stages being run, innermost last
+        self.open_stages = []
+        self.started = time.time()
+        self.start_wall = time.perf_counter()
+        self.start_cpu = cpu_time()
+        self.wall_seconds = None
+        self.cpu_seconds = None
+
+    def stage_metrics(self, name):
+        """
+        :param name: string, stage name
+        :return: dictionary, the metrics of the stage, created if needed
+        """
+        if name not in self.stages:
+            self.stages[name] = {"calls": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0}
+            if resource is not None:
+                self.stages[name]["peak_rss_mb"] = 0.0
+            self.stages[name]["counters"] = OrderedDict()
+        return self.stages[name]
+
+    def add(self, counter, n):
+        """
+        :param counter: string, counter name
+        :param n: int, added to the counter, for the run and the innermost stage
+        """
+        self.counters[counter] = self.counters.get(counter, 0) + n
+        if self.open_stages:
+            stage_counters = self.stages[self.open_stages[-1]]["counters"]
+            stage_counters[counter] = stage_counters.get(counter, 0) + n
+
+    def finish(self):
+        self.wall_seconds = time.perf_counter() - self.start_wall
+        self.cpu_seconds = cpu_time() - self.start_cpu
+
+    def to_dict(self):
+        metrics = OrderedDict([
+            ("run", self.name),
+            ("arguments", self.arguments),
+            ("started", time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started))),
+            ("wall_seconds", self.wall_seconds),
+            ("cpu_seconds", self.cpu_seconds),
+        ])
+        if resource is not None:
+            metrics["peak_rss_mb"] = peak_rss_mb()
+        metrics["counters"] = self.counters
+        metrics["stages"] = self.stages
+        return metrics
+
+    def summary(self):
+        """
+        :return: string, a few lines describing the run
+        """
+        lines = ["%s: %0.2fs wall, %0.2fs cpu" % (self.name, self.wall_seconds, self.cpu_seconds)]
+        if resource is not None:
+            lines[0] += ", %0.0f MB peak" % peak_rss_mb()
+        for name, stage in self.stages.items():
+            counters = ", ".join("%s %d" % item for item in stage["counters"].items())
+            lines.append(("  %-12s %8.2fs wall %8.2fs cpu  x%-4d %s" % (name, stage["wall_seconds"],
+                                                                       stage["cpu_seconds"], stage["calls"],
+                                                                       counters)).rstrip())
+        return "\n".join(lines)
+
+
+###########
+# Helpers #
+###########
+def cpu_time():
+    """
+    :return: float, CPU seconds used by this process and its (exited) children
+    """
+    if resource is None:
+        return time.process_time()
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time() + children.ru_utime + children.ru_stime
+
+
+def peak_rss_mb():
+    """
+    :return: float, peak resident memory of this process in MB, or None if it is not available
+    """
+    if resource is None:
+        return None
+    # kilobytes on linux, bytes on macos
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
+
+
+#######
+# API #
+#######
+@contextlib.contextmanager
+def stage(name):
+    """
+    Record a stage of the active run. Also usable as a function decorator: @metrics.stage("load").
+    A stage entered from within a stage of the same name (e.g. a loader calling another loader) is only recorded
+    once.
+
+    :param name: string, stage name
+    """
+    run_metrics = current
+    if run_metrics is None or name in run_metrics.open_stages:
+        yield
+        return
+
+    stage_metrics = run_metrics.stage_metrics(name)
+    run_metrics.open_stages.append(name)
+    start_wall = time.perf_counter()
+    start_cpu = cpu_time()
+    try:
+        yield
+    finally:
+        run_metrics.open_stages.pop()
+        stage_metrics["calls"] += 1
+        stage_metrics["wall_seconds"] += time.perf_counter() - start_wall
+        stage_metrics["cpu_seconds"] += cpu_time() - start_cpu
+        if resource is not None:
+            stage_metrics["peak_rss_mb"] = peak_rss_mb()
+
+
+def count(counter, n=1):
+    """
+    Add to a counter of the active run.
+
+    :param counter: string, counter name (rows_read, comments_scored, ...)
+    :param n: int
+    """
+    if current is not None:
+        current.add(counter, n)
+
+
+@contextlib.contextmanager
+def run(name, metrics_path=None, profile_path=None, arguments=None):
+    """
+    Instrument a run of a script. Nothing is recorded if neither metrics_path nor profile_path is given.
+
+    :param name: string, name of the script
+    :param metrics_path: string, .json file to write the metrics to, or None
+    :param profile_path: string, file to write the cProfile statistics to, or None
+    :param arguments: dictionary of the command line flags of the run, for the record
+    """
+    global current
+    if metrics_path is None and profile_path is None:
+        yield
+        return
+
+    profiler = None
+    if profile_path is not None:
+        import cProfile
+        profiler = cProfile.Profile()
+
+    previous = current
+    current = RunMetrics(name, arguments)
+    run_metrics = current
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(profile_path)
+        current = previous
+        run_metrics.finish()
+        if metrics_path is not None:
+            directory = os.path.dirname(metrics_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(metrics_path, "w") as metrics_file:
+                json.dump(run_metrics.to_dict(), metrics_file, indent=2)
+        print(run_metrics.summary(), file=sys.stderr)
+
+
+def add_arguments(parser):
+    """
+    Add the --metrics and --profile flags to the parser of a script.
+
+    :param parser: argparse.ArgumentParser
+    """
+    parser.add_argument("--metrics", help="Write the timings and counters of every stage of the run to this .json "
+                                          "file, and print a summary", required=False)
+    parser.add_argument("--profile", help="Profile the run with cProfile, and write the statistics to this file",
+                        required=False)
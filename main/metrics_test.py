@@ -0,0 +1,104 @@
+import contextlib
+import io
+import json
+import os
+import pstats
+import shutil
+import tempfile
+import unittest
+import extract_helpers
+import extract_parallel
+import metrics
+from extract_helpers_test import TestParseCommentsData
+
+COMMENTS = 'video_id,comment_text,likes,replies\nv2,hi,1,0\nbroken\nv1,bad,x,0\nv1,ok,1,0\nv1,"two\nlines",0,0\n'
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "metrics.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def run_metrics(self, function, profile_path=None):
+        with contextlib.redirect_stderr(io.StringIO()) as summary, contextlib.redirect_stdout(io.StringIO()):
+            with metrics.run("test", self.path, profile_path, {"flag": 1}):
+                function()
+        with open(self.path, "r") as metrics_file:
+            return json.load(metrics_file), summary.getvalue()
+
+    def test_stages_and_counters(self):
+        def work():
+            with metrics.stage("outer"):
+                metrics.count("items", 2)
+                with metrics.stage("outer"):
+                    metrics.count("items")
+                with metrics.stage("inner"):
+                    metrics.count("items", 10)
+            with metrics.stage("outer"):
+                pass
+            metrics.count("other")
+
+        results, summary = self.run_metrics(work)
+        self.assertEqual("test", results["run"])
+        self.assertEqual({"flag": 1}, results["arguments"])
+        self.assertEqual({"items": 13, "other": 1}, results["counters"])
+        self.assertEqual(["outer", "inner"], list(results["stages"]))
+        self.assertEqual(2, results["stages"]["outer"]["calls"])
+        self.assertEqual({"items": 3}, results["stages"]["outer"]["counters"])
+        self.assertEqual({"items": 10}, results["stages"]["inner"]["counters"])
+        self.assertGreater(results["peak_rss_mb"], 0)
+        self.assertTrue(summary.startswith("test: "))
+        self.assertIn("inner", summary)
+        self.assertIsNone(metrics.current)
+
+    def test_without_resource(self):
+        def work():
+            with metrics.stage("outer"):
+                metrics.count("items")
+
+        # windows has no resource module
+        previous = metrics.resource
+        metrics.resource = None
+        try:
+            results, summary = self.run_metrics(work)
+        finally:
+            metrics.resource = previous
+        self.assertNotIn("peak_rss_mb", results)
+        self.assertNotIn("peak_rss_mb", results["stages"]["outer"])
+        self.assertGreaterEqual(results["cpu_seconds"], 0)
+        self.assertNotIn("MB peak", summary)
+
+    def test_inactive(self):
+        with metrics.run("test"):
+            self.assertIsNone(metrics.current)
+            with metrics.stage("outer"):
+                metrics.count("items")
+
+    def test_comment_rows(self):
+        def parse():
+            extract_helpers.parse_comments_data(TestParseCommentsData.VIDEOS, TestParseCommentsData.CATEGORIES,
+                                                io.StringIO(COMMENTS, newline=""))
+
+        expected = {"rows_read": 5, "rows_parsed": 2, "rows_skipped": 3, "rows_malformed": 2}
+        results, summary = self.run_metrics(parse)
+        self.assertEqual(expected, results["counters"])
+
+        # the rows parsed by the worker processes are counted as well
+        comments_path = os.path.join(self.dir, "comments.csv")
+        with open(comments_path, "w", newline="") as comments_file:
+            comments_file.write(COMMENTS)
+        results, summary = self.run_metrics(lambda: extract_parallel.parse_comments_data_parallel(
+            TestParseCommentsData.VIDEOS, TestParseCommentsData.CATEGORIES, comments_path, 2))
+        self.assertEqual(expected, results["counters"])
+
+    def test_profile(self):
+        profile_path = os.path.join(self.dir, "run.prof")
+        self.run_metrics(lambda: sorted(range(1000)), profile_path)
+        self.assertGreater(pstats.Stats(profile_path).total_calls, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
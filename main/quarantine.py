@@ -0,0 +1,164 @@
+"""
+quarantine.py
+
+The rows of the input files that cannot be ingested are set aside in a quarantine file, instead of printing a warning
+for each of them:
+- malformed rows (missing fields, or a number that does not parse),
+- comments of a video that is not in the videos file,
+- comments of a video whose category is unknown (this happens for the GB dataset),
+- lines where a stray quote would swallow the rows after it (the line is quarantined as it is, and the rows after it
+  are read as usual).
+Rows of the videos file with a malformed date are quarantined as well, although the video itself is kept: only the
+row is left out of the time series of the video.
+
+The quarantine file is a csv file, with the input file, the line number (where the row starts), the reason, and the
+fields of the row (as a json list):
+file,line,reason,row
+UScomments.csv,4123,missing_fields,"[""great video""]"
+
+Rows are written in batches. The number of rows of each reason is kept, for the summary at the end of a run (and
+in the metrics of the run).
+"""
+
+import csv
+import json
+import os
+from collections import OrderedDict
+
+import metrics
+
+# the quarantine file is kept next to the output (also for a columnar store, which may not exist yet when the rows are
+# quarantined)
+QUARANTINE_SUFFIX = ".quarantine.csv"
+HEADER = ("file", "line", "reason", "row")
+# number of rows kept in memory before they are written out
+FLUSH_SIZE = 10000
+
+# reasons
+MISSING_FIELDS = "missing_fields"
+BAD_NUMBER = "bad_number"
+UNKNOWN_VIDEO = "unknown_video"
+UNKNOWN_CATEGORY = "unknown_category"
+BAD_DATE = "bad_date"
+# a line where a stray quote opens a quoted field that does not end where it should, and the one where a quoted field
+# is still open at the end of the file (see extract_helpers.read_numbered_chunks)
+BAD_QUOTING = "bad_quoting"
+UNCLOSED_QUOTE = "unclosed_quote"
+
+
+def quarantine_path(path):
+    """
+    :param path: string, the .json file or columnar store directory
+    :return: string, filename of its quarantine file
+    """
+    return os.path.normpath(path) + QUARANTINE_SUFFIX
+
+
+class Quarantine(object):
+    """
+    Collects the rows that could not be ingested, see the module docstring.
+    """
+    def __init__(self, path=None, append=False):
+        """
+        :param path: string, the quarantine file, or None to only count the rows
+        :param append: bool, whether to add to an existing quarantine file, instead of starting a new one
+        """
+        self.path = path
+        self.counts = OrderedDict()
+        self.pending = []
+        if not append:
+            self.clear()
+
+    def add(self, source, line, reason, fields):
+        """
+        :param source: string, name of the input file
+        :param line: int, line number of the row in the input file
+        :param reason: string
+        :param fields: list of strings, the fields of the row
+        """
+        self.counts[reason] = self.counts.get(reason, 0) + 1
+        metrics.count("quarantined_" + reason)
+        if self.path is not None:
+            self.pending.append((source, line, reason, json.dumps(fields)))
+            if len(self.pending) >= FLUSH_SIZE:
+                self.flush()
+
+    def add_rows(self, source, rows, first_line=1):
+        """
+        :param source: string, name of the input file
+        :param rows: list of tuples of (line number, reason, fields), line numbers starting at 1
+        :param first_line: int, line number in the input file of line 1 of rows
+        """
+        for line, reason, fields in rows:
+            self.add(source, line + first_line - 1, reason, fields)
+
+    def flush(self):
+        """
+        Write out the rows collected so far.
+        """
+        if self.path is None or not self.pending:
+            return
+        new_file = not os.path.exists(self.path)
+        with open(self.path, "a", newline="") as quarantine_file:
+            writer = csv.writer(quarantine_file)
+            if new_file:
+                writer.writerow(HEADER)
+            writer.writerows(self.pending)
+        self.pending = []
+
+    def update_rows(self, source, reasons):
+        """
+        Change the reason of rows that are already in the quarantine file, or take them out of it (the comments of an
+        unknown video are ingested once the video shows up in a later snapshot, see ingest.py).
+
+        :param source: string, name of the input file
+        :param reasons: dictionary of {line number: new reason, or None to take the row out}
+        """
+        self.flush()
+        if self.path is None or not reasons or not os.path.exists(self.path):
+            return
+        with open(self.path, "r", newline="") as quarantine_file:
+            rows = list(csv.reader(quarantine_file))
+        kept = rows[:1]
+        for row in rows[1:]:
+            if row[0] == source and int(row[1]) in reasons:
+                if reasons[int(row[1])] is None:
+                    continue
+                row[2] = reasons[int(row[1])]
+            kept.append(row)
+        with open(self.path, "w", newline="") as quarantine_file:
+            csv.writer(quarantine_file).writerows(kept)
+
+    def clear(self):
+        """
+        Start over, without any rows (the quarantine file is removed).
+        """
+        self.counts = OrderedDict()
+        self.pending = []
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def total(self):
+        """
+        :return: int, number of rows quarantined
+        """
+        return sum(self.counts.values())
+
+    def summary(self):
+        """
+        :return: string, one line with the number of rows of each reason
+        """
+        reasons = ", ".join("%s %d" % item for item in self.counts.items())
+        where = ", see %s" % self.path if self.path is not None else ""
+        return "quarantined %d rows (%s)%s" % (self.total(), reasons, where)
+
+
+def read_quarantine(path):
+    """
+    :param path: string, a quarantine file
+    :return: list of tuples of (file, line number, reason, list of fields)
+    """
+    with open(path, "r", newline="") as quarantine_file:
+        reader = csv.reader(quarantine_file)
+        next(reader, None)
+        return [(source, int(line), reason, json.loads(row)) for (source, line, reason, row) in reader]
@@ -0,0 +1,114 @@
+"""
+rankings.py
+
+Scores used to rank videos and comments, and top K selection.
+
+Top K selection uses a heap (heapq.nlargest), which is O(N log K) instead of the O(N log N) of a full sort, and keeps
+the same order as sorted(..., reverse=True)[:K] for ties.
+
+build_rankings() precomputes the rankings for the index written by data_store, so that a top N query only has to
+read the first N entries of a list.
+"""
+
+import heapq
+
+# number of comments ranked per video in the precomputed rankings
+RANK_DEPTH = 100
+
+
+##########
+# Scores #
+##########
+def video_score(views, likes, dislikes, num_comments):
+    """
+    Computes an artificial score for a video indicating the video's popularity.
+
+    The current formula in use is:
+    views + (likes * 10) - (dislikes * 10) + (num_comments * 10)
+
+    :param views: int, number of views on a video
+    :param likes: int, number of likes on a video
+    :param dislikes: int, number of dislikes on a video
+    :param num_comments: int, number of comments on the video
+    :return: float, comment score
+    """
+    return views + (likes * 10) - (dislikes * 10) + (num_comments * 10)
+
+
+def comment_score(likes, replies):
+    """
+    Computes an artificial score for a comment indicating its rank.
+    Note that the dataset does not include dislikes, only likes and replies.
+
+    The current formula in use is:
+    (likes * 2) + num_replies
+
+    :param likes: int, number of likes on a comment
+    :param replies: int, number of replies on a comment
+    :return: int, comment score
+    """
+    return (likes * 2) + replies
+
+
+def entry_score(entry):
+    """
+    :param entry: dictionary, a data entry
+    :return: the video_score() of the data entry
+    """
+    # the numbers are ints since extract.py types them, int() keeps older files (with strings) working
+    return video_score(int(entry["views"]), int(entry["likes"]), int(entry["dislikes"]), len(entry["comments"]))
+
+
+def comment_entry_score(comment):
+    """
+    :param comment: dictionary, a comment entry
+    :return: the comment_score() of the comment entry
+    """
+    return comment_score(int(comment["likes"]), int(comment["replies"]))
+
+
+#########
+# Top K #
+#########
+def top_videos(data_entries, num_videos):
+    """
+    :param data_entries: dictionary of data entries
+    :param num_videos: int, number of videos to return
+    :return: list of video ids, the num_videos videos with the highest video score
+    """
+    return heapq.nlargest(num_videos, data_entries, key=lambda video_id: entry_score(data_entries[video_id]))
+
+
+def top_comment_indices(comments, num_comments):
+    """
+    :param comments: list of comment entries
+    :param num_comments: int, number of comments to return
+    :return: list of ints, the indices of the num_comments comments with the highest comment score
+    """
+    return heapq.nlargest(num_comments, range(len(comments)), key=lambda i: comment_entry_score(comments[i]))
+
+
+def build_rankings(data_entries, depth=RANK_DEPTH):
+    """
+    Precompute the rankings of the data entries:
+    {
+        "videos": {category_id: [all of the video ids of the category, by decreasing video score]},
+        "comments": {video_id: [indices of the top depth comments of the video, by decreasing comment score]}
+    }
+
+    :param data_entries: dictionary of data entries
+    :param depth: int, number of comments ranked per video
+    :return: dictionary
+    """
+    categories = {}
+    for video_id in data_entries:
+        categories.setdefault(data_entries[video_id]["category_id"], []).append(video_id)
+
+    video_rankings = {}
+    for category_id, video_ids in categories.items():
+        video_rankings[category_id] = sorted(video_ids, reverse=True,
+                                             key=lambda video_id: entry_score(data_entries[video_id]))
+
+    comment_rankings = {video_id: top_comment_indices(data_entries[video_id]["comments"], depth)
+                        for video_id in data_entries}
+    return {"videos": video_rankings, "comments": comment_rankings}
@@ -0,0 +1,43 @@
+import random
+import unittest
+import rankings
+
+
+def video(category_id, views, likes, dislikes, num_comments):
+    return {"category_id": category_id, "views": views, "likes": likes, "dislikes": dislikes,
+            "comments": [{"comment_text": "", "likes": 0, "replies": 0}] * num_comments}
+
+
+class TestTopK(unittest.TestCase):
+    def test_top_videos_matches_sort(self):
+        rng = random.Random(0)
+        data = {"v%d" % i: video("1", rng.randint(0, 50), rng.randint(0, 5), rng.randint(0, 5), rng.randint(0, 3))
+                for i in range(300)}
+        expected = sorted(data, key=lambda v: rankings.entry_score(data[v]), reverse=True)
+        for n in (0, 1, 10, 300, 500):
+            self.assertEqual(expected[:n], rankings.top_videos(data, n))
+
+    def test_top_comments_matches_sort(self):
+        rng = random.Random(1)
+        comments = [{"comment_text": str(i), "likes": rng.randint(0, 5), "replies": rng.randint(0, 5)}
+                    for i in range(200)]
+        expected = sorted(range(len(comments)), key=lambda i: rankings.comment_entry_score(comments[i]),
+                          reverse=True)
+        self.assertEqual(expected[:10], rankings.top_comment_indices(comments, 10))
+
+    def test_string_numbers(self):
+        self.assertEqual(rankings.entry_score(video("1", "100", "5", "1", 2)),
+                         rankings.entry_score(video("1", 100, 5, 1, 2)))
+
+
+class TestBuildRankings(unittest.TestCase):
+    def test_build_rankings(self):
+        data = {"a": video("1", 10, 0, 0, 0), "b": video("2", 5, 0, 0, 0), "c": video("1", 20, 0, 0, 3)}
+        data["c"]["comments"] = [{"comment_text": "", "likes": likes, "replies": 0} for likes in (1, 3, 2)]
+        result = rankings.build_rankings(data, depth=2)
+        self.assertEqual({"1": ["c", "a"], "2": ["b"]}, result["videos"])
+        self.assertEqual({"a": [], "b": [], "c": [1, 2]}, result["comments"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,166 @@
+"""
+render_cache.py
+
+Persistent cache of rendered word clouds, kept in a local directory of .png files.
+
+A word cloud only depends on its table of token counts (after pruning, so the stopwords and max_words are already
+applied to it) and on the render parameters (size, background, max_words). Renders are keyed by a hash of both, and
+of the wordcloud version, so that re-running a script on unchanged comments copies the previous render instead of
+rendering it again. The directory is bounded in size: once it holds more than max_mb, the least recently used renders
+are evicted.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+
+DEFAULT_MAX_MB = 500
+SUFFIX = ".png"
+
+
+def renderer_version():
+    """
+    A version string for the renders: the wordcloud version (its layout code decides what a render looks like). Read
+    from the package metadata, so that wordcloud does not have to be imported.
+
+    :return: string
+    """
+    from importlib import metadata
+    try:
+        return "wordcloud-" + metadata.version("wordcloud")
+    except metadata.PackageNotFoundError:
+        return "wordcloud-unknown"
+
+
+class RenderCache:
+    """
+    A cache of {(frequencies, render parameters): .png file}.
+    Safe to use from several processes at once: files are only ever replaced whole.
+    """
+
+    def __init__(self, directory, max_mb=DEFAULT_MAX_MB, version=None):
+        """
+        :param directory: string, the cache directory, created if needed
+        :param max_mb: float, maximum total size of the renders kept, in MB
+        :param version: string, defaults to renderer_version()
+        """
+        self.directory = directory
+        self.max_mb = max_mb
+        self.version = version if version is not None else renderer_version()
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, frequencies, parameters):
+        """
+        :param frequencies: dictionary of {token: count}, the table that is rendered
+        :param parameters: dictionary of the render parameters, json serializable
+        :return: string, the cache key of the render
+        """
+        digest = hashlib.sha1(self.version.encode("utf-8"))
+        digest.update(json.dumps(parameters, sort_keys=True).encode("utf-8"))
+        digest.update(json.dumps(sorted(frequencies.items())).encode("utf-8"))
+        return digest.hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.directory, key + SUFFIX)
+
+    def get(self, key, filename):
+        """
+        Link (or copy, across file systems) the render of key to filename, if it is in the cache.
+
+        :param key: string, see key()
+        :param filename: string, where the render is wanted
+        :return: bool, whether the render was in the cache
+        """
+        entry = self.entry_path(key)
+        try:
+            # mark the entry as recently used
+            os.utime(entry)
+        except FileNotFoundError:
+            return False
+        temporary = "%s.%d.tmp" % (filename, os.getpid())
+        try:
+            os.link(entry, temporary)
+        except FileNotFoundError:
+            # evicted in the meantime
+            return False
+        except OSError:
+            shutil.copyfile(entry, temporary)
+        os.replace(temporary, filename)
+        return True
+
+    def put(self, key, filename):
+        """
+        Store a copy of a render. Entries are not evicted here, see evict().
+
+        :param key: string, see key()
+        :param filename: string, the rendered file
+        """
+        entry = self.entry_path(key)
+        temporary = "%s.%d.tmp" % (entry, os.getpid())
+        shutil.copyfile(filename, temporary)
+        os.replace(temporary, entry)
+
+    def entries(self):
+        """
+        :return: list of tuples of (last used time, size in bytes, path), least recently used first
+        """
+        found = []
+        with os.scandir(self.directory) as scan:
+            for dir_entry in scan:
+                if dir_entry.name.endswith(SUFFIX):
+                    try:
+                        stat = dir_entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    found.append((stat.st_mtime, stat.st_size, dir_entry.path))
+        return sorted(found)
+
+    def evict(self):
+        """
+        Remove the least recently used renders, until at most max_mb are left.
+
+        :return: int, number of renders removed
+        """
+        entries = self.entries()
+        total = sum(size for (_, size, _) in entries)
+        max_bytes = self.max_mb * 1024 * 1024
+        removed = 0
+        for (_, size, path) in entries:
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
+
+    def size_mb(self):
+        return sum(size for (_, size, _) in self.entries()) / (1024.0 * 1024.0)
+
+    def __len__(self):
+        return len(self.entries())
+
+
+def add_arguments(parser):
+    """
+    Add the --render-cache and --render-cache-mb flags to the parser of a script.
+
+    :param parser: argparse.ArgumentParser
+    """
+    parser.add_argument("--render-cache", help="Directory used to cache the rendered wordclouds between runs",
+                        required=False)
+    parser.add_argument("--render-cache-mb", help="Maximum size of the wordcloud cache, in MB", type=float,
+                        default=DEFAULT_MAX_MB)
+
+
+def from_arguments(args):
+    """
+    :param args: argparse.Namespace, with the flags of add_arguments()
+    :return: RenderCache, or None if --render-cache was not given
+    """
+    if args.render_cache is None:
+        return None
+    return RenderCache(args.render_cache, args.render_cache_mb)
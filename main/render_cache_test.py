@@ -0,0 +1,92 @@
+import contextlib
+import filecmp
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import metrics
+import render_cache
+import wordcloud_helper
+
+COUNTS = {"love": 5, "song": 3, "guitar": 2}
+PARAMETERS = {"width": 700, "height": 500}
+
+
+class TestRenderCache(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cache = render_cache.RenderCache(os.path.join(self.dir, "cache"), version="test")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, name, size):
+        path = os.path.join(self.dir, name)
+        with open(path, "wb") as f:
+            f.write(b"x" * size)
+        return path
+
+    def test_get_put(self):
+        key = self.cache.key(COUNTS, PARAMETERS)
+        target = os.path.join(self.dir, "out.png")
+        self.assertFalse(self.cache.get(key, target))
+        self.cache.put(key, self.write("render.png", 10))
+        self.assertTrue(self.cache.get(key, target))
+        self.assertTrue(filecmp.cmp(os.path.join(self.dir, "render.png"), target, shallow=False))
+
+    def test_key(self):
+        key = self.cache.key(COUNTS, PARAMETERS)
+        self.assertEqual(key, self.cache.key(dict(reversed(list(COUNTS.items()))), dict(PARAMETERS)))
+        self.assertNotEqual(key, self.cache.key(dict(COUNTS, love=6), PARAMETERS))
+        self.assertNotEqual(key, self.cache.key(COUNTS, dict(PARAMETERS, width=800)))
+        other = render_cache.RenderCache(self.cache.directory, version="other")
+        self.assertNotEqual(key, other.key(COUNTS, PARAMETERS))
+
+    def test_eviction(self):
+        self.cache.max_mb = 2.5 / 1024
+        for i in range(4):
+            self.cache.put("key%d" % i, self.write("render%d.png" % i, 1024))
+            os.utime(self.cache.entry_path("key%d" % i), (i, i))
+        # key0 is used again, so key1 is the least recently used
+        self.assertTrue(self.cache.get("key0", os.path.join(self.dir, "out.png")))
+        self.assertEqual(2, self.cache.evict())
+        self.assertEqual(2, len(self.cache))
+        self.assertFalse(self.cache.get("key1", os.path.join(self.dir, "out.png")))
+        self.assertTrue(self.cache.get("key3", os.path.join(self.dir, "out.png")))
+
+    def render(self, jobs, processes):
+        metrics_path = os.path.join(self.dir, "metrics.json")
+        with contextlib.redirect_stderr(io.StringIO()):
+            with metrics.run("test", metrics_path):
+                filenames = wordcloud_helper.generate_wordclouds_from_counts(jobs, processes, cache=self.cache)
+        with open(metrics_path, "r") as metrics_file:
+            return filenames, json.load(metrics_file)["counters"]
+
+    def test_render(self):
+        jobs = [(COUNTS, "cloud", self.dir), (dict(COUNTS, drums=1), "drums", self.dir)]
+        filenames, counters = self.render(jobs, 1)
+        self.assertEqual({"clouds_rendered": 2, "clouds_cached": 0}, counters)
+        first = os.path.join(self.dir, "first.png")
+        shutil.copyfile(filenames[0], first)
+
+        # the wordclouds are random, so only a cached wordcloud is byte identical
+        filenames, counters = self.render(jobs, 2)
+        self.assertEqual({"clouds_rendered": 0, "clouds_cached": 2}, counters)
+        self.assertTrue(filecmp.cmp(first, filenames[0], shallow=False))
+        self.assertEqual(2, len(self.cache))
+
+    def test_render_over_cached_file(self):
+        # the output file is a link to the cached render, rendering again must not change the cached render
+        target = os.path.join(self.dir, "cloud.png")
+        self.cache.put("key", self.write("render.png", 10))
+        self.assertTrue(self.cache.get("key", target))
+        wordcloud_helper.render_frequencies(COUNTS, target)
+        with open(self.cache.entry_path("key"), "rb") as cached_file:
+            self.assertEqual(b"x" * 10, cached_file.read())
+        self.assertGreater(os.path.getsize(target), 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
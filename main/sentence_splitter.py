@@ -0,0 +1,107 @@
+"""
+sentence_splitter.py
+
+Splits comments into sentences, in batches, for sentiment_engine.py.
+
+Two splitters:
+- "punkt": nltk's Punkt tokenizer (what nltk.tokenize.sent_tokenize uses). The model is loaded once per process and
+  reused for every batch. Most comments have no sentence ending punctuation at all, and Punkt never splits those, so
+  they are not handed to it: the result is the same.
+- "rules": a regular expression and two exceptions: split after . ! or ? followed by whitespace, unless the period
+  ends an initial or a known abbreviation, or it is an ellipsis followed by a lowercase word. Several times faster than
+  Punkt, but it has no statistics about abbreviations; see sentence_splitter_bench.py for how often it agrees with
+  Punkt on the data.
+
+nltk is only imported when Punkt is first used.
+"""
+
+import re
+
+PUNKT = "punkt"
+RULES = "rules"
+SPLITTERS = (PUNKT, RULES)
+
+# the sentence ending characters of Punkt's (english) model, a text without any of them is never split
+SENTENCE_END = re.compile(r"[.?!]")
+# a run of sentence ending characters, possibly followed by closing quotes or brackets, then whitespace
+RULE_BREAK = re.compile(r"""([.?!]+)['")\]]*(\s+)(?=(\S))""")
+# a period after one of these does not end a sentence
+ABBREVIATIONS = {"mr", "mrs", "ms", "dr", "st", "vs", "jr", "sr", "prof", "e.g", "i.e", "u.s", "a.m", "p.m"}
+
+# the Punkt tokenizer of this process, see punkt_tokenizer()
+tokenizer = None
+
+
+def punkt_tokenizer():
+    """
+    :return: the Punkt sentence tokenizer of nltk (english), loaded once per process
+    """
+    global tokenizer
+    if tokenizer is None:
+        try:
+            from nltk.tokenize.punkt import PunktTokenizer
+            tokenizer = PunktTokenizer("english")
+        except ImportError:
+            # nltk before 3.8.2 ships the model as a pickle
+            import nltk.data
+            tokenizer = nltk.data.load("tokenizers/punkt/english.pickle")
+    return tokenizer
+
+
+def split_punkt(texts):
+    """
+    :param texts: list of strings
+    :return: list of lists of strings, the sentences of each text, the same as nltk.tokenize.sent_tokenize()
+    """
+    tokenize = punkt_tokenizer().tokenize
+    results = []
+    for text in texts:
+        if SENTENCE_END.search(text) is not None:
+            results.append(tokenize(text))
+        else:
+            # Punkt drops the trailing whitespace of the last sentence, and returns no sentence for a blank text
+            text = text.rstrip()
+            results.append([text] if text else [])
+    return results
+
+
+def split_rules(texts):
+    """
+    :param texts: list of strings
+    :return: list of lists of strings, the sentences of each text
+    """
+    results = []
+    for text in texts:
+        text = text.rstrip()
+        if SENTENCE_END.search(text) is None:
+            results.append([text] if text else [])
+            continue
+        sentences = []
+        start = 0
+        for match in RULE_BREAK.finditer(text):
+            end, next_character = match.group(1), match.group(3)
+            if end == ".":
+                words = text[start:match.start(1)].rsplit(None, 1)
+                word = words[-1].lower() if words else ""
+                if len(word) == 1 or word in ABBREVIATIONS:
+                    continue
+            elif end.startswith("..") and next_character.islower():
+                continue
+            sentences.append(text[start:match.start(2)])
+            start = match.end(2)
+        sentences.append(text[start:])
+        results.append(sentences)
+    return results
+
+
+def split_batch(texts, splitter=PUNKT):
+    """
+    :param texts: list of strings
+    :param splitter: string, one of SPLITTERS
+    :return: list of lists of strings, the sentences of each text
+    """
+    if splitter == PUNKT:
+        return split_punkt(texts)
+    if splitter == RULES:
+        return split_rules(texts)
+    raise ValueError("unknown sentence splitter: %s" % splitter)
@@ -0,0 +1,104 @@
+"""
+sentence_splitter_bench.py
+
+Benchmark of the sentence splitters of sentence_splitter.py against nltk's sent_tokenize (one call per comment, as
+sentiment_engine.py used to split comments), and a report of how often the rule based splitter agrees with Punkt.
+
+Usage:
+python3 main/sentence_splitter_bench.py -i output/preprocUS.json
+python3 main/sentence_splitter_bench.py -i output/preprocUS.json --scores -n 20
+- --scores also scores the comments with both splitters, and reports how many comments change sides (positive or
+  negative, as sentiments.py classifies them)
+- -n prints that many comments that are split differently
+"""
+
+import argparse
+from collections import Counter
+
+import data_store
+import sentence_splitter
+import sentiment_engine
+from token_counter_bench import time_call
+
+
+def sent_tokenize_each(texts):
+    """
+    How sentiment_engine.split_batch() used to split comments.
+
+    :param texts: list of strings
+    :return: list of lists of strings, the sentences of each text
+    """
+    from nltk import tokenize
+    return [tokenize.sent_tokenize(text) for text in texts]
+
+
+def agreement(punkt_sentences, rule_sentences):
+    """
+    :param punkt_sentences: list of lists of strings, the sentences of each comment, split by Punkt
+    :param rule_sentences: list of lists of strings, the sentences of each comment, split by the rules
+    :return: dictionary of {"comments", "same_sentences", "same_count", "punkt_counts", "rule_counts"}, the counts
+             being Counters of {number of sentences: number of comments}
+    """
+    return {
+        "comments": len(punkt_sentences),
+        "same_sentences": sum(1 for (p, r) in zip(punkt_sentences, rule_sentences) if p == r),
+        "same_count": sum(1 for (p, r) in zip(punkt_sentences, rule_sentences) if len(p) == len(r)),
+        "punkt_counts": Counter(min(len(p), 4) for p in punkt_sentences),
+        "rule_counts": Counter(min(len(r), 4) for r in rule_sentences),
+    }
+
+
+def score_sides(texts, splitter):
+    """
+    :param texts: list of strings
+    :param splitter: string, one of sentence_splitter.SPLITTERS
+    :return: list of bools, whether each comment is positive (None for a comment without sentences)
+    """
+    scores = sentiment_engine.score_comments(texts, splitter=splitter)
+    return [None if scores.num_sentences[i] == 0 else bool(scores.compound[i] >= 0) for i in range(len(texts))]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark sentence splitting")
+    parser.add_argument("-i", "--input", help="Specify the input file to use", required=True)
+    parser.add_argument("-n", "--examples", help="Number of comments split differently to print", type=int, default=0)
+    parser.add_argument("--scores", help="Also compare the sentiment of the comments", action="store_true")
+    args = parser.parse_args()
+
+    data_entries = data_store.load_data(args.input)
+    texts = [comment["comment_text"] for entry in data_entries.values() for comment in entry["comments"]]
+    print("Comments: %d" % len(texts))
+
+    # load the Punkt model before timing
+    sentence_splitter.punkt_tokenizer()
+    each_time, each_sentences = time_call(sent_tokenize_each, texts)
+    print("sent_tokenize, one comment at a time: %0.3fs" % each_time)
+    punkt_time, punkt_sentences = time_call(sentence_splitter.split_punkt, texts)
+    print("punkt, batch: %0.3fs (%0.2fx)" % (punkt_time, each_time / punkt_time))
+    rule_time, rule_sentences = time_call(sentence_splitter.split_rules, texts)
+    print("rules, batch: %0.3fs (%0.2fx)" % (rule_time, each_time / rule_time))
+    assert each_sentences == punkt_sentences
+
+    report = agreement(punkt_sentences, rule_sentences)
+    num_comments = max(report["comments"], 1)
+    print("rules agree with punkt: %0.2f%% of comments split the same, %0.2f%% into the same number of sentences" % (
+        100.0 * report["same_sentences"] / num_comments, 100.0 * report["same_count"] / num_comments))
+    for name in ("punkt_counts", "rule_counts"):
+        shares = ["%d%s sentences %0.2f%%" % (n, "+" if n == 4 else "", 100.0 * c / num_comments)
+                  for (n, c) in sorted(report[name].items())]
+        print("%s: %s" % (name, ", ".join(shares)))
+
+    if args.scores:
+        punkt_sides = score_sides(texts, sentence_splitter.PUNKT)
+        rule_sides = score_sides(texts, sentence_splitter.RULES)
+        changed = sum(1 for (p, r) in zip(punkt_sides, rule_sides) if p != r)
+        print("comments that change sides with the rules: %d (%0.3f%%)" % (changed, 100.0 * changed / num_comments))
+
+    shown = 0
+    for text, punkt, rules in zip(texts, punkt_sentences, rule_sentences):
+        if shown >= args.examples:
+            break
+        if punkt != rules:
+            print("_" * 20)
+            print("comment: %r\npunkt: %r\nrules: %r" % (text, punkt, rules))
+            shown += 1
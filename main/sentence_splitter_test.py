@@ -0,0 +1,32 @@
+import unittest
+from nltk import tokenize
+import sentence_splitter
+import sentiment_engine
+
+TEXTS = ["", "  ", "great video", " love it  \n", "hi. you are nice", "wow !!! great", "what?? no way",
+         "I love it... so good", "J. Smith did it. Yes", "\"Stop.\" He said", "Mr. Smith is here", "lol.. ok"]
+
+
+class TestSplitPunkt(unittest.TestCase):
+    def test_same_as_sent_tokenize(self):
+        self.assertEqual([tokenize.sent_tokenize(text) for text in TEXTS], sentence_splitter.split_punkt(TEXTS))
+
+
+class TestSplitRules(unittest.TestCase):
+    def test_split(self):
+        expected = [[], [], ["great video"], [" love it"], ["hi.", "you are nice"], ["wow !!!", "great"],
+                    ["what??", "no way"], ["I love it... so good"], ["J. Smith did it.", "Yes"],
+                    ["\"Stop.\"", "He said"], ["Mr. Smith is here"], ["lol.. ok"]]
+        self.assertEqual(expected, sentence_splitter.split_rules(TEXTS))
+
+    def test_score_comments(self):
+        scores = sentiment_engine.score_comments(["I love it. I hate it", "ok"], splitter=sentence_splitter.RULES)
+        self.assertEqual([2, 1], list(scores.num_sentences))
+
+    def test_unknown_splitter(self):
+        with self.assertRaises(ValueError):
+            sentence_splitter.split_batch(TEXTS, "spaces")
+
+
+if __name__ == '__main__':
+    unittest.main()
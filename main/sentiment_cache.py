@@ -0,0 +1,141 @@
+"""
+sentiment_cache.py
+
+Persistent cache of VADER scores, kept in a local SQLite database.
+
+Scores are keyed by a hash of the sentence (with its whitespace normalized, which does not change the VADER score)
+and of the lexicon version, so that a new lexicon or nltk version never returns stale scores. The database is
+bounded in size: once it holds more than max_entries scores, the least recently used ones are evicted.
+"""
+
+import contextlib
+import hashlib
+import sqlite3
+import time
+
+VADER_LEXICON = "sentiment/vader_lexicon.zip/vader_lexicon/vader_lexicon.txt"
+DEFAULT_MAX_ENTRIES = 5000000
+# maximum number of keys in a single sql query
+QUERY_BATCH_SIZE = 500
+
+
+def lexicon_version():
+    """
+    A version string for the VADER scores: a hash of the lexicon file, plus the nltk version (the scoring rules are
+    part of nltk's code).
+
+    :return: string
+    """
+    import nltk
+    import nltk.data
+    lexicon = nltk.data.load(VADER_LEXICON, format="raw")
+    return nltk.__version__ + "-" + hashlib.sha1(lexicon).hexdigest()
+
+
+def normalize_sentence(sentence):
+    """
+    VADER splits sentences on whitespace, so runs of whitespace can be collapsed without changing the score.
+
+    :param sentence: string
+    :return: string
+    """
+    return " ".join(sentence.split())
+
+
+class SentimentCache:
+    """
+    A cache of {sentence: VADER scores}, where the scores are the dictionaries returned by polarity_scores().
+    """
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES, version=None):
+        """
+        :param path: string, filename of the SQLite database, created if needed
+        :param max_entries: int, maximum number of scores kept
+        :param version: string, defaults to lexicon_version()
+        """
+        self.max_entries = max_entries
+        self.version = (version if version is not None else lexicon_version()).encode("utf-8")
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS scores (key BLOB PRIMARY KEY, compound REAL, pos REAL, "
+                                "neg REAL, neu REAL, last_used REAL)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS scores_last_used ON scores (last_used)")
+
+    def key(self, sentence):
+        """
+        :param sentence: string
+        :return: bytes, the cache key of the sentence
+        """
+        return hashlib.sha1(self.version + b"\0" + normalize_sentence(sentence).encode("utf-8")).digest()
+
+    def get_many(self, sentences):
+        """
+        Look up the scores of many sentences at once.
+
+        :param sentences: iterable of strings
+        :return: dictionary of {sentence: scores}, only for the sentences that were in the cache
+        """
+        keys = {}
+        for sentence in sentences:
+            keys.setdefault(self.key(sentence), []).append(sentence)
+
+        found = {}
+        hit_keys = []
+        key_list = list(keys)
+        for i in range(0, len(key_list), QUERY_BATCH_SIZE):
+            batch = key_list[i:i + QUERY_BATCH_SIZE]
+            query = "SELECT key, compound, pos, neg, neu FROM scores WHERE key IN (%s)" % ",".join("?" * len(batch))
+            for (key, compound, pos, neg, neu) in self.connection.execute(query, batch):
+                hit_keys.append(key)
+                for sentence in keys[key]:
+                    found[sentence] = {"neg": neg, "neu": neu, "pos": pos, "compound": compound}
+
+        # mark the hits as recently used
+        now = time.time()
+        self.connection.executemany("UPDATE scores SET last_used = ? WHERE key = ?", [(now, k) for k in hit_keys])
+        self.connection.commit()
+        return found
+
+    def put_many(self, scores):
+        """
+        Store the scores of many sentences at once, then evict the least recently used scores if the cache is full.
+
+        :param scores: dictionary of {sentence: scores}
+        """
+        now = time.time()
+        rows = [(self.key(sentence), s["compound"], s["pos"], s["neg"], s["neu"], now)
+                for (sentence, s) in scores.items()]
+        self.connection.executemany("INSERT OR REPLACE INTO scores VALUES (?, ?, ?, ?, ?, ?)", rows)
+        self.evict()
+        self.connection.commit()
+
+    def evict(self):
+        """
+        Remove the least recently used scores, until at most max_entries are left.
+        """
+        (count,) = self.connection.execute("SELECT COUNT(*) FROM scores").fetchone()
+        if count > self.max_entries:
+            self.connection.execute("DELETE FROM scores WHERE key IN (SELECT key FROM scores ORDER BY last_used "
+                                    "LIMIT ?)", (count - self.max_entries,))
+
+    def __len__(self):
+        (count,) = self.connection.execute("SELECT COUNT(*) FROM scores").fetchone()
+        return count
+
+    def close(self):
+        self.connection.close()
+
+
+@contextlib.contextmanager
+def open_cache(path):
+    """
+    The cache of a script run, closed at the end of the run (the service runs many scripts in the same process).
+
+    :param path: string, filename of the SQLite database, or None for no cache
+    :return: context manager, of a SentimentCache or None
+    """
+    cache = SentimentCache(path) if path is not None else None
+    try:
+        yield cache
+    finally:
+        if cache is not None:
+            cache.close()
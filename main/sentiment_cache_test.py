@@ -0,0 +1,51 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+import sentiment_cache
+
+SCORES = {"neg": 0.0, "neu": 0.5, "pos": 0.5, "compound": 0.4}
+
+
+class TestSentimentCache(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".sqlite")
+        os.close(fd)
+        self.cache = sentiment_cache.SentimentCache(self.path, max_entries=3, version="test")
+
+    def tearDown(self):
+        self.cache.close()
+        os.remove(self.path)
+
+    def test_get_put(self):
+        self.assertEqual({}, self.cache.get_many(["good day"]))
+        self.cache.put_many({"good day": SCORES})
+        self.assertEqual({"good day": SCORES}, self.cache.get_many(["good day", "bad day"]))
+
+    def test_whitespace_normalized(self):
+        self.cache.put_many({"good  day ": SCORES})
+        self.assertEqual({"good day": SCORES}, self.cache.get_many(["good day"]))
+
+    def test_version(self):
+        self.cache.put_many({"good day": SCORES})
+        other = sentiment_cache.SentimentCache(self.path, version="other")
+        self.assertEqual({}, other.get_many(["good day"]))
+        other.close()
+
+    def test_eviction(self):
+        for i in range(5):
+            self.cache.put_many({"sentence %d" % i: SCORES})
+        self.assertEqual(3, len(self.cache))
+        self.assertEqual(["sentence 4"], list(self.cache.get_many(["sentence 0", "sentence 4"])))
+
+    def test_open_cache(self):
+        with sentiment_cache.open_cache(self.path) as cache:
+            self.assertEqual(0, len(cache))
+        with self.assertRaises(sqlite3.ProgrammingError):
+            len(cache)
+        with sentiment_cache.open_cache(None) as cache:
+            self.assertIsNone(cache)
+
+
+if __name__ == '__main__':
+    unittest.main()
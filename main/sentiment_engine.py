@@ -0,0 +1,253 @@
+"""
+sentiment_engine.py
+
+Batched, process-parallel sentiment scoring with NLTK/Vader.
+
+Comments are handed over in batches to a pool of worker processes. Each worker loads the VADER lexicon once, when
+it starts, and then splits (see sentence_splitter.py) and scores (see vader_batch.py) whole batches. Scores are
+returned as numpy arrays, in the same order as the input comments.
+
+If a sentiment_cache.SentimentCache is given, the sentences that are already in the cache are not scored again, and
+the new scores are added to it.
+
+add_sentiments() is the optional enrichment stage of extract.py: it stores the scores in the comment entries, and
+stored_scores() reads them back, so that the reports do not have to score anything.
+
+nltk is only imported (and the lexicon only loaded) once there is something to split or score, so reports that use
+stored scores never pay for it.
+"""
+
+from functools import partial
+from multiprocessing import Pool
+
+import metrics
+import sentence_splitter
+import vader_batch
+
+import numpy as np
+
+# number of comments (or sentences) handed to a worker at a time
+BATCH_SIZE = 1000
+SCORE_FIELDS = ("compound", "pos", "neg", "neu")
+
+# the batch scorer of this process, see init_worker()
+scorer = None
+
+
+class SentimentScores:
+    """
+    Scores of a list of comments. A comment's score is the average of the scores of its sentences.
+
+    Attributes:
+    - compound, pos, neg, neu: float arrays, one value per comment (nan for comments without any sentences)
+    - num_sentences: int array, number of sentences of each comment
+    - sentence_compound: float array, compound score of every sentence, with the sentences of comment i being
+      sentence_compound[sentence_offsets[i]:sentence_offsets[i + 1]]
+    - sentence_offsets: int array, of size number of comments + 1
+    """
+
+    def __init__(self, sentence_scores, num_sentences):
+        """
+        :param sentence_scores: float array of shape (number of sentences, 4), columns in SCORE_FIELDS order
+        :param num_sentences: int array, number of sentences of each comment
+        """
+        sentence_scores = np.asarray(sentence_scores, dtype=np.float64).reshape(-1, len(SCORE_FIELDS))
+        num_sentences = np.asarray(num_sentences, dtype=np.int64)
+        self.num_sentences = num_sentences
+        self.sentence_offsets = np.zeros(len(num_sentences) + 1, dtype=np.int64)
+        np.cumsum(num_sentences, out=self.sentence_offsets[1:])
+        self.sentence_compound = sentence_scores[:, 0]
+
+        comment_index = np.repeat(np.arange(len(num_sentences)), num_sentences)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            for i, field in enumerate(SCORE_FIELDS):
+                totals = np.bincount(comment_index, weights=sentence_scores[:, i], minlength=len(num_sentences))
+                setattr(self, field, totals / num_sentences)
+
+    def __len__(self):
+        return len(self.num_sentences)
+
+    def select(self, start, end):
+        """
+        :param start: int, index of the first comment
+        :param end: int, index after the last comment
+        :return: SentimentScores of the comments in [start, end)
+        """
+        selected = SentimentScores.__new__(SentimentScores)
+        selected.num_sentences = self.num_sentences[start:end]
+        selected.sentence_offsets = self.sentence_offsets[start:end + 1] - self.sentence_offsets[start]
+        selected.sentence_compound = self.sentence_compound[self.sentence_offsets[start]:self.sentence_offsets[end]]
+        for field in SCORE_FIELDS:
+            setattr(selected, field, getattr(self, field)[start:end])
+        return selected
+
+    def comment_scores(self, i):
+        """
+        :param i: int, index of a comment
+        :return: dictionary of {"compound": score, "pos": score, "neg": score, "neu": score}
+        """
+        return {field: float(getattr(self, field)[i]) for field in SCORE_FIELDS}
+
+
+###########
+# Workers #
+###########
+def init_worker():
+    """
+    Load the VADER lexicon, once per process.
+    """
+    global scorer
+    scorer = vader_batch.VaderBatchScorer()
+
+
+def split_batch(texts, splitter=sentence_splitter.PUNKT):
+    """
+    :param texts: list of strings
+    :param splitter: string, one of sentence_splitter.SPLITTERS
+    :return: list of lists of strings, the sentences of each text
+    """
+    return sentence_splitter.split_batch(texts, splitter)
+
+
+def score_batch(sentences):
+    """
+    :param sentences: list of strings
+    :return: list of tuples, the scores of each sentence in SCORE_FIELDS order
+    """
+    if scorer is None:
+        init_worker()
+    # the same scores as nltk's polarity_scores(), for the whole batch at once
+    return list(zip(*scorer.score(sentences)))
+
+
+def batches(items, batch_size):
+    """
+    :param items: list
+    :param batch_size: int
+    :return: list of lists, items split into consecutive batches of (at most) batch_size items
+    """
+    return [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+
+
+##########
+# Engine #
+##########
+@metrics.stage("sentiment")
+def score_comments(texts, split_sentences=True, jobs=1, cache=None, batch_size=BATCH_SIZE,
+                   splitter=sentence_splitter.PUNKT, known=None):
+    """
+    Score many comments.
+
+    :param texts: list of strings, the comment texts
+    :param split_sentences: bool, whether comments are split into sentences (scores are then averaged per comment)
+                            or scored as a whole
+    :param jobs: int, number of worker processes, 1 to score in this process
+    :param cache: sentiment_cache.SentimentCache, or None
+    :param batch_size: int, number of comments or sentences handed to a worker at a time
+    :param splitter: string, how comments are split into sentences, one of sentence_splitter.SPLITTERS
+    :param known: dictionary of {sentence: tuple of the SCORE_FIELDS scores}, sentences that were already scored
+                  (it gets the new scores added), or None
+    :return: SentimentScores
+    """
+    pool = Pool(jobs, initializer=init_worker) if jobs > 1 else None
+    try:
+        run = pool.imap if pool is not None else map
+
+        if split_sentences:
+            split = partial(split_batch, splitter=splitter)
+            comment_sentences = [sentences for batch in run(split, batches(texts, batch_size)) for sentences in batch]
+        else:
+            comment_sentences = [[text] for text in texts]
+        all_sentences = [sentence for sentences in comment_sentences for sentence in sentences]
+
+        # every distinct sentence is only scored once
+        if known is None:
+            known = {}
+        missing = [sentence for sentence in dict.fromkeys(all_sentences) if sentence not in known]
+        found = cache.get_many(missing) if cache is not None else {}
+        missing = [sentence for sentence in missing if sentence not in found]
+        missing_batches = batches(missing, batch_size)
+        computed = {}
+        for batch, batch_scores in zip(missing_batches, run(score_batch, missing_batches)):
+            computed.update(zip(batch, batch_scores))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    metrics.count("comments_scored", len(texts))
+    metrics.count("sentences_scored", len(computed))
+    metrics.count("sentences_cached", len(found))
+    if cache is not None and computed:
+        cache.put_many({sentence: dict(zip(SCORE_FIELDS, scores)) for (sentence, scores) in computed.items()})
+    for sentence, scores in found.items():
+        known[sentence] = tuple(scores[field] for field in SCORE_FIELDS)
+    known.update(computed)
+
+    sentence_scores = np.array([known[sentence] for sentence in all_sentences],
+                               dtype=np.float64).reshape(len(all_sentences), len(SCORE_FIELDS))
+    num_sentences = np.array([len(sentences) for sentences in comment_sentences], dtype=np.int64)
+    return SentimentScores(sentence_scores, num_sentences)
+
+
+##############
+# Enrichment #
+##############
+def add_sentiments(data_entries, jobs=1, cache=None):
+    """
+    Score every comment of the data entries, and store the scores in the comment entries:
+    {
+        "comment_text": comment_text,
+        "likes": likes,
+        "replies": replies,
+        "sentiment": {
+            "compound": score, "pos": score, "neg": score, "neu": score,
+            "sentences": [compound score of each sentence]
+        }
+    }
+    The compound/pos/neg/neu scores are those of the whole comment text (what analysis.py uses), and the sentence
+    scores are what sentiments.py averages.
+
+    :param data_entries: dictionary of data entries, updated in place
+    :param jobs: int, number of worker processes
+    :param cache: sentiment_cache.SentimentCache, or None
+    """
+    comments = [comment for entry in data_entries.values() for comment in entry["comments"]]
+    texts = [comment["comment_text"] for comment in comments]
+
+    # most comments are a single sentence, those are only scored once
+    known = {}
+    sentence_scores = score_comments(texts, split_sentences=True, jobs=jobs, cache=cache, known=known)
+    comment_scores = score_comments(texts, split_sentences=False, jobs=jobs, cache=cache, known=known)
+
+    offsets = sentence_scores.sentence_offsets.tolist()
+    sentence_compound = sentence_scores.sentence_compound.tolist()
+    for i, comment in enumerate(comments):
+        sentiment = comment_scores.comment_scores(i)
+        sentiment["sentences"] = sentence_compound[offsets[i]:offsets[i + 1]]
+        comment["sentiment"] = sentiment
+
+
+def stored_scores(comments, split_sentences=True):
+    """
+    Read back the scores stored by add_sentiments().
+
+    With split_sentences, the scores are averaged over the sentences of each comment, like score_comments() does.
+    Only compound scores are stored per sentence, so pos/neg/neu are nan in that case.
+
+    :param comments: list of comment entries
+    :param split_sentences: bool, same meaning as for score_comments()
+    :return: SentimentScores, or None if some of the comments do not have stored scores
+    """
+    if any("sentiment" not in comment for comment in comments):
+        return None
+    sentiments = [comment["sentiment"] for comment in comments]
+
+    if split_sentences:
+        num_sentences = [len(sentiment["sentences"]) for sentiment in sentiments]
+        sentence_scores = [(compound, np.nan, np.nan, np.nan)
+                           for sentiment in sentiments for compound in sentiment["sentences"]]
+    else:
+        num_sentences = [1] * len(sentiments)
+        sentence_scores = [tuple(sentiment[field] for field in SCORE_FIELDS) for sentiment in sentiments]
+    return SentimentScores(sentence_scores, num_sentences)
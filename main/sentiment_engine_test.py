@@ -0,0 +1,85 @@
+import math
+import os
+import tempfile
+import unittest
+import numpy as np
+import sentiment_cache
+import sentiment_engine
+
+
+class TestSentimentScores(unittest.TestCase):
+    def setUp(self):
+        # 3 comments, with 2, 0 and 1 sentences
+        sentence_scores = np.array([[0.5, 0.4, 0.0, 0.6],
+                                    [-0.1, 0.0, 0.2, 0.8],
+                                    [0.9, 1.0, 0.0, 0.0]])
+        self.scores = sentiment_engine.SentimentScores(sentence_scores, np.array([2, 0, 1]))
+
+    def test_averages(self):
+        self.assertAlmostEqual(0.2, self.scores.compound[0])
+        self.assertAlmostEqual(0.1, self.scores.neg[0])
+        self.assertTrue(math.isnan(self.scores.compound[1]))
+        self.assertEqual({"compound": 0.9, "pos": 1.0, "neg": 0.0, "neu": 0.0}, self.scores.comment_scores(2))
+
+    def test_select(self):
+        selected = self.scores.select(1, 3)
+        self.assertEqual(2, len(selected))
+        self.assertEqual([0, 1], list(selected.num_sentences))
+        self.assertEqual([0, 0, 1], list(selected.sentence_offsets))
+        self.assertEqual([0.9], list(selected.sentence_compound))
+
+
+class TestScoreComments(unittest.TestCase):
+    def test_scores_from_cache(self):
+        fd, path = tempfile.mkstemp(suffix=".sqlite")
+        os.close(fd)
+        cache = sentiment_cache.SentimentCache(path, version="test")
+        cache.put_many({"a": {"compound": 0.5, "pos": 0.5, "neg": 0.0, "neu": 0.5},
+                        "b": {"compound": -0.5, "pos": 0.0, "neg": 0.5, "neu": 0.5}})
+
+        scores = sentiment_engine.score_comments(["a", "b", "a"], split_sentences=False, cache=cache)
+        self.assertEqual([0.5, -0.5, 0.5], list(scores.compound))
+        self.assertEqual([1, 1, 1], list(scores.num_sentences))
+        cache.close()
+        os.remove(path)
+
+    def test_known_scores(self):
+        known = {"a": (0.25, 0.5, 0.0, 0.5)}
+        scores = sentiment_engine.score_comments(["a", "I love it"], split_sentences=False, known=known)
+        self.assertEqual(0.25, scores.compound[0])
+        self.assertIn("I love it", known)
+        self.assertEqual(known["I love it"][0], scores.compound[1])
+
+
+class TestAddSentiments(unittest.TestCase):
+    def test_add_sentiments(self):
+        data = {"v1": {"comments": [{"comment_text": "I love it. I hate it"}, {"comment_text": "I love it"}]}}
+        sentiment_engine.add_sentiments(data)
+        first, second = [comment["sentiment"] for comment in data["v1"]["comments"]]
+        self.assertEqual(2, len(first["sentences"]))
+        self.assertEqual(first["sentences"][0], second["compound"])
+        self.assertEqual([second["compound"]], second["sentences"])
+
+
+class TestStoredScores(unittest.TestCase):
+    COMMENTS = [
+        {"comment_text": "a. b", "sentiment": {"compound": 0.3, "pos": 0.4, "neg": 0.1, "neu": 0.5,
+                                               "sentences": [0.5, 0.1]}},
+        {"comment_text": "", "sentiment": {"compound": 0.0, "pos": 0.0, "neg": 0.0, "neu": 0.0, "sentences": []}}
+    ]
+
+    def test_sentences(self):
+        scores = sentiment_engine.stored_scores(self.COMMENTS)
+        self.assertEqual([2, 0], list(scores.num_sentences))
+        self.assertAlmostEqual(0.3, scores.compound[0])
+
+    def test_whole_comments(self):
+        scores = sentiment_engine.stored_scores(self.COMMENTS, split_sentences=False)
+        self.assertEqual({"compound": 0.3, "pos": 0.4, "neg": 0.1, "neu": 0.5}, scores.comment_scores(0))
+
+    def test_missing(self):
+        self.assertIsNone(sentiment_engine.stored_scores(self.COMMENTS + [{"comment_text": "c"}]))
+
+
+if __name__ == '__main__':
+    unittest.main()
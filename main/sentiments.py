@@ -24,19 +24,26 @@ Format of a data entry:
 """
 
 import argparse
-import json
 import os
+import data_store
+import metrics
+import render_cache
+import sentence_splitter
 import extract_helpers
+import sentiment_cache
+import sentiment_engine
+import term_matrix
+import token_counter
+import video_query
 import wordcloud_helper
-from nltk.sentiment.vader import SentimentIntensityAnalyzer
-from nltk import tokenize
+from collections import Counter
 
 DATA_DIR = "data"
 US_CATEGORIES = "US_category_id.json"
 GB_CATEGORIES = "GB_category_id.json"
 
 
-def extract_sentiments(comments):
+def extract_sentiments(comments, scores=None, cache=None):
     """
     Print sentiment data for this video's comments.
 
@@ -54,30 +61,25 @@ def extract_sentiments(comments):
         }
     ]
     :param comments: list of comment entries
+    :param scores: sentiment_engine.SentimentScores of these comments, computed here if not given
+    :param cache: sentiment_cache.SentimentCache, or None, used if the scores have to be computed
     :return: tuple of (sentiment score, positive comments, negative comments)
     """
     positive_comments = []
     negative_comments = []
     all_comment_scores = []
 
-    for comment in comments:
-        # use the nltk tokenizer to split the comment text into sentences
-        comment_text = comment["comment_text"]
-        sentences = tokenize.sent_tokenize(comment_text)
+    comment_texts = [comment["comment_text"] for comment in comments]
+    if scores is None:
+        # the comment texts are split into sentences, and the score of a comment is the average of its sentences
+        scores = sentiment_engine.score_comments(comment_texts, cache=cache)
 
-        # get compound scores (sentiments) for each sentence in this comment
-        sid = SentimentIntensityAnalyzer()
-        compound_scores = []
-        for sentence in sentences:
-            ss = sid.polarity_scores(sentence)
-            compound_score = ss["compound"]
-            compound_scores.append(compound_score)
-
-        if len(compound_scores) == 0:
+    for i, comment_text in enumerate(comment_texts):
+        if scores.num_sentences[i] == 0:
             # implies that there were no comments for this video, which is totally possible if comments disabled
             continue
 
-        avg_compound_score = sum(compound_scores) / len(compound_scores)
+        avg_compound_score = float(scores.compound[i])
         if avg_compound_score >= 0:
             positive_comments.append(comment_text)
         else:
@@ -89,7 +91,8 @@ def extract_sentiments(comments):
     return sentiment_score, positive_comments, negative_comments
 
 
-def sentiments_by_category_id(input_filename, output_dir, category_id):
+def sentiments_by_category_id(input_filename, output_dir, category_id, category_data, cache=None, jobs=1,
+                              render_jobs=None, wordcloud_cache=None, splitter=sentence_splitter.PUNKT, filters=None):
     """
     Get sentiments by category id.
     Read input from input_file.
@@ -97,60 +100,122 @@ def sentiments_by_category_id(input_filename, output_dir, category_id):
 
     For each video, find its sentiment score and print out its metadata (likes, dislikes, views, etc).
 
-    Generate wordclouds for both the positive comments and the negative comments of this
+    Generate wordclouds for both the positive comments and the negative comments of this category. The wordclouds
+    are not rendered here when render_jobs is given: they are added to it instead, to be rendered in one batch.
 
     :param input_filename: string, the name of the input data file
     :param output_dir: string, name of output directory
     :param category_id: string, category id.
+    :param category_data: dictionary of {category id: category name}
+    :param cache: sentiment_cache.SentimentCache, or None
+    :param jobs: int, number of processes used to compute sentiment scores and render the wordclouds
+    :param render_jobs: list of render jobs (see wordcloud_helper.generate_wordclouds_from_counts), or None
+    :param wordcloud_cache: render_cache.RenderCache, or None
+    :param splitter: string, how comments are split into sentences, one of sentence_splitter.SPLITTERS
+    :param filters: dictionary of video filters, see video_query.py, or None
     """
     print("Starting: Sentiments for category id (%s)" % category_id)
 
-    with open(input_filename, "r") as input_file:
-        all_data_entries = json.load(input_file)
-
-        # get all videos with specified category
-
-        relevant_data_entries = {k: v for (k, v) in all_data_entries.items() if v["category_id"] == category_id}
-
-        if len(relevant_data_entries) == 0:
-            print("There were no videos for this category, continuing")
-            return
-
-        # iterate over each video, perform sentiment analysis and print out data
-        positive_comments = []
-        negative_comments = []
-        for video_id in relevant_data_entries:
-            print("Processing video id: (%s)" % video_id)
-            entry = relevant_data_entries[video_id]
-            score, positive, negative = extract_sentiments(entry["comments"])
-            positive_comments.extend(positive)
-            negative_comments.extend(negative)
-
-            print("Video title: %s, Views: %s, Likes: %s, Dislikes: %s, Channel title: %s, "
-                  "Compound sentiment score: %0.4f" % (entry["title"],
-                  entry["views"], entry["likes"], entry["dislikes"], entry["channel_title"], score))
-            print("_" * 20)
-
-        # generate wordclouds
-        pos_name = category_id + "-" + category_data[category_id] + "-" + "positive"
-        wordcloud_helper.generate_wordcloud(" ".join(positive_comments), pos_name, output_dir)
+    # get all videos with specified category
+    video_ids = video_query.select_videos(input_filename, filters, category_id=category_id)
+    relevant_data_entries = data_store.load_video_entries(input_filename, video_ids)
 
-        neg_name = category_id + "-" + category_data[category_id] + "-" + "negative"
-        wordcloud_helper.generate_wordcloud(" ".join(negative_comments), neg_name, output_dir)
+    if len(relevant_data_entries) == 0:
+        print("There were no videos for this category, continuing")
+        return
 
+    # use the scores stored by extract.py --sentiment if there are any, otherwise score the comments of all of the
+    # videos at once
+    video_comments = [relevant_data_entries[video_id]["comments"] for video_id in relevant_data_entries]
+    all_comments = [comment for comments in video_comments for comment in comments]
+    all_scores = sentiment_engine.stored_scores(all_comments)
+    if all_scores is None:
+        all_scores = sentiment_engine.score_comments([comment["comment_text"] for comment in all_comments],
+                                                     jobs=jobs, cache=cache, splitter=splitter)
 
-if __name__ == "__main__":
-    # Command line parsing
+    # iterate over each video, perform sentiment analysis and print out data
+    positive_comments = []
+    negative_comments = []
+    start = 0
+    for video_id, comments in zip(relevant_data_entries, video_comments):
+        print("Processing video id: (%s)" % video_id)
+        entry = relevant_data_entries[video_id]
+        scores = all_scores.select(start, start + len(comments))
+        start += len(comments)
+        score, positive, negative = extract_sentiments(comments, scores)
+        positive_comments.extend(positive)
+        negative_comments.extend(negative)
+
+        print("Video title: %s, Views: %s, Likes: %s, Dislikes: %s, Channel title: %s, "
+              "Compound sentiment score: %0.4f" % (entry["title"],
+              entry["views"], entry["likes"], entry["dislikes"], entry["channel_title"], score))
+        print("_" * 20)
+
+    # generate wordclouds
+    matrix = term_matrix.load_matrix(input_filename)
+    if matrix is not None:
+        # the same split as extract_sentiments(), on the rows of the term matrix
+        labels = []
+        for i in range(len(all_comments)):
+            if all_scores.num_sentences[i] == 0:
+                labels.append(None)
+            else:
+                labels.append("positive" if all_scores.compound[i] >= 0 else "negative")
+        counts = matrix.group_counts(matrix.video_rows(list(relevant_data_entries)), labels)
+        pos_counts = counts.get("positive", Counter())
+        neg_counts = counts.get("negative", Counter())
+    else:
+        pos_counts = token_counter.count_tokens(positive_comments)
+        neg_counts = token_counter.count_tokens(negative_comments)
+    pos_name = category_id + "-" + category_data[category_id] + "-" + "positive"
+    neg_name = category_id + "-" + category_data[category_id] + "-" + "negative"
+
+    category_jobs = [(pos_counts, pos_name, output_dir), (neg_counts, neg_name, output_dir)]
+    if render_jobs is None:
+        wordcloud_helper.generate_wordclouds_from_counts(category_jobs, jobs, cache=wordcloud_cache)
+    else:
+        render_jobs.extend(category_jobs)
+
+
+def build_parser():
+    """
+    :return: argparse.ArgumentParser, for the command line flags of this script
+    """
     parser = argparse.ArgumentParser(description="Preprocess CSV files")
     parser.add_argument("-i", "--input", help="Specify the input file to use", required=True)
     parser.add_argument("-o", "--output", help="Specify the output directory to use", required=True)
     parser.add_argument("-s", "--set", help="Specify the data set to use", required=True, choices=set(("US", "GB")))
-    parser.add_argument("-c", "--cat", help="Category id to generate wordclouds for", required=True)
-    args = parser.parse_args()
+    parser.add_argument("-c", "--cat", help="Category ids to generate wordclouds for", required=True, nargs="+",
+                        action="extend")
+    parser.add_argument("--cache", help="SQLite file used to cache sentiment scores between runs", required=False)
+    parser.add_argument("-j", "--jobs", help="Number of processes used to compute sentiment scores and render the "
+                                             "wordclouds", type=int, default=1)
+    parser.add_argument("--splitter", help="How comments are split into sentences: with nltk's Punkt model, or with "
+                                           "simple rules (faster)", choices=sentence_splitter.SPLITTERS,
+                        default=sentence_splitter.PUNKT)
+    video_query.add_arguments(parser)
+    render_cache.add_arguments(parser)
+    metrics.add_arguments(parser)
+    return parser
+
+
+def main(args):
+    with metrics.run("sentiments", args.metrics, args.profile, vars(args)), \
+            sentiment_cache.open_cache(args.cache) as scores_cache:
+        # Preliminary parsing - get category id and names
+        category_filename = US_CATEGORIES if args.set == "US" else GB_CATEGORIES
+        with open(os.path.join(os.getcwd(), DATA_DIR, category_filename), "r") as category_file:
+            category_data = extract_helpers.extract_categories_data(category_file)
+
+        # the wordclouds of all of the categories are rendered at the end, in one batch
+        render_jobs = []
+        for category_id in dict.fromkeys(args.cat):
+            sentiments_by_category_id(args.input, args.output, category_id, category_data, scores_cache, args.jobs,
+                                      render_jobs, splitter=args.splitter,
+                                      filters=video_query.filters_from_arguments(args))
+        wordcloud_helper.generate_wordclouds_from_counts(render_jobs, args.jobs,
+                                                         cache=render_cache.from_arguments(args))
 
-    # Preliminary parsing - get category id and names
-    category_filename = US_CATEGORIES if args.set == "US" else GB_CATEGORIES
-    with open(os.path.join(os.getcwd(), DATA_DIR, category_filename), "r") as category_file:
-        category_data = extract_helpers.extract_categories_data(category_file)
 
-    sentiments_by_category_id(args.input, args.output, args.cat)
+if __name__ == "__main__":
+    main(build_parser().parse_args())
@@ -0,0 +1,276 @@
+"""
+service.py
+
+A long-running service that answers the requests of client.py, with everything kept warm.
+
+Every script is a fresh process otherwise: it imports nltk and wordcloud, loads the VADER lexicon and parses the
+preprocessed data before doing a few milliseconds of real work. The service imports all of the scripts once, and
+keeps the datasets (and their indexes) loaded, see data_store.keep_resident(). The heavy dependencies, which the
+scripts only import on first use, and the VADER lexicon are loaded up front (see warm_up), so that even the first
+request does not pay for them.
+
+A request runs one of the scripts with its usual command line flags, in the working directory of the client, and
+returns what the script printed. It is a POST of a json object to /run:
+{"command": "analysis", "argv": ["-i", "output/preprocUS.json", "-o", "output/analysisUS", "-c", "24"], "cwd": "..."}
+and the response is {"status": exit status, "stdout": string, "stderr": string}.
+
+Requests are handled one at a time: the scripts print to the (process wide) stdout, which is redirected for the
+duration of a request.
+
+A request can read and write any file the service can (through the flags of the scripts). So the service only listens
+on a loopback address, and at every start it writes a new random token to a token file that only the user can read
+(see client.py). A request is only run if it carries that token, is sent as application/json and is addressed to a
+loopback host: a web page cannot read the token, and cannot send such a request to a loopback port either (a
+cross-site request with another content type, or through a DNS name rebound to 127.0.0.1, is rejected).
+"""
+
+import argparse
+import contextlib
+import hmac
+import io
+import ipaddress
+import json
+import os
+import secrets
+import traceback
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import analysis
+import client
+import data_store
+import sentiment_engine
+import sentiments
+import video_list
+import video_trends
+import wordcloud_by_category
+import wordcloud_by_id
+import wordcloud_helper
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# the scripts that can be run by the service, each has a build_parser() and a main(args)
+COMMANDS = {
+    "analysis": analysis,
+    "sentiments": sentiments,
+    "video_list": video_list,
+    "video_trends": video_trends,
+    "wordcloud_by_category": wordcloud_by_category,
+    "wordcloud_by_id": wordcloud_by_id,
+}
+
+
+def run_command(command, argv, cwd):
+    """
+    Run one of the COMMANDS, as if it was run from the command line.
+
+    :param command: string, one of COMMANDS
+    :param argv: list of strings, command line flags
+    :param cwd: string, working directory to run the command in
+    :return: dictionary of {"status": int, "stdout": string, "stderr": string}
+    """
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+    status = 0
+    previous_cwd = os.getcwd()
+    try:
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            if command not in COMMANDS:
+                print("Unknown command (%s), use one of: %s" % (command, ", ".join(sorted(COMMANDS))),
+                      file=stderr)
+                status = 2
+            else:
+                try:
+                    os.chdir(cwd)
+                except OSError as e:
+                    print("Cannot run in %s: %s" % (cwd, e.strerror), file=stderr)
+                    status = 2
+                else:
+                    script = COMMANDS[command]
+                    parser = script.build_parser()
+                    parser.prog = command + ".py"
+                    try:
+                        script.main(parser.parse_args(argv))
+                    except SystemExit as e:
+                        # argparse errors and the exit() calls of the scripts
+                        if isinstance(e.code, int):
+                            status = e.code
+                        elif e.code is not None:
+                            print(e.code, file=stderr)
+                            status = 1
+                    except Exception:
+                        traceback.print_exc()
+                        status = 1
+    finally:
+        os.chdir(previous_cwd)
+    return {"status": status, "stdout": stdout.getvalue(), "stderr": stderr.getvalue()}
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        if not self.check_request(json_body=True):
+            return
+        if self.path != "/run":
+            self.send_error(404)
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            request = json.loads(self.rfile.read(length))
+            if not isinstance(request, dict):
+                raise ValueError("not an object")
+            command = request["command"]
+            argv = request.get("argv", [])
+            cwd = request.get("cwd", os.getcwd())
+            if not isinstance(command, str) or not isinstance(cwd, str) or not isinstance(argv, list) or \
+                    not all(isinstance(arg, str) for arg in argv):
+                raise ValueError("wrong types")
+        except (ValueError, KeyError):
+            self.send_error(400, "Expected a json object with a command, and argv (list of strings) and cwd (string)")
+            return
+        self.send_json(run_command(command, argv, cwd))
+
+    def do_GET(self):
+        if not self.check_request():
+            return
+        if self.path != "/status":
+            self.send_error(404)
+            return
+        datasets = sorted({path for (kind, path) in data_store.resident if kind == "data"})
+        self.send_json({"commands": sorted(COMMANDS), "datasets": datasets})
+
+    def check_request(self, json_body=False):
+        """
+        Reject the request (and send the error) unless it is addressed to a loopback host, carries the token of the
+        service, and (with json_body) has a json body.
+
+        :param json_body: bool, whether the body has to be application/json
+        :return: bool, whether the request can be handled
+        """
+        try:
+            check_loopback(host_name(self.headers.get("Host", "")))
+        except ValueError:
+            self.send_error(403, "The Host of the request is not a loopback address")
+            return False
+        if not hmac.compare_digest(self.headers.get(client.TOKEN_HEADER, ""), self.server.token):
+            self.send_error(403, "Missing or wrong %s" % client.TOKEN_HEADER)
+            return False
+        content_type = self.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        if json_body and content_type != "application/json":
+            self.send_error(415, "Expected a body of type application/json")
+            return False
+        return True
+
+    def send_json(self, response):
+        body = json.dumps(response).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # one line per request is enough
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+def warm_up():
+    """
+    Import the heavy dependencies and load the VADER lexicon (for the requests that score comments in the service
+    process, -j 1), the sentence tokenizer, and the wordcloud fonts and stopwords.
+    """
+    wordcloud_helper.init_renderer()
+    sentiment_engine.init_worker()
+    sentiment_engine.split_batch(["Warm up."])
+
+
+def check_loopback(host):
+    """
+    :param host: string, an address or host name
+    :return: the same string, if it is a loopback address (or localhost)
+    """
+    try:
+        loopback = host == "localhost" or ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        loopback = False
+    if not loopback:
+        raise ValueError("The service only listens on a loopback address (such as %s), not %s" % (DEFAULT_HOST, host))
+    return host
+
+
+def host_name(host_header):
+    """
+    :param host_header: string, the Host header of a request, e.g. "127.0.0.1:8765" or "[::1]:8765"
+    :return: string, the host name or address, without the port
+    """
+    if host_header.startswith("["):
+        return host_header[1:].partition("]")[0]
+    return host_header.partition(":")[0]
+
+
+def write_token(token_file):
+    """
+    Write a new random token to token_file, which only the user can read.
+
+    :param token_file: string, filename
+    :return: string, the token
+    """
+    token = secrets.token_hex(32)
+    # the file is created anew, so that it does not keep the permissions (or the owner) of an existing one
+    if os.path.lexists(token_file):
+        os.remove(token_file)
+    fd = os.open(token_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w") as f:
+        f.write(token)
+    return token
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, preload=(), quiet=False, token_file=client.DEFAULT_TOKEN_FILE):
+    """
+    Run the service until it is interrupted.
+
+    :param host: string, loopback address to listen on
+    :param port: int
+    :param preload: list of strings, datasets to load before serving the first request
+    :param quiet: bool, whether to skip the log line of every request
+    :param token_file: string, file the token of the requests is written to, see client.py
+    """
+    check_loopback(host)
+    warm_up()
+    data_store.keep_resident()
+    for path in preload:
+        data_store.load_data(path)
+        data_store.load_index(path)
+
+    server = HTTPServer((host, port), RequestHandler)
+    server.quiet = quiet
+    server.token = write_token(token_file)
+    print("Serving on http://%s:%d, the token is in %s" % (host, server.server_port, token_file))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.remove(token_file)
+
+
+if __name__ == "__main__":
+    # Command line parsing
+    parser = argparse.ArgumentParser(description="Serve the analysis scripts with the data kept loaded")
+    parser.add_argument("--host", help="Loopback address to listen on", default=DEFAULT_HOST)
+    parser.add_argument("-p", "--port", help="Port to listen on", type=int, default=DEFAULT_PORT)
+    parser.add_argument("-i", "--input", help="Preprocessed data to load up front, can be repeated", action="append",
+                        default=[])
+    parser.add_argument("-q", "--quiet", help="Do not log every request", action="store_true")
+    parser.add_argument("--token-file", help="File the token of the requests is written to, readable by the user "
+                                             "only (defaults to $%s, or %s, where client.py reads it)"
+                                             % (client.TOKEN_FILE_VARIABLE, client.DEFAULT_TOKEN_FILE),
+                        default=os.environ.get(client.TOKEN_FILE_VARIABLE, client.DEFAULT_TOKEN_FILE))
+    args = parser.parse_args()
+    try:
+        check_loopback(args.host)
+    except ValueError as e:
+        parser.error(str(e))
+
+    serve(args.host, args.port, args.input, args.quiet, args.token_file)
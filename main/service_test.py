@@ -0,0 +1,135 @@
+import contextlib
+import http.client
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import client
+import data_store
+import service
+import video_list
+from data_store_test import DATA
+from http.server import HTTPServer
+
+
+class TestService(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "data.json")
+        data_store.write_data(DATA, self.path)
+        data_store.keep_resident()
+
+    def tearDown(self):
+        data_store.resident = None
+        shutil.rmtree(self.dir)
+
+    def test_same_output_as_script(self):
+        expected = io.StringIO()
+        with contextlib.redirect_stdout(expected):
+            video_list.main(video_list.build_parser().parse_args(["-i", self.path]))
+        result = service.run_command("video_list", ["-i", "data.json"], self.dir)
+        self.assertEqual({"status": 0, "stdout": expected.getvalue(), "stderr": ""}, result)
+
+    def test_errors(self):
+        self.assertEqual(2, service.run_command("nope", [], self.dir)["status"])
+        result = service.run_command("video_list", [], self.dir)
+        self.assertEqual(2, result["status"])
+        self.assertIn("video_list.py: error", result["stderr"])
+        self.assertEqual(1, service.run_command("video_list", ["-i", "missing.json"], self.dir)["status"])
+        result = service.run_command("video_list", ["-i", "data.json"], os.path.join(self.dir, "missing"))
+        self.assertEqual(2, result["status"])
+        self.assertIn("Cannot run in", result["stderr"])
+
+    def start_server(self):
+        server = HTTPServer(("127.0.0.1", 0), service.RequestHandler)
+        server.quiet = True
+        server.token = service.write_token(os.path.join(self.dir, "token"))
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def post(self, server, body, headers=None):
+        if headers is None:
+            headers = {"Content-Type": "application/json", client.TOKEN_HEADER: server.token}
+        connection = http.client.HTTPConnection("127.0.0.1", server.server_port)
+        connection.request("POST", "/run", body, headers)
+        response = connection.getresponse()
+        result = (response.status, response.read())
+        connection.close()
+        return result
+
+    def test_bad_requests(self):
+        server = self.start_server()
+        for body in ("[1]", "\"video_list\"", "{}", "{\"command\": \"video_list\", \"argv\": \"-i\"}", "{"):
+            self.assertEqual(400, self.post(server, body)[0], body)
+        status, body = self.post(server, json.dumps({"command": "video_list", "argv": ["-i", "data.json"],
+                                                     "cwd": os.path.join(self.dir, "missing")}))
+        self.assertEqual(200, status)
+        self.assertEqual(2, json.loads(body)["status"])
+
+    def test_rejected_requests(self):
+        server = self.start_server()
+        body = json.dumps({"command": "video_list", "argv": ["-i", "data.json"], "cwd": self.dir})
+        token = server.token
+        for status, headers in ((403, {"Content-Type": "application/json"}),
+                                (403, {"Content-Type": "application/json", client.TOKEN_HEADER: "0" * len(token)}),
+                                (415, {"Content-Type": "text/plain", client.TOKEN_HEADER: token}),
+                                (403, {"Content-Type": "application/json", client.TOKEN_HEADER: token,
+                                       "Host": "evil.example", "Origin": "http://evil.example"})):
+            self.assertEqual(status, self.post(server, body, headers)[0], headers)
+
+        connection = http.client.HTTPConnection("127.0.0.1", server.server_port)
+        connection.request("GET", "/status")
+        self.assertEqual(403, connection.getresponse().status)
+        connection.close()
+
+        # a loopback Host, with or without a port, is accepted
+        headers = {"Content-Type": "application/json; charset=utf-8", client.TOKEN_HEADER: token,
+                   "Host": "localhost:%d" % server.server_port}
+        status, body = self.post(server, body, headers)
+        self.assertEqual(200, status)
+        self.assertEqual(0, json.loads(body)["status"])
+
+    def test_token_file(self):
+        token_file = os.path.join(self.dir, "token")
+        with open(token_file, "w") as f:
+            f.write("old")
+        os.chmod(token_file, 0o644)
+        token = service.write_token(token_file)
+        self.assertEqual(token, client.read_token(token_file))
+        self.assertEqual(0o600, os.stat(token_file).st_mode & 0o777)
+        self.assertNotEqual(token, service.write_token(token_file))
+
+    def test_host_name(self):
+        self.assertEqual("127.0.0.1", service.host_name("127.0.0.1:8765"))
+        self.assertEqual("::1", service.host_name("[::1]:8765"))
+        self.assertEqual("localhost", service.host_name("localhost"))
+        self.assertEqual("", service.host_name(""))
+
+    def test_loopback_only(self):
+        for host in ("127.0.0.1", "::1", "localhost"):
+            self.assertEqual(host, service.check_loopback(host))
+        for host in ("0.0.0.0", "192.168.1.10", "example.com"):
+            with self.assertRaises(ValueError):
+                service.check_loopback(host)
+
+    def test_resident_data(self):
+        first = data_store.load_data(self.path)
+        self.assertIs(first, data_store.load_data(self.path))
+        self.assertIs(first["v1"], data_store.load_video_entry(self.path, "v1"))
+        self.assertEqual(["v1"], list(data_store.load_category_entries(self.path, "1")))
+
+        # the dataset is loaded again once its file changes
+        data_store.write_data({"v2": DATA["v2"]}, self.path)
+        self.assertEqual(["v2"], list(data_store.load_data(self.path)))
+        self.assertIsNone(data_store.load_video_entry(self.path, "v1"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+"""
+startup_bench.py
+
+Startup time budget of the entry points.
+
+Each entry point is imported in a fresh interpreter, and the time taken by the import is recorded, along with the
+heavy dependencies (nltk, wordcloud and what it pulls in) that got imported. Those are only supposed to be imported
+on first use, so the benchmark fails (exit status 1) if any of them shows up, or if an import goes over its budget.
+
+Usage:
+python3 main/startup_bench.py
+python3 main/startup_bench.py -o output/startup.json --scale 2
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# import time budgets in seconds
+DEFAULT_BUDGET = 0.5
+BUDGETS = {
+    "analysis": DEFAULT_BUDGET,
+    "client": 0.2,
+    "extract": DEFAULT_BUDGET,
+    "sentiments": DEFAULT_BUDGET,
+    "service": DEFAULT_BUDGET,
+    "video_list": DEFAULT_BUDGET,
+    "video_trends": DEFAULT_BUDGET,
+    "wordcloud_by_category": DEFAULT_BUDGET,
+    "wordcloud_by_id": DEFAULT_BUDGET,
+}
+# modules that must not be imported at startup
+HEAVY_MODULES = ("nltk", "wordcloud", "matplotlib", "PIL")
+NUM_RUNS = 3
+
+# run in the child interpreter, prints the import time and the heavy modules that were imported
+MEASURE = """
+import sys, time
+start = time.perf_counter()
+import %s
+elapsed = time.perf_counter() - start
+print(elapsed)
+print(" ".join(name for name in %r if name in sys.modules))
+"""
+
+
+def measure(entry_point, num_runs=NUM_RUNS):
+    """
+    :param entry_point: string, module name of the entry point
+    :param num_runs: int, number of fresh interpreters to import it in
+    :return: tuple of (best import time in seconds, list of the heavy modules that were imported)
+    """
+    main_dir = os.path.dirname(os.path.abspath(__file__))
+    best = None
+    heavy = []
+    for i in range(num_runs):
+        output = subprocess.run([sys.executable, "-c", MEASURE % (entry_point, HEAVY_MODULES)], cwd=main_dir,
+                                check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout
+        lines = output.splitlines()
+        elapsed = float(lines[0])
+        best = elapsed if best is None else min(best, elapsed)
+        heavy = lines[1].split() if len(lines) > 1 else []
+    return best, heavy
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the startup time of the entry points")
+    parser.add_argument("-o", "--output", help="Write the results to this .json file", required=False)
+    parser.add_argument("--scale", help="Multiply the budgets, for slower machines", type=float, default=1.0)
+    args = parser.parse_args()
+
+    results = {}
+    failed = False
+    for entry_point in sorted(BUDGETS):
+        elapsed, heavy = measure(entry_point)
+        budget = BUDGETS[entry_point] * args.scale
+        ok = elapsed <= budget and not heavy
+        failed = failed or not ok
+        results[entry_point] = {"import_time": elapsed, "budget": budget, "heavy_modules": heavy}
+        print("%-22s %0.3fs (budget %0.3fs) %s%s" % (entry_point, elapsed, budget, "ok" if ok else "FAILED",
+                                                     " imports " + ", ".join(heavy) if heavy else ""))
+
+    if args.output is not None:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=2)
+    exit(1 if failed else 0)
@@ -0,0 +1,13 @@
+import unittest
+import startup_bench
+
+
+class TestStartup(unittest.TestCase):
+    def test_no_heavy_imports(self):
+        for entry_point in startup_bench.BUDGETS:
+            elapsed, heavy = startup_bench.measure(entry_point, num_runs=1)
+            self.assertEqual([], heavy, entry_point)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,323 @@
+"""
+term_matrix.py
+
+Comment x term matrix of the preprocessed data, so that the token counts of any group of comments (a category, a
+channel, a video, a date, the positive comments of a category, ...) are a sum of rows, instead of tokenizing the
+comment texts again.
+
+Every comment is tokenized once, the same way as token_counter.py does (stopwords are dropped, apostrophes at the
+edges of tokens are stripped), into a shared vocabulary. The counts are kept as a sparse matrix in CSR form, with one
+row per comment, in the order of the data entries:
+- indptr: int64 array, the terms of row i are at indptr[i]:indptr[i + 1] in indices and data
+- indices: int32 array, term ids (positions in the vocabulary), sorted within each row
+- data: int32 array, how many times the term shows up in the comment
+The rows of video i are video_comment_offsets[i]:video_comment_offsets[i + 1], like in a columnar store.
+
+The counts of a group of rows are summed with numpy: the non-zero entries of the rows are gathered, keyed by
+(group, term), and added up with np.unique and np.bincount, without any loop over the comments.
+
+The matrix is written next to the output of extract.py (extract.py --terms, or this script), as a .npz file. It
+records the signature of the data it was built from, and load_matrix() ignores it once the data has changed, so
+the scripts then fall back to tokenizing the comments.
+
+Usage:
+python3 main/term_matrix.py -i output/preprocUS.json
+"""
+
+import argparse
+import os
+import time
+from collections import Counter
+from itertools import chain, islice
+
+import numpy as np
+
+import data_store
+import metrics
+import token_counter
+import wordcloud_helper
+
+# the term matrix of a .json file is kept next to it, the term matrix of a columnar store is kept inside the directory
+TERMS_SUFFIX = ".terms.npz"
+COLUMNAR_TERMS = "terms.npz"
+# string fields of a video that the rows can be grouped by, besides "video_id"
+VIDEO_FIELDS = ("category_id", "channel_title", "date")
+
+
+class TermMatrix:
+    """
+    Token counts of every comment, see the module docstring.
+
+    Attributes:
+    - vocabulary: numpy array of strings, the terms
+    - indptr, indices, data: the CSR arrays
+    - video_ids: list of strings
+    - video_comment_offsets: int64 array, of size number of videos + 1
+    - one list of strings for each of the VIDEO_FIELDS, the value of each video
+    """
+
+    def __init__(self, vocabulary, indptr, indices, data, video_ids, video_comment_offsets, video_fields):
+        """
+        :param vocabulary: numpy array of strings
+        :param indptr: int64 array
+        :param indices: int32 array
+        :param data: int32 array
+        :param video_ids: list of strings
+        :param video_comment_offsets: int64 array
+        :param video_fields: dictionary of {field: list of strings}, for the VIDEO_FIELDS
+        """
+        self.vocabulary = vocabulary
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.video_ids = video_ids
+        self.video_comment_offsets = video_comment_offsets
+        for field in VIDEO_FIELDS:
+            setattr(self, field, video_fields[field])
+        self.video_index = {video_id: i for (i, video_id) in enumerate(video_ids)}
+
+    @property
+    def num_rows(self):
+        return len(self.indptr) - 1
+
+    def nbytes(self):
+        """
+        :return: int, size of the arrays in bytes
+        """
+        return self.vocabulary.nbytes + self.indptr.nbytes + self.indices.nbytes + self.data.nbytes
+
+    def video_rows(self, video_ids):
+        """
+        :param video_ids: list of strings, video ids that are in the matrix
+        :return: int64 array, the rows of the comments of these videos, in order
+        """
+        ranges = [np.arange(self.video_comment_offsets[i], self.video_comment_offsets[i + 1])
+                  for i in (self.video_index[video_id] for video_id in video_ids)]
+        return np.concatenate(ranges) if ranges else np.zeros(0, dtype=np.int64)
+
+    def rows_where(self, field, value):
+        """
+        :param field: string, "video_id" or one of VIDEO_FIELDS
+        :param value: string
+        :return: int64 array, the rows of the comments of the videos with that value
+        """
+        values = self.video_ids if field == "video_id" else getattr(self, field)
+        return self.video_rows([video_id for (video_id, v) in zip(self.video_ids, values) if v == value])
+
+    def term_counts(self, rows):
+        """
+        :param rows: int array, rows of the matrix
+        :return: Counter of {token: count}, the token counts of all of these comments together
+        """
+        return self.sum_rows(np.asarray(rows, dtype=np.int64), np.zeros(len(rows), dtype=np.int64), [None])[None]
+
+    def group_counts(self, rows, labels):
+        """
+        :param rows: int array, rows of the matrix
+        :param labels: list, the group of each row, None for a row that is left out
+        :return: dictionary of {label: Counter of {token: count}}, for every label that shows up
+        """
+        groups = list(dict.fromkeys(label for label in labels if label is not None))
+        group_index = {label: k for (k, label) in enumerate(groups)}
+        codes = np.fromiter((group_index.get(label, -1) for label in labels), dtype=np.int64, count=len(labels))
+        kept = codes >= 0
+        return self.sum_rows(np.asarray(rows, dtype=np.int64)[kept], codes[kept], groups)
+
+    def counts_of_videos(self, video_ids):
+        """
+        :param video_ids: list of strings, video ids that are in the matrix
+        :return: dictionary of {video_id: Counter of {token: count}}, the token counts of each video
+        """
+        video_ids = list(dict.fromkeys(video_ids))
+        offsets = self.video_comment_offsets
+        lengths = [offsets[self.video_index[video_id] + 1] - offsets[self.video_index[video_id]]
+                   for video_id in video_ids]
+        codes = np.repeat(np.arange(len(video_ids), dtype=np.int64), lengths)
+        return self.sum_rows(self.video_rows(video_ids), codes, video_ids)
+
+    def counts_by(self, field, video_ids=None):
+        """
+        :param field: string, "video_id" or one of VIDEO_FIELDS
+        :param video_ids: list of strings, only count the comments of these videos, or None for every video
+        :return: dictionary of {value: Counter of {token: count}}, for every value of the field
+        """
+        values = self.video_ids if field == "video_id" else getattr(self, field)
+        if video_ids is None:
+            rows = np.arange(self.num_rows, dtype=np.int64)
+            positions = range(len(self.video_ids))
+        else:
+            rows = self.video_rows(video_ids)
+            positions = [self.video_index[video_id] for video_id in video_ids]
+        groups = list(dict.fromkeys(values[i] for i in positions))
+        group_index = {value: k for (k, value) in enumerate(groups)}
+        video_codes = np.array([group_index[values[i]] for i in positions], dtype=np.int64)
+        lengths = np.diff(self.video_comment_offsets)[np.array(positions, dtype=np.int64)]
+        return self.sum_rows(rows, np.repeat(video_codes, lengths), groups)
+
+    def sum_rows(self, rows, codes, groups):
+        """
+        :param rows: int64 array, rows of the matrix
+        :param codes: int64 array, the group of each row, an index in groups
+        :param groups: list, the group labels
+        :return: dictionary of {label: Counter of {token: count}}
+        """
+        starts = self.indptr[rows]
+        lengths = self.indptr[rows + 1] - starts
+        # positions in indices / data of the non-zero entries of the rows
+        ends = np.cumsum(lengths)
+        positions = np.arange(ends[-1] if len(ends) else 0) + np.repeat(starts - (ends - lengths), lengths)
+
+        num_terms = max(len(self.vocabulary), 1)
+        keys = np.repeat(codes, lengths) * num_terms + self.indices[positions]
+        keys, inverse = np.unique(keys, return_inverse=True)
+        sums = np.bincount(inverse, weights=self.data[positions], minlength=len(keys)).astype(np.int64).tolist()
+        terms = self.vocabulary[keys % num_terms].tolist()
+        bounds = np.searchsorted(keys // num_terms, np.arange(len(groups) + 1)).tolist()
+        return {label: Counter(dict(zip(terms[bounds[k]:bounds[k + 1]], sums[bounds[k]:bounds[k + 1]])))
+                for (k, label) in enumerate(groups)}
+
+
+############
+# Building #
+############
+@metrics.stage("tokens")
+def build_matrix(data_entries, stopwords=None, batch_size=token_counter.BATCH_SIZE):
+    """
+    Tokenize every comment of the data entries.
+
+    :param data_entries: dictionary of data entries
+    :param stopwords: set of strings, defaults to wordcloud_helper.construct_stopwords()
+    :param batch_size: int, number of comments tokenized at once
+    :return: TermMatrix
+    """
+    if stopwords is None:
+        stopwords = wordcloud_helper.construct_stopwords()
+
+    video_ids = list(data_entries)
+    video_fields = {field: [] for field in VIDEO_FIELDS}
+    video_comment_offsets = np.zeros(len(video_ids) + 1, dtype=np.int64)
+    for i, video_id in enumerate(video_ids):
+        entry = data_entries[video_id]
+        for field in VIDEO_FIELDS:
+            video_fields[field].append(entry[field])
+        video_comment_offsets[i + 1] = video_comment_offsets[i] + len(entry["comments"])
+
+    vocabulary = {}
+    # {token from split_tokens(): term id, or -1 if it is not counted}
+    token_ids = {}
+    row_lengths = []
+    indices = []
+    data = []
+    texts = (comment["comment_text"] for video_id in video_ids for comment in data_entries[video_id]["comments"])
+    while True:
+        batch = list(islice(texts, batch_size))
+        if not batch:
+            break
+        rows = token_counter.split_token_rows(batch)
+        tokens = list(chain.from_iterable(rows))
+        for token in set(tokens).difference(token_ids):
+            term = token_counter.clean_token(token, stopwords)
+            token_ids[token] = -1 if term is None else vocabulary.setdefault(term, len(vocabulary))
+
+        ids = np.fromiter(map(token_ids.__getitem__, tokens), dtype=np.int64, count=len(tokens))
+        row_index = np.repeat(np.arange(len(rows), dtype=np.int64), [len(row) for row in rows])
+        kept = ids >= 0
+        # one entry per (row, term), sorted by row and then term
+        keys, counts = np.unique((row_index[kept] << 32) | ids[kept], return_counts=True)
+        indices.append((keys & 0xFFFFFFFF).astype(np.int32))
+        data.append(counts.astype(np.int32))
+        row_lengths.append(np.bincount(keys >> 32, minlength=len(rows)))
+
+    indptr = np.zeros(int(video_comment_offsets[-1]) + 1, dtype=np.int64)
+    if row_lengths:
+        np.cumsum(np.concatenate(row_lengths), out=indptr[1:])
+    return TermMatrix(np.array(list(vocabulary), dtype=str),
+                      indptr,
+                      np.concatenate(indices) if indices else np.zeros(0, dtype=np.int32),
+                      np.concatenate(data) if data else np.zeros(0, dtype=np.int32),
+                      video_ids, video_comment_offsets, video_fields)
+
+
+###########
+# Storage #
+###########
+def terms_path(path):
+    """
+    :param path: string, the .json file or columnar store directory
+    :return: string, filename of its term matrix
+    """
+    if os.path.isdir(path):
+        return os.path.join(path, COLUMNAR_TERMS)
+    return path + TERMS_SUFFIX
+
+
+def data_signature(path):
+    """
+    :param path: string, the .json file or columnar store directory
+    :return: int64 array, changes whenever the data is written (see data_store.file_signature)
+    """
+    return np.array(data_store.file_signature(path), dtype=np.int64).ravel()
+
+
+@metrics.stage("write")
+def write_matrix(matrix, path):
+    """
+    :param matrix: TermMatrix, built from the data at path
+    :param path: string, the .json file or columnar store directory
+    """
+    fields = {field: np.array(getattr(matrix, field), dtype=str) for field in VIDEO_FIELDS}
+    with open(terms_path(path), "wb") as terms_file:
+        np.savez(terms_file, signature=data_signature(path), vocabulary=matrix.vocabulary, indptr=matrix.indptr,
+                 indices=matrix.indices, data=matrix.data, video_ids=np.array(matrix.video_ids, dtype=str),
+                 video_comment_offsets=matrix.video_comment_offsets, **fields)
+
+
+@metrics.stage("load")
+def load_matrix(path):
+    """
+    :param path: string, the .json file or columnar store directory
+    :return: TermMatrix, or None if there is none, or if the data has changed since it was built
+    """
+    if data_store.resident is not None:
+        return data_store.load_resident("terms", path, read_matrix, [path, terms_path(path)])
+    return read_matrix(path)
+
+
+def read_matrix(path):
+    """
+    :param path: string, the .json file or columnar store directory
+    :return: TermMatrix, or None if there is none or it is out of date
+    """
+    try:
+        with np.load(terms_path(path)) as npz:
+            if not np.array_equal(npz["signature"], data_signature(path)):
+                return None
+            fields = {field: npz[field].tolist() for field in VIDEO_FIELDS}
+            return TermMatrix(npz["vocabulary"], npz["indptr"], npz["indices"], npz["data"], npz["video_ids"].tolist(),
+                              npz["video_comment_offsets"], fields)
+    except FileNotFoundError:
+        return None
+
+
+def build_parser():
+    """
+    :return: argparse.ArgumentParser, for the command line flags of this script
+    """
+    parser = argparse.ArgumentParser(description="Build the comment x term matrix of the preprocessed data")
+    parser.add_argument("-i", "--input", help="Specify the input file to use", required=True)
+    metrics.add_arguments(parser)
+    return parser
+
+
+def main(args):
+    with metrics.run("term_matrix", args.metrics, args.profile, vars(args)):
+        start = time.perf_counter()
+        matrix = build_matrix(data_store.load_data(args.input))
+        write_matrix(matrix, args.input)
+        print("Term matrix: %d comments, %d terms, %d non-zero counts, %0.1f MB, built in %0.2fs (%s)" % (
+            matrix.num_rows, len(matrix.vocabulary), len(matrix.data), matrix.nbytes() / 1e6,
+            time.perf_counter() - start, terms_path(args.input)))
+
+
+if __name__ == "__main__":
+    main(build_parser().parse_args())
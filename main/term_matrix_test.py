@@ -0,0 +1,126 @@
+import os
+import random
+import shutil
+import tempfile
+import time
+import unittest
+import data_store
+import term_matrix
+import token_counter
+
+
+def make_data(num_videos, seed=0):
+    """
+    :return: dictionary of data entries, with comments made of random words, numbers, stopwords and punctuation
+    """
+    rng = random.Random(seed)
+    words = ["video", "LOVE", "love!", "'quoted'", "don't", "it's", "the", "100", "'", "'''", "café", "Café", "song",
+             "x", "great...", "“nice”", "so", "wow’s", "a\x00b"]
+    data = {}
+    for i in range(num_videos):
+        comments = [{"comment_text": " ".join(rng.choice(words) for k in range(rng.randint(0, 8))), "likes": "0",
+                     "replies": "0"} for j in range(rng.randint(0, 6))]
+        data["v%d" % i] = {"title": "t%d" % i, "channel_title": "c%d" % (i % 4), "category_id": str(i % 3),
+                           "category_name": "n", "tags": "", "views": "1", "likes": "0", "dislikes": "0",
+                           "comment_total": str(len(comments)), "thumbnail_link": "", "date": "%02d.01" % (i % 5),
+                           "comments": comments}
+    return data
+
+
+def expected_counts(data, key):
+    """
+    :return: dictionary of {group: Counter}, the counts of token_counter.count_tokens for every group of videos
+    """
+    texts = {}
+    for video_id, entry in data.items():
+        texts.setdefault(key(video_id, entry), []).extend(comment["comment_text"] for comment in entry["comments"])
+    return {group: token_counter.count_tokens(group_texts) for (group, group_texts) in texts.items()}
+
+
+class TestTermMatrix(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.data = make_data(40)
+        cls.matrix = term_matrix.build_matrix(cls.data, batch_size=7)
+
+    def test_counts_by(self):
+        self.assertEqual(expected_counts(self.data, lambda video_id, entry: video_id),
+                         self.matrix.counts_by("video_id"))
+        for field in term_matrix.VIDEO_FIELDS:
+            self.assertEqual(expected_counts(self.data, lambda video_id, entry: entry[field]),
+                             self.matrix.counts_by(field))
+
+    def test_term_counts(self):
+        expected = token_counter.count_comment_tokens({k: v for (k, v) in self.data.items() if v["date"] == "01.01"})
+        self.assertEqual(expected, self.matrix.term_counts(self.matrix.rows_where("date", "01.01")))
+        self.assertEqual(token_counter.count_comment_tokens(self.data),
+                         self.matrix.term_counts(range(self.matrix.num_rows)))
+        self.assertEqual({}, self.matrix.term_counts([]))
+
+    def test_group_counts(self):
+        # every other comment of a few videos, split in two groups
+        video_ids = ["v3", "v1", "v8"]
+        comments = [comment["comment_text"] for video_id in video_ids for comment in self.data[video_id]["comments"]]
+        labels = [("even" if i % 4 == 0 else "odd") if i % 2 == 0 else None for i in range(len(comments))]
+        actual = self.matrix.group_counts(self.matrix.video_rows(video_ids), labels)
+        for group in ("even", "odd"):
+            expected = token_counter.count_tokens(c for (c, label) in zip(comments, labels) if label == group)
+            self.assertEqual(expected, actual[group])
+
+    def test_counts_of_videos(self):
+        expected = expected_counts(self.data, lambda video_id, entry: video_id)
+        self.assertEqual({video_id: expected[video_id] for video_id in ("v5", "v0")},
+                         self.matrix.counts_of_videos(["v5", "v0", "v5"]))
+
+    def test_empty(self):
+        matrix = term_matrix.build_matrix({})
+        self.assertEqual(0, matrix.num_rows)
+        self.assertEqual({}, matrix.counts_by("category_id"))
+
+
+class TestStorage(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_round_trip(self):
+        data = make_data(10)
+        for data_format, name in (("json", "data.json"), ("columnar", "store")):
+            path = os.path.join(self.dir, name)
+            data_store.write_data(data, path, data_format)
+            self.assertIsNone(term_matrix.load_matrix(path))
+
+            term_matrix.write_matrix(term_matrix.build_matrix(data_store.load_data(path)), path)
+            matrix = term_matrix.load_matrix(path)
+            self.assertEqual(list(data), matrix.video_ids)
+            self.assertEqual(expected_counts(data, lambda video_id, entry: entry["category_id"]),
+                             matrix.counts_by("category_id"))
+
+    def test_out_of_date(self):
+        path = os.path.join(self.dir, "data.json")
+        data_store.write_data(make_data(10), path)
+        term_matrix.write_matrix(term_matrix.build_matrix(make_data(10)), path)
+        self.assertIsNotNone(term_matrix.load_matrix(path))
+
+        time.sleep(0.01)
+        data_store.write_data(make_data(12), path)
+        self.assertIsNone(term_matrix.load_matrix(path))
+
+
+class TestSplitTokenRows(unittest.TestCase):
+    def test_same_as_split_tokens(self):
+        texts = ["Hello: world", "", "a\x00b c", "DON'T stop"]
+        self.assertEqual([token_counter.split_tokens(text) for text in texts], token_counter.split_token_rows(texts))
+        self.assertEqual([["hello", "world"], []], token_counter.split_token_rows(["Hello: world", "  "]))
+
+    def test_clean_token(self):
+        self.assertEqual("quoted", token_counter.clean_token("'quoted'", set()))
+        self.assertIsNone(token_counter.clean_token("'100'", set()))
+        self.assertIsNone(token_counter.clean_token("'", set()))
+        self.assertIsNone(token_counter.clean_token("'the'", {"the"}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,220 @@
+"""
+time_series.py
+
+Per-date statistics of the trending videos.
+
+A video shows up in the videos file once for every date it was trending, and extract_helpers.extract_video_data only
+keeps the last of those rows. The rows are also collected here (see TimeSeriesBuilder), into one int64 array per
+field, indexed by [video index, date index]. The full dataset is a few thousand videos by a few dozen dates, so the
+arrays take a few MB at most and are kept in memory. They are written next to the output of extract.py, as a .npz
+file.
+
+Dates are "DD.MM" strings, and are sorted chronologically.
+"""
+
+import os
+
+import numpy as np
+
+import metrics
+
+FIELDS = ("views", "likes", "dislikes", "comment_total")
+
+# the time series of a .json file is kept next to it, the time series of a columnar store is kept inside the directory
+TIME_SERIES_SUFFIX = ".timeseries.npz"
+COLUMNAR_TIME_SERIES = "timeseries.npz"
+
+
+def date_key(date):
+    """
+    :param date: string, "DD.MM"
+    :return: tuple, key to sort dates chronologically
+    """
+    day, month = date.split(".")
+    return int(month), int(day)
+
+
+class TimeSeriesBuilder:
+    """
+    Collects the rows of the videos file. If a video has more than one row for the same date, the last one is kept.
+    Rows with a malformed date are skipped.
+    """
+
+    def __init__(self):
+        self.rows = {}
+        self.category_ids = {}
+
+    def add(self, video_id, category_id, date, numbers):
+        """
+        :param video_id: string
+        :param category_id: string
+        :param date: string, "DD.MM"
+        :param numbers: tuple of ints, the values of the FIELDS
+        :return: bool, False if the row was skipped because of a malformed date
+        """
+        try:
+            date_key(date)
+        except ValueError:
+            return False
+        self.category_ids[video_id] = category_id
+        self.rows[(video_id, date)] = numbers
+        return True
+
+    def add_series(self, series):
+        """
+        Add all of the rows of an existing time series.
+
+        :param series: VideoTimeSeries
+        """
+        for (i, j) in zip(*np.nonzero(series.present)):
+            video_id = series.video_ids[i]
+            self.add(video_id, series.category_ids[i], series.dates[j],
+                     tuple(int(getattr(series, field)[i, j]) for field in FIELDS))
+
+    def build(self):
+        """
+        :return: VideoTimeSeries
+        """
+        video_ids = list(self.category_ids)
+        dates = sorted({date for (_, date) in self.rows}, key=date_key)
+        video_index = {video_id: i for (i, video_id) in enumerate(video_ids)}
+        date_index = {date: j for (j, date) in enumerate(dates)}
+
+        rows = np.array([video_index[video_id] for (video_id, _) in self.rows], dtype=np.int64)
+        columns = np.array([date_index[date] for (_, date) in self.rows], dtype=np.int64)
+        values = np.array(list(self.rows.values()), dtype=np.int64).reshape(len(self.rows), len(FIELDS))
+
+        arrays = {"present": np.zeros((len(video_ids), len(dates)), dtype=bool)}
+        arrays["present"][rows, columns] = True
+        for k, field in enumerate(FIELDS):
+            arrays[field] = np.zeros((len(video_ids), len(dates)), dtype=np.int64)
+            arrays[field][rows, columns] = values[:, k]
+        return VideoTimeSeries(video_ids, dates, [self.category_ids[video_id] for video_id in video_ids], arrays)
+
+
+class VideoTimeSeries:
+    """
+    Statistics of every video on every date.
+
+    Attributes:
+    - video_ids, dates, category_ids (the category of each video): lists of strings
+    - present: bool array of shape (number of videos, number of dates), whether the video was trending on that date
+    - one int64 array of the same shape for each of the FIELDS, 0 where the video was not trending
+    """
+
+    def __init__(self, video_ids, dates, category_ids, arrays):
+        """
+        :param video_ids: list of strings
+        :param dates: list of strings, sorted chronologically
+        :param category_ids: list of strings, the category of each video
+        :param arrays: dictionary of {"present" or field: array}
+        """
+        self.video_ids = video_ids
+        self.dates = dates
+        self.category_ids = category_ids
+        self.present = arrays["present"]
+        for field in FIELDS:
+            setattr(self, field, arrays[field])
+        self.video_index = {video_id: i for (i, video_id) in enumerate(video_ids)}
+        self.date_index = {date: j for (j, date) in enumerate(dates)}
+
+    def __len__(self):
+        return len(self.video_ids)
+
+    def nbytes(self):
+        """
+        :return: int, size of the arrays in bytes
+        """
+        return self.present.nbytes + sum(getattr(self, field).nbytes for field in FIELDS)
+
+    def series(self, video_id, field="views"):
+        """
+        :param video_id: string
+        :param field: string, one of FIELDS
+        :return: list of tuples, (date, value) for every date the video was trending on
+        """
+        i = self.video_index[video_id]
+        values = getattr(self, field)[i]
+        return [(self.dates[j], int(values[j])) for j in np.flatnonzero(self.present[i])]
+
+    def growth(self, field, start_date, end_date):
+        """
+        Growth of a field between two snapshots, for the videos that were trending on both dates.
+
+        :param field: string, one of FIELDS
+        :param start_date: string, "DD.MM"
+        :param end_date: string, "DD.MM"
+        :return: dictionary of {video_id: value on end_date - value on start_date}
+        """
+        for date in (start_date, end_date):
+            if date not in self.date_index:
+                raise ValueError("No snapshot on %s" % date)
+        start = self.date_index[start_date]
+        end = self.date_index[end_date]
+        values = getattr(self, field)
+        both = np.flatnonzero(self.present[:, start] & self.present[:, end])
+        differences = values[both, end] - values[both, start]
+        return {self.video_ids[i]: int(difference) for (i, difference) in zip(both, differences)}
+
+    def category_totals(self, field, video_ids=None):
+        """
+        Daily totals of a field, per category, over the videos trending on each date.
+
+        :param field: string, one of FIELDS
+        :param video_ids: iterable of strings, only count these videos (the ones without a time series are skipped),
+                          or None for every video
+        :return: dictionary of {category_id: int64 array of the total for each date}
+        """
+        if video_ids is None:
+            videos = np.arange(len(self.video_ids))
+        else:
+            videos = np.array([self.video_index[video_id] for video_id in video_ids if video_id in self.video_index],
+                              dtype=np.int64)
+        video_categories = [self.category_ids[i] for i in videos]
+        categories = list(dict.fromkeys(video_categories))
+        category_index = {category_id: k for (k, category_id) in enumerate(categories)}
+        rows = np.array([category_index[category_id] for category_id in video_categories], dtype=np.int64)
+
+        totals = np.zeros((len(categories), len(self.dates)), dtype=np.int64)
+        np.add.at(totals, rows, getattr(self, field)[videos])
+        return {category_id: totals[k] for (category_id, k) in category_index.items()}
+
+
+###########
+# Storage #
+###########
+def time_series_path(path):
+    """
+    :param path: string, the .json file or columnar store directory
+    :return: string, filename of its time series
+    """
+    if os.path.isdir(path):
+        return os.path.join(path, COLUMNAR_TIME_SERIES)
+    return path + TIME_SERIES_SUFFIX
+
+
+@metrics.stage("write")
+def write_time_series(series, path):
+    """
+    :param series: VideoTimeSeries
+    :param path: string, the .json file or columnar store directory
+    """
+    arrays = {field: getattr(series, field) for field in FIELDS}
+    with open(time_series_path(path), "wb") as series_file:
+        np.savez(series_file, video_ids=np.array(series.video_ids, dtype=str), dates=np.array(series.dates, dtype=str),
+                 category_ids=np.array(series.category_ids, dtype=str), present=series.present, **arrays)
+
+
+@metrics.stage("load")
+def load_time_series(path):
+    """
+    :param path: string, the .json file or columnar store directory
+    :return: VideoTimeSeries, or None if there is none
+    """
+    try:
+        with np.load(time_series_path(path)) as npz:
+            arrays = {name: npz[name] for name in ("present",) + FIELDS}
+            return VideoTimeSeries(npz["video_ids"].tolist(), npz["dates"].tolist(), npz["category_ids"].tolist(),
+                                   arrays)
+    except FileNotFoundError:
+        return None
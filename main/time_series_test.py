@@ -0,0 +1,72 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import extract_helpers
+import time_series
+
+VIDEOS = ('video_id,title,channel_title,category_id,tags,views,likes,dislikes,comment_total,thumbnail_link,date\n'
+          'v1,t1,c1,1,,10,1,0,2,l1,30.09\n'
+          'v2,t2,c2,2,,20,2,0,1,l2,30.09\n'
+          'v1,t1,c1,1,,15,3,0,4,l1,01.10\n'
+          'v3,t3,c3,1,,5,0,0,0,l3,01.10\n'
+          'v1,t1,c1,1,,40,5,1,6,l1,02.10\n'
+          'v2,t2,c2,2,,50,2,0,1,l2,02.10\n'
+          'v4,t4,c4,1,,1,0,0,0,l4,bad\n')
+
+
+class TestTimeSeries(unittest.TestCase):
+    def setUp(self):
+        builder = time_series.TimeSeriesBuilder()
+        self.videos_data = extract_helpers.extract_video_data(io.StringIO(VIDEOS, newline=""), time_series=builder)
+        self.series = builder.build()
+
+    def test_history_kept(self):
+        self.assertEqual(40, self.videos_data["v1"]["views"])
+        self.assertEqual(["30.09", "01.10", "02.10"], self.series.dates)
+        self.assertEqual(["v1", "v2", "v3"], self.series.video_ids)
+        self.assertEqual([("30.09", 10), ("01.10", 15), ("02.10", 40)], self.series.series("v1"))
+        self.assertEqual([("30.09", 2), ("01.10", 4), ("02.10", 6)], self.series.series("v1", "comment_total"))
+        self.assertEqual([("01.10", 5)], self.series.series("v3"))
+
+    def test_growth(self):
+        self.assertEqual({"v1": 30, "v2": 30}, self.series.growth("views", "30.09", "02.10"))
+        self.assertEqual({"v1": 25}, self.series.growth("views", "01.10", "02.10"))
+        for start, end in (("29.09", "02.10"), ("30.09", "2.10"), ("bad", "02.10")):
+            with self.assertRaises(ValueError):
+                self.series.growth("views", start, end)
+
+    def test_category_totals(self):
+        totals = self.series.category_totals("views")
+        self.assertEqual([10, 20, 40], totals["1"].tolist())
+        self.assertEqual([20, 0, 50], totals["2"].tolist())
+        # v4 has no time series
+        totals = self.series.category_totals("views", ["v3", "v1", "v4"])
+        self.assertEqual(["1"], list(totals))
+        self.assertEqual([10, 20, 40], totals["1"].tolist())
+        self.assertEqual({}, self.series.category_totals("views", []))
+
+    def test_storage(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "data.json")
+            self.assertIsNone(time_series.load_time_series(path))
+            time_series.write_time_series(self.series, path)
+            loaded = time_series.load_time_series(path)
+            self.assertEqual(self.series.video_ids, loaded.video_ids)
+            self.assertEqual(self.series.category_ids, loaded.category_ids)
+            self.assertEqual(self.series.series("v2", "likes"), loaded.series("v2", "likes"))
+
+            builder = time_series.TimeSeriesBuilder()
+            builder.add_series(loaded)
+            builder.add("v3", "1", "03.10", (9, 0, 0, 0))
+            extended = builder.build()
+            self.assertEqual(["30.09", "01.10", "02.10", "03.10"], extended.dates)
+            self.assertEqual([("01.10", 5), ("03.10", 9)], extended.series("v3"))
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,213 @@
+"""
+token_counter.py
+
+Tokenization and token counting shared by every script that builds a wordcloud.
+
+Tokens are normalized the same way everywhere:
+- case folding
+- punctuation is stripped, like extract_helpers.handle_punctuation does (the [.?!] runs are dropped as well, since
+  they are not words). Apostrophes inside a word are kept, so "don't" stays a single token.
+- stopwords (wordcloud_helper.construct_stopwords) and plain numbers are dropped
+
+Counting is done in batches of comments: a batch is joined into one string, case folded, punctuation is turned into
+spaces with str.translate and the result is split on whitespace. Stopwords are filtered out with filterfalse, and
+Counter.update does the counting. All of these loops run in C rather than in Python. Apostrophes at the edges of a
+token are only stripped once counting is done (see clean_counts), on the much smaller table of distinct tokens.
+
+With a capacity, the counts are approximate instead, in bounded memory: every batch is counted and cleaned, and then
+merged into a heavy_hitters.SpaceSaving summary of at most capacity tokens.
+"""
+
+import string
+from collections import Counter
+from itertools import filterfalse, islice
+
+import heavy_hitters
+import metrics
+import wordcloud_helper
+
+# every punctuation character becomes a space, except for apostrophes
+PUNCTUATION_TABLE = str.maketrans({c: " " for c in string.punctuation + "\u201c\u201d\u2026" if c != "'"})
+PUNCTUATION_TABLE[ord("\u2019")] = "'"
+# number of comments tokenized at once
+BATCH_SIZE = 5000
+
+
+def tokenize(text):
+    """
+    Split text into normalized tokens. Stopwords are not removed.
+
+    :param text: string
+    :return: list of strings
+    """
+    tokens = (token.strip("'") for token in split_tokens(text))
+    return [token for token in tokens if token]
+
+
+def split_tokens(text):
+    """
+    Case fold text, turn its punctuation into spaces and split it on whitespace.
+    Apostrophes are left alone.
+
+    :param text: string
+    :return: list of strings
+    """
+    return text.casefold().translate(PUNCTUATION_TABLE).split()
+
+
+def split_token_rows(texts):
+    """
+    split_tokens() of every text, done on all of the texts joined together like update_counts() does.
+
+    :param texts: list of strings
+    :return: list of lists of strings, the tokens of each text. Apostrophes are left alone.
+    """
+    rows = "\0".join(texts).casefold().translate(PUNCTUATION_TABLE).split("\0")
+    if len(rows) != len(texts):
+        # a text has a null character of its own
+        return [split_tokens(text) for text in texts]
+    return [row.split() for row in rows]
+
+
+def clean_token(token, stopwords):
+    """
+    What clean_counts() and the stopword filter of update_counts() turn a single token into.
+
+    :param token: string, a token from split_tokens()
+    :param stopwords: set of strings
+    :return: string, or None if the token is not counted
+    """
+    if token in stopwords:
+        return None
+    token = token.strip("'")
+    if not token or token.isdigit() or token in stopwords:
+        return None
+    return token
+
+
+def update_counts(counts, texts, stopwords=None, batch_size=BATCH_SIZE):
+    """
+    Count the tokens of texts, adding them to counts.
+    The table still has to go through clean_counts() once all of the texts are counted (but not a SpaceSaving
+    summary, each batch is cleaned before it is merged into it).
+
+    :param counts: Counter of {token: count}, or heavy_hitters.SpaceSaving, updated in place
+    :param texts: iterable of strings
+    :param stopwords: set of strings, defaults to wordcloud_helper.construct_stopwords()
+    :param batch_size: int, number of texts tokenized at once
+    """
+    if stopwords is None:
+        stopwords = wordcloud_helper.construct_stopwords()
+    texts = iter(texts)
+    while True:
+        batch = list(islice(texts, batch_size))
+        if not batch:
+            break
+        tokens = split_tokens("\n".join(batch))
+        if isinstance(counts, heavy_hitters.SpaceSaving):
+            counts.update(clean_counts(Counter(filterfalse(stopwords.__contains__, tokens)), stopwords))
+        else:
+            counts.update(filterfalse(stopwords.__contains__, tokens))
+
+
+def new_counts(capacity=None):
+    """
+    :param capacity: int, maximum number of tokens kept, or None for exact counts
+    :return: an empty Counter, or heavy_hitters.SpaceSaving summary if there is a capacity
+    """
+    return Counter() if capacity is None else heavy_hitters.SpaceSaving(capacity)
+
+
+def counts_to_render(counts, name):
+    """
+    Print how accurate approximate counts are, before their wordcloud is rendered.
+
+    :param counts: Counter or heavy_hitters.SpaceSaving
+    :param name: string, what was counted
+    :return: Counter of {token: count}
+    """
+    if not isinstance(counts, heavy_hitters.SpaceSaving):
+        return counts
+    print("%s, %s" % (name, counts.report(wordcloud_helper.MAX_WORDS)))
+    return counts.counts
+
+
+def finish_counts(counts, stopwords):
+    """
+    :param counts: Counter or heavy_hitters.SpaceSaving, filled by update_counts()
+    :param stopwords: set of strings
+    :return: the same counts, cleaned up (see clean_counts()) if they are exact
+    """
+    if isinstance(counts, heavy_hitters.SpaceSaving):
+        return counts
+    return clean_counts(counts, stopwords)
+
+
+def clean_counts(counts, stopwords):
+    """
+    Finish off a table of counts built by update_counts(): apostrophes at the edges of tokens are stripped (merging
+    the counts of tokens that become equal), and stopwords and plain numbers are removed.
+
+    :param counts: Counter of {token: count}, updated in place
+    :param stopwords: set of strings
+    :return: the same Counter
+    """
+    for token in [token for token in counts if token.isdigit() or token[0] == "'" or token[-1] == "'"]:
+        count = counts.pop(token)
+        token = token.strip("'")
+        if token and not token.isdigit() and token not in stopwords:
+            counts[token] += count
+    return counts
+
+
+@metrics.stage("tokens")
+def count_tokens(texts, stopwords=None, capacity=None):
+    """
+    Count the occurrences of every token in texts.
+
+    :param texts: iterable of strings
+    :param stopwords: set of strings, defaults to wordcloud_helper.construct_stopwords()
+    :param capacity: int, maximum number of tokens kept, or None for exact counts
+    :return: Counter of {token: count}, or heavy_hitters.SpaceSaving if there is a capacity
+    """
+    if stopwords is None:
+        stopwords = wordcloud_helper.construct_stopwords()
+    counts = new_counts(capacity)
+    update_counts(counts, texts, stopwords)
+    return finish_counts(counts, stopwords)
+
+
+@metrics.stage("tokens")
+def count_comment_tokens(data_entries, stopwords=None, capacity=None):
+    """
+    Count the occurrences of every token in the comments of all of the data entries.
+
+    :param data_entries: dictionary of data entries
+    :param stopwords: set of strings, defaults to wordcloud_helper.construct_stopwords()
+    :param capacity: int, maximum number of tokens kept, or None for exact counts
+    :return: Counter of {token: count}, or heavy_hitters.SpaceSaving if there is a capacity
+    """
+    return count_tokens((comment["comment_text"] for entry in data_entries.values() for comment in entry["comments"]),
+                        stopwords, capacity)
+
+
+@metrics.stage("tokens")
+def count_tokens_by_group(grouped_texts, stopwords=None, capacity=None):
+    """
+    Count tokens separately for each group, in a single pass.
+
+    :param grouped_texts: iterable of tuples, (group key, iterable of strings). A key may show up more than once.
+    :param stopwords: set of strings, defaults to wordcloud_helper.construct_stopwords()
+    :param capacity: int, maximum number of tokens kept for each group, or None for exact counts
+    :return: dictionary of {group key: Counter of {token: count}, or heavy_hitters.SpaceSaving if there is a capacity}
+    """
+    if stopwords is None:
+        stopwords = wordcloud_helper.construct_stopwords()
+    counts_by_group = {}
+    for key, texts in grouped_texts:
+        if key not in counts_by_group:
+            counts_by_group[key] = new_counts(capacity)
+        update_counts(counts_by_group[key], texts, stopwords)
+    for counts in counts_by_group.values():
+        finish_counts(counts, stopwords)
+    return counts_by_group
@@ -0,0 +1,88 @@
+"""
+token_counter_bench.py
+
+Micro-benchmark of token_counter against the Python-level counting loop the scripts used before.
+
+Usage:
+python3 main/token_counter_bench.py -i output/preprocUS.json
+"""
+
+import argparse
+import time
+import data_store
+import token_counter
+import wordcloud_helper
+
+
+def count_tokens_loop(texts):
+    """
+    The counting loop previously used by wordcloud_by_category.py and wordcloud_by_id.py.
+
+    :param texts: list of strings
+    :return: dictionary of {token: count}
+    """
+    counts = {}
+    for text in texts:
+        for word in text.split():
+            if word in counts:
+                counts[word] += 1
+            else:
+                counts[word] = 1
+    return counts
+
+
+def count_tokens_loop_normalized(texts, stopwords):
+    """
+    The same loop, with the normalization done by token_counter, for an apples to apples comparison.
+
+    :param texts: list of strings
+    :param stopwords: set of strings
+    :return: dictionary of {token: count}
+    """
+    counts = {}
+    for text in texts:
+        for word in token_counter.tokenize(text):
+            if word in stopwords or word.isdigit():
+                continue
+            if word in counts:
+                counts[word] += 1
+            else:
+                counts[word] = 1
+    return counts
+
+
+def time_call(function, *args):
+    """
+    :return: tuple of (best time in seconds out of 3 runs, result of the last run)
+    """
+    best = None
+    result = None
+    for i in range(3):
+        start = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark token counting")
+    parser.add_argument("-i", "--input", help="Specify the input file to use", required=True)
+    args = parser.parse_args()
+
+    data_entries = data_store.load_data(args.input)
+    texts = [comment["comment_text"] for entry in data_entries.values() for comment in entry["comments"]]
+    stopwords = wordcloud_helper.construct_stopwords()
+    print("Comments: %d" % len(texts))
+
+    loop_time, loop_counts = time_call(count_tokens_loop, texts)
+    print("python loop: %0.3fs, %d distinct tokens" % (loop_time, len(loop_counts)))
+
+    normalized_time, normalized_counts = time_call(count_tokens_loop_normalized, texts, stopwords)
+    print("python loop, normalized: %0.3fs, %d distinct tokens" % (normalized_time, len(normalized_counts)))
+
+    counter_time, counter_counts = time_call(token_counter.count_tokens, texts, stopwords)
+    print("token_counter: %0.3fs, %d distinct tokens" % (counter_time, len(counter_counts)))
+    print("speedup: %0.2fx over the python loop, %0.2fx over the normalized python loop" % (
+        loop_time / counter_time, normalized_time / counter_time))
+    assert normalized_counts == counter_counts
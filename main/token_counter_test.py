@@ -0,0 +1,45 @@
+import unittest
+import token_counter
+
+
+class TestTokenize(unittest.TestCase):
+    def test_case_and_punctuation(self):
+        s = "Hello: world, 'I am GOOD'!! don't"
+        expected = ["hello", "world", "i", "am", "good", "don't"]
+        actual = token_counter.tokenize(s)
+        self.assertEqual(expected, actual)
+
+
+class TestCountTokens(unittest.TestCase):
+    def test_count(self):
+        expected = {"hello": 2, "hey": 1, "apple": 2}
+        actual = token_counter.count_tokens(["Hello hey apple!", " apple, hello "], stopwords=set())
+        self.assertEqual(expected, actual)
+
+    def test_edge_apostrophes(self):
+        expected = {"quoted": 2, "don't": 1}
+        actual = token_counter.count_tokens(["'quoted' don't", "quoted"], stopwords=set())
+        self.assertEqual(expected, actual)
+
+    def test_stopwords_and_numbers(self):
+        expected = {"love": 2, "song": 1}
+        actual = token_counter.count_tokens(["I love the song", "LOVE it 100"])
+        self.assertEqual(expected, actual)
+
+    def test_batches(self):
+        texts = ["word%d common" % (i % 3) for i in range(10)]
+        expected = token_counter.count_tokens(texts, stopwords=set())
+        counts = token_counter.Counter()
+        token_counter.update_counts(counts, texts, stopwords=set(), batch_size=4)
+        self.assertEqual(expected, counts)
+        self.assertEqual(10, expected["common"])
+
+    def test_by_group(self):
+        grouped = [("a", ["x y"]), ("b", ["y"]), ("a", ["x"])]
+        expected = {"a": {"x": 2, "y": 1}, "b": {"y": 1}}
+        actual = token_counter.count_tokens_by_group(grouped, stopwords=set())
+        self.assertEqual(expected, actual)
+
+
+if __name__ == '__main__':
+    unittest.main()
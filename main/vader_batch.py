@@ -0,0 +1,360 @@
+"""
+vader_batch.py
+
+A batch scorer that gives the same scores as nltk's VADER (SentimentIntensityAnalyzer.polarity_scores), for many
+sentences at once.
+
+nltk scores one sentence at a time in pure Python, and most of the time goes into splitting the sentence into words:
+for every sentence, it builds a dictionary of every word of the sentence combined with every punctuation mark. Here:
+- a whitespace separated token always becomes the same word (the punctuation rule of nltk only depends on the token
+  itself), so tokens are looked up in a dictionary of {token: word id}, and each word is only analysed once: its
+  lexicon valence, whether it is a booster, a negation, all caps, ...
+- the words of all of the sentences of a batch are laid out in flat NumPy arrays, and the rules of VADER (caps
+  emphasis, boosters in the 3 preceding words, negations, "never so/this", "least", "but", punctuation emphasis)
+  are applied to all of them at once, with array operations.
+
+The rules are applied in the same order and with the same arithmetic as nltk, so the scores are the same (the
+differential test, vader_batch_test.py, checks them against nltk). This includes nltk's quirk of applying the rules at
+the first occurrence of a word in the sentence, for every occurrence of that word.
+
+Sentences with one of the rare multi word rules (idioms such as "the shit" or "kiss of death", and "kind of", "sort of",
+"just enough") are scored by nltk instead.
+"""
+
+import re
+import string
+
+import numpy as np
+
+# the punctuation removed by nltk around words, see word_of_token()
+PUNCTUATION = re.escape(string.punctuation)
+TOKEN_PARTS = re.compile("([%s]*)([^%s]*)([%s]*)" % (PUNCTUATION, PUNCTUATION, PUNCTUATION))
+NEVER_WORDS = ("so", "this")
+# weights of the boosters 1, 2 and 3 words before a word
+BOOSTER_DAMPING = (1.0, 0.95, 0.9)
+# the question marks and exclamation marks that add to the score of a sentence
+MAX_EXCLAMATION_MARKS = 4
+EXCLAMATION_WEIGHT = 0.292
+QUESTION_WEIGHT = 0.18
+MAX_QUESTION_AMPLIFIER = 0.96
+# alpha of VaderConstants.normalize()
+NORMALIZE_ALPHA = 15
+# the vocabulary is started over once it has this many words (a long running service sees many made up words)
+MAX_WORDS = 2000000
+
+
+class VaderBatchScorer:
+    """
+    Scores sentences like SentimentIntensityAnalyzer.polarity_scores(), see the module docstring.
+    The lexicon and the constants are taken from an nltk analyzer, so that the scores follow the installed nltk.
+    """
+
+    def __init__(self, analyzer=None):
+        """
+        :param analyzer: nltk.sentiment.vader.SentimentIntensityAnalyzer, created if not given (this loads the lexicon)
+        """
+        if analyzer is None:
+            from nltk.sentiment.vader import SentimentIntensityAnalyzer
+            analyzer = SentimentIntensityAnalyzer()
+        self.analyzer = analyzer
+        self.constants = analyzer.constants
+        self.punctuation_marks = set(self.constants.PUNC_LIST)
+        self.clear()
+
+        # the lowercase word pairs that start one of the rare rules, the sentences with one of these are left to nltk
+        rare = list(self.constants.SPECIAL_CASE_IDIOMS) + [b for b in self.constants.BOOSTER_DICT if " " in b]
+        rare.append("kind of")
+        self.rare_pairs = set()
+        for phrase in rare:
+            words = phrase.lower().split()
+            self.rare_pairs.update(zip(words, words[1:]))
+        # number of sentences scored by nltk, because of a rare rule
+        self.num_fallback = 0
+
+    def clear(self):
+        """
+        Start over with an empty vocabulary.
+        """
+        # {token: word id} and {word: word id}
+        self.token_ids = {}
+        self.word_ids = {}
+        # lowercase word, and whether it starts one of rare_pairs, of every word id
+        self.lower_words = []
+        self.rare_firsts = []
+        # features of every word id, see add_word()
+        self.features = {name: [] for name in ("valence", "in_lexicon", "booster", "is_booster", "upper", "negation",
+                                               "least", "at_or_very", "but", "never", "so_or_this")}
+        self.arrays = None
+        self.array_size = 0
+
+    ##############
+    # Vocabulary #
+    ##############
+    def word_of_token(self, token):
+        """
+        The word nltk (SentiText) makes of a whitespace separated token: a single punctuation mark (from PUNC_LIST),
+        either before or after a word without punctuation, is removed.
+
+        :param token: string, of at least 2 characters
+        :return: string
+        """
+        match = TOKEN_PARTS.fullmatch(token)
+        if match is None:
+            # punctuation within the word
+            return token
+        before, word, after = match.groups()
+        if len(word) > 1 and ((before in self.punctuation_marks and not after) or
+                              (after in self.punctuation_marks and not before)):
+            return word
+        return token
+
+    def token_id(self, token):
+        """
+        :param token: string, a whitespace separated token, of at least 2 characters
+        :return: int, the id of its word
+        """
+        word = self.word_of_token(token)
+        word_id = self.word_ids.get(word)
+        if word_id is None:
+            word_id = self.add_word(word)
+        self.token_ids[token] = word_id
+        return word_id
+
+    def add_word(self, word):
+        """
+        :param word: string
+        :return: int, the id of the new word
+        """
+        constants = self.constants
+        lower = word.lower()
+        self.lower_words.append(lower)
+        self.rare_firsts.append(any(lower == first for (first, second) in self.rare_pairs))
+        valence = self.analyzer.lexicon.get(lower)
+        features = self.features
+        features["valence"].append(valence if valence is not None else 0.0)
+        features["in_lexicon"].append(valence is not None)
+        features["booster"].append(constants.BOOSTER_DICT.get(lower, 0.0))
+        features["is_booster"].append(lower in constants.BOOSTER_DICT)
+        features["upper"].append(word.isupper())
+        features["negation"].append(constants.negated([word]))
+        features["least"].append(lower == "least")
+        features["at_or_very"].append(lower in ("at", "very"))
+        features["but"].append(lower == "but")
+        # _never_check() compares the words as they are
+        features["never"].append(word == "never")
+        features["so_or_this"].append(word in NEVER_WORDS)
+        self.word_ids[word] = len(self.word_ids)
+        return self.word_ids[word]
+
+    def feature_arrays(self):
+        """
+        :return: dictionary of {feature name: array indexed by word id}
+        """
+        if self.arrays is None or self.array_size < len(self.word_ids):
+            # only the words added since the last batch are converted
+            start = self.array_size
+            new = {name: np.array(values[start:], dtype=np.float64 if name in ("valence", "booster") else bool)
+                   for (name, values) in self.features.items()}
+            self.arrays = new if self.arrays is None else {name: np.concatenate((self.arrays[name], new[name]))
+                                                           for name in new}
+            self.array_size = len(self.word_ids)
+        return self.arrays
+
+    def is_rare(self, ids):
+        """
+        :param ids: list of ints, the word ids of a sentence
+        :return: bool, whether the sentence has one of the rare multi word rules
+        """
+        rare_firsts = self.rare_firsts
+        if not any(rare_firsts[word_id] for word_id in ids[:-1]):
+            return False
+        lower = [self.lower_words[word_id] for word_id in ids]
+        return any((first, second) in self.rare_pairs for (first, second) in zip(lower, lower[1:]))
+
+    ###########
+    # Scoring #
+    ###########
+    def polarity_scores(self, sentences):
+        """
+        :param sentences: list of strings
+        :return: list of dictionaries of {"neg": score, "neu": score, "pos": score, "compound": score}, the same as
+                 SentimentIntensityAnalyzer.polarity_scores() of each sentence
+        """
+        compound, pos, neg, neu = self.score(sentences)
+        return [{"neg": n, "neu": u, "pos": p, "compound": c} for (c, p, n, u) in zip(compound, pos, neg, neu)]
+
+    def score(self, sentences):
+        """
+        :param sentences: list of strings
+        :return: tuple of 4 lists of floats, (compound, pos, neg, neu) scores of every sentence
+        """
+        if not sentences:
+            return [], [], [], []
+        if len(self.word_ids) > MAX_WORDS:
+            self.clear()
+        token_ids = self.token_ids
+        ids = []
+        sentence_ends = []
+        amplifiers = []
+        fallback = {}
+        for i, sentence in enumerate(sentences):
+            # nltk leaves out the single characters
+            sentence_ids = [token_ids[token] if token in token_ids else self.token_id(token)
+                            for token in sentence.split() if len(token) > 1]
+            if self.is_rare(sentence_ids):
+                fallback[i] = self.analyzer.polarity_scores(sentence)
+            else:
+                ids.extend(sentence_ids)
+            sentence_ends.append(len(ids))
+            amplifiers.append(punctuation_amplifier(sentence))
+        self.num_fallback += len(fallback)
+
+        compound, pos, neg, neu = self.score_words(np.array(ids, dtype=np.int64),
+                                                   np.array(sentence_ends, dtype=np.int64),
+                                                   np.array(amplifiers, dtype=np.float64))
+
+        # rounded like nltk (python's round() is correctly rounded, unlike np.round())
+        compound = [round(score, 4) for score in compound.tolist()]
+        pos = [round(score, 3) for score in pos.tolist()]
+        neg = [round(score, 3) for score in neg.tolist()]
+        neu = [round(score, 3) for score in neu.tolist()]
+        for i, scores in fallback.items():
+            compound[i], pos[i], neg[i], neu[i] = scores["compound"], scores["pos"], scores["neg"], scores["neu"]
+        return compound, pos, neg, neu
+
+    def score_words(self, ids, sentence_ends, amplifiers):
+        """
+        Apply the rules of VADER to the words of many sentences.
+
+        :param ids: int array, the word ids of all of the sentences, one sentence after the other
+        :param sentence_ends: int array, index in ids after the last word of each sentence
+        :param amplifiers: float array, punctuation emphasis of each sentence
+        :return: tuple of 4 float arrays, (compound, pos, neg, neu) scores of every sentence, not rounded
+        """
+        features = self.feature_arrays()
+        constants = self.constants
+        num_sentences = len(sentence_ends)
+        sentence_starts = np.concatenate(([0], sentence_ends[:-1])).astype(np.int64)
+        lengths = sentence_ends - sentence_starts
+        sentence = np.repeat(np.arange(num_sentences), lengths)
+        position = np.arange(len(ids)) - sentence_starts[sentence]
+
+        # some but not all of the words of the sentence are in capitals
+        num_upper = np.bincount(sentence, weights=features["upper"][ids], minlength=num_sentences)
+        cap_differential = ((lengths - num_upper) > 0) & ((lengths - num_upper) < lengths)
+
+        # nltk scores every occurrence of a word at its first occurrence in the sentence
+        num_words = max(len(features["valence"]), 1)
+        _, first_index, inverse = np.unique(sentence * num_words + ids, return_index=True, return_inverse=True)
+        first = first_index[inverse.reshape(-1)]
+        word = ids[first]
+        at = position[first]
+        cap = cap_differential[sentence]
+
+        # the words of the lexicon (boosters score 0)
+        scored = features["in_lexicon"][word] & ~features["is_booster"][word]
+        valence = np.where(scored, features["valence"][word], 0.0)
+        emphasis = scored & features["upper"][word] & cap
+        valence = np.where(emphasis, np.where(valence > 0, valence + constants.C_INCR, valence - constants.C_INCR),
+                           valence)
+
+        def preceding(distance):
+            # ids of the words distance words before the first occurrence (anything where there is none)
+            return ids[np.where(at >= distance, first - distance, first)]
+
+        for start_i in range(3):
+            before = preceding(start_i + 1)
+            applies = scored & (at > start_i) & ~features["in_lexicon"][before]
+
+            # boosters, see VaderConstants.scalar_inc_dec()
+            scalar = features["booster"][before]
+            scalar = np.where(valence < 0, scalar * -1, scalar)
+            booster_emphasis = features["is_booster"][before] & features["upper"][before] & cap
+            scalar = np.where(booster_emphasis, np.where(valence > 0, scalar + constants.C_INCR,
+                                                         scalar - constants.C_INCR), scalar)
+            if start_i > 0:
+                scalar = np.where(scalar != 0, scalar * BOOSTER_DAMPING[start_i], scalar)
+            valence = np.where(applies, valence + scalar, valence)
+
+            # negations, see SentimentIntensityAnalyzer._never_check()
+            if start_i == 0:
+                never_boost = np.zeros(len(ids), dtype=bool)
+            elif start_i == 1:
+                never_boost = features["never"][preceding(2)] & features["so_or_this"][preceding(1)]
+            else:
+                never_boost = ((features["never"][preceding(3)] & features["so_or_this"][preceding(2)])
+                               | features["so_or_this"][preceding(1)])
+            negated = ~never_boost & features["negation"][before]
+            valence = np.where(applies & never_boost, valence * (1.5 if start_i == 1 else 1.25), valence)
+            valence = np.where(applies & negated, valence * constants.N_SCALAR, valence)
+
+        # "least", see SentimentIntensityAnalyzer._least_check()
+        before = preceding(1)
+        least = scored & (at > 0) & ~features["in_lexicon"][before] & features["least"][before]
+        least &= (at == 1) | ~features["at_or_very"][preceding(2)]
+        valence = np.where(least, valence * constants.N_SCALAR, valence)
+
+        # "but", see SentimentIntensityAnalyzer._but_check(): the first but of a sentence halves the words before it
+        # and increases the words after it
+        but_position = np.full(num_sentences, np.iinfo(np.int64).max)
+        buts = features["but"][ids]
+        np.minimum.at(but_position, sentence[buts], position[buts])
+        has_but = but_position[sentence] != np.iinfo(np.int64).max
+        valence = np.where(has_but & (position < but_position[sentence]), valence * 0.5, valence)
+        valence = np.where(has_but & (position > but_position[sentence]), valence * 1.5, valence)
+
+        return score_valence(valence, sentence, lengths, amplifiers)
+
+
+def punctuation_amplifier(sentence):
+    """
+    See SentimentIntensityAnalyzer._punctuation_emphasis().
+
+    :param sentence: string
+    :return: float
+    """
+    exclamation_marks = min(sentence.count("!"), MAX_EXCLAMATION_MARKS)
+    question_marks = sentence.count("?")
+    if question_marks <= 1:
+        question_amplifier = 0
+    elif question_marks <= 3:
+        question_amplifier = question_marks * QUESTION_WEIGHT
+    else:
+        question_amplifier = MAX_QUESTION_AMPLIFIER
+    return exclamation_marks * EXCLAMATION_WEIGHT + question_amplifier
+
+
+def score_valence(valence, sentence, lengths, amplifiers):
+    """
+    See SentimentIntensityAnalyzer.score_valence(). The sums are computed with bincount, which adds up the values in
+    order, like nltk does.
+
+    :param valence: float array, the valence of every word
+    :param sentence: int array, the sentence of every word
+    :param lengths: int array, number of words of every sentence
+    :param amplifiers: float array, punctuation emphasis of every sentence
+    :return: tuple of 4 float arrays, (compound, pos, neg, neu) scores of every sentence
+    """
+    num_sentences = len(lengths)
+    total = np.bincount(sentence, weights=valence, minlength=num_sentences)
+    total = np.where(total > 0, total + amplifiers, np.where(total < 0, total - amplifiers, total))
+    compound = total / np.sqrt(total * total + NORMALIZE_ALPHA)
+
+    positive = valence > 0
+    negative = valence < 0
+    pos_sum = np.bincount(sentence[positive], weights=valence[positive] + 1, minlength=num_sentences)
+    neg_sum = np.bincount(sentence[negative], weights=valence[negative] - 1, minlength=num_sentences)
+    neu_count = np.bincount(sentence[valence == 0], minlength=num_sentences).astype(np.float64)
+    more_positive = pos_sum > np.abs(neg_sum)
+    more_negative = pos_sum < np.abs(neg_sum)
+    pos_sum = np.where(more_positive, pos_sum + amplifiers, pos_sum)
+    neg_sum = np.where(more_negative, neg_sum - amplifiers, neg_sum)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        denominator = pos_sum + np.abs(neg_sum) + neu_count
+        pos = np.abs(pos_sum / denominator)
+        neg = np.abs(neg_sum / denominator)
+        neu = np.abs(neu_count / denominator)
+    empty = lengths == 0
+    return (np.where(empty, 0.0, compound), np.where(empty, 0.0, pos), np.where(empty, 0.0, neg),
+            np.where(empty, 0.0, neu))
@@ -0,0 +1,116 @@
+import ast
+import csv
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from nltk import tokenize
+from nltk.sentiment.vader import SentimentIntensityAnalyzer
+import generate_data
+import sentiment_engine
+import vader_batch
+
+# the scores are rounded like nltk's, so they are expected to be the same
+TOLERANCE = 1e-9
+
+
+def example_sentences():
+    """
+    :return: list of strings, the sentences of nltk_example.py (read from its source, running it prints them all)
+    """
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "nltk_example.py"), "r") as example_file:
+        module = ast.parse(example_file.read())
+    sentences = []
+    for node in module.body:
+        if isinstance(node, ast.Assign) and node.targets[0].id in ("sentences", "tricky_sentences"):
+            sentences.extend(ast.literal_eval(node.value))
+        elif isinstance(node, ast.Assign) and node.targets[0].id == "paragraph":
+            sentences.extend(tokenize.sent_tokenize(ast.literal_eval(node.value)))
+    return sentences
+
+
+def random_sentences(lexicon, constants, num_sentences, seed=0):
+    """
+    Sentences made of the words the rules look at, with capitals, punctuation and repeated words.
+
+    :return: list of strings
+    """
+    rng = random.Random(seed)
+    words = [list(lexicon), list(constants.BOOSTER_DICT), list(constants.NEGATE),
+             ["but", "BUT", "least", "at", "very", "never", "so", "this", "kind", "of", "the", "shit", "yeah", "right",
+              "video", "it", "a", "I", ":)", "<3", "#love"]]
+    punctuation = ["", "", ".", "!", "?", ",", "!!", "!!!", "?!?", "...", "'", "(", "#"]
+    sentences = []
+    for i in range(num_sentences):
+        sentence = []
+        for j in range(rng.randint(0, 10)):
+            word = rng.choice(rng.choice(words))
+            word = word.upper() if rng.random() < 0.15 else word
+            word = rng.choice(punctuation) + word if rng.random() < 0.1 else word
+            word = word + rng.choice(punctuation) if rng.random() < 0.2 else word
+            sentence.append(word)
+        if sentence and rng.random() < 0.3:
+            sentence.append(rng.choice(sentence))
+        sentences.append(" ".join(sentence))
+    return sentences
+
+
+class TestVaderBatchScorer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.analyzer = SentimentIntensityAnalyzer()
+
+    def assert_same_scores(self, sentences):
+        scorer = vader_batch.VaderBatchScorer(self.analyzer)
+        actual = scorer.polarity_scores(sentences)
+        for sentence, scores in zip(sentences, actual):
+            expected = self.analyzer.polarity_scores(sentence)
+            for field in expected:
+                self.assertAlmostEqual(expected[field], scores[field], delta=TOLERANCE, msg="%s of %r" % (field,
+                                                                                                        sentence))
+
+    def test_example_sentences(self):
+        self.assert_same_scores(example_sentences())
+
+    def test_generated_comments(self):
+        directory = tempfile.mkdtemp()
+        try:
+            comments_path = generate_data.generate(directory, "US", 5, 2000)[1]
+            with open(comments_path, "r", newline="") as comments_file:
+                comments = [row[1] for row in csv.reader(comments_file) if len(row) == 4][1:]
+        finally:
+            shutil.rmtree(directory)
+        sentences = [sentence for comment in comments for sentence in tokenize.sent_tokenize(comment)]
+        self.assert_same_scores(sentences + comments)
+
+    def test_random_sentences(self):
+        self.assert_same_scores(random_sentences(self.analyzer.lexicon, self.analyzer.constants, 3000))
+
+    def test_rare_rules(self):
+        sentences = ["VADER is the shit", "The book was kind of good.", "it has just enough spice", "the bomb"]
+        scorer = vader_batch.VaderBatchScorer(self.analyzer)
+        self.assertEqual([self.analyzer.polarity_scores(sentence) for sentence in sentences],
+                         scorer.polarity_scores(sentences))
+        self.assertEqual(4, scorer.num_fallback)
+
+    def test_words(self):
+        scorer = vader_batch.VaderBatchScorer(self.analyzer)
+        self.assertEqual("good", scorer.word_of_token("good!!"))
+        self.assertEqual("good", scorer.word_of_token("'good"))
+        self.assertEqual("(good", scorer.word_of_token("(good"))
+        self.assertEqual("'good'", scorer.word_of_token("'good'"))
+        self.assertEqual("isn't", scorer.word_of_token("isn't"))
+        self.assertEqual("a!", scorer.word_of_token("a!"))
+        # every spelling of a word has the same id
+        self.assertEqual(scorer.token_id("good!!"), scorer.token_id("good"))
+
+    def test_score_comments(self):
+        scores = sentiment_engine.score_comments(["The book was good. At least it isn't a horrible book."])
+        expected = [self.analyzer.polarity_scores("The book was good.")["compound"],
+                    self.analyzer.polarity_scores("At least it isn't a horrible book.")["compound"]]
+        self.assertEqual(expected, list(scores.sentence_compound))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,27 +2,37 @@
 video_list.py
 
 A script that prints out all video metadata.
+The videos can be filtered (see video_query.py); only the metadata kept in the index is read, not the comments.
 """
 import argparse
-import json
-from collections import OrderedDict
+import video_query
 
-if __name__ == "__main__":
-    # Command line parsing
+
+def build_parser():
+    """
+    :return: argparse.ArgumentParser, for the command line flags of this script
+    """
     parser = argparse.ArgumentParser(description="Preprocess CSV files")
     parser.add_argument("-i", "--input", help="Specify the input file to use", required=True)
-    args = parser.parse_args()
+    parser.add_argument("-c", "--cat", help="Only list the videos of this category id", required=False)
+    video_query.add_arguments(parser)
+    return parser
+
 
-    with open(args.input, "r") as data_file:
-        data_entries = json.load(data_file)
+def main(args):
+    video_index = video_query.load_video_index(args.input)
+    video_ids = video_index.select(category_id=args.cat, **video_query.filters_from_arguments(args))
+    entries = {video_id: video_index.entry(video_id) for video_id in video_ids}
 
-        # Below: sorting the dictionary of data entries by category id and views
-        ordered = sorted(data_entries.items(), key=lambda x: (int(x[1]["category_id"]), -int(x[1]["views"])))
-        ordered_entries = OrderedDict(ordered)
+    # Below: sorting the video entries by category id and views
+    ordered = sorted(entries.items(), key=lambda x: (int(x[1]["category_id"]), -x[1]["views"]))
 
-        for video_id in ordered_entries:
-            entry = data_entries[video_id]
-            print("%s %s +%s -%s (%s - %s) [%s - %s]" % (video_id, entry["views"], entry["likes"],
-                                                       entry["dislikes"], entry["category_id"],
-                                                       entry["category_name"], entry["title"],
-                                                       entry["channel_title"]))
+    for video_id, entry in ordered:
+        print("%s %s +%s -%s (%s - %s) [%s - %s]" % (video_id, entry["views"], entry["likes"],
+                                                   entry["dislikes"], entry["category_id"],
+                                                   entry["category_name"], entry["title"],
+                                                   entry["channel_title"]))
+
+
+if __name__ == "__main__":
+    main(build_parser().parse_args())
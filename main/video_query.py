@@ -0,0 +1,266 @@
+"""
+video_query.py
+
+Selection of videos from the preprocessed data, shared by every script: by video id, category, channel, date range,
+and ranges of views / likes / dislikes / comment counts.
+
+The query runs on a VideoIndex, which only holds the metadata of the videos (no comments). Its columns are stored
+in the index written next to the data by extract.py (see data_store.write_index), so a query does not parse the data
+at all; the scripts then only load the entries of the videos that were selected. With an older index, the columns
+are read from the data once.
+
+Secondary indexes are built when the VideoIndex is created:
+- a hash index (dictionary of {value: positions of the videos}) for the video id, category id and channel,
+- a sorted array, with the positions of the videos in that order, for every numeric field and for the date, so that
+  a range is two binary searches.
+select() asks every index how many videos its filter matches, starts from the smallest of these candidate sets, and
+checks the other filters on those candidates only. A selective filter therefore never scans the other videos.
+
+Dates are "DD.MM" strings (the last date a video was trending), compared chronologically like in time_series.py.
+"""
+
+import argparse
+
+import numpy as np
+
+import data_store
+import time_series
+
+STRING_FIELDS = data_store.TABLE_STRING_FIELDS
+# num_comments is the number of comments in the data, comment_total the comment count of the video on youtube
+NUMERIC_FIELDS = data_store.TABLE_NUMERIC_FIELDS
+# the columns with a hash index
+HASH_FIELDS = ("video_id", "category_id", "channel_title")
+
+
+def date_number(date):
+    """
+    :param date: string, "DD.MM"
+    :return: int, MMDD, or -1 for a malformed date
+    """
+    try:
+        month, day = time_series.date_key(date)
+    except ValueError:
+        return -1
+    return month * 100 + day
+
+
+class VideoIndex:
+    """
+    Metadata of every video, with secondary indexes, see the module docstring.
+
+    Attributes:
+    - video_ids: list of strings, in data order
+    - one list (STRING_FIELDS) or int64 array (NUMERIC_FIELDS) per field, the value of each video
+    """
+
+    def __init__(self, table):
+        """
+        :param table: dictionary, see data_store.video_table()
+        """
+        self.video_ids = table["video_ids"]
+        for field in STRING_FIELDS:
+            setattr(self, field, table[field])
+        for field in NUMERIC_FIELDS:
+            setattr(self, field, np.array(table[field], dtype=np.int64).reshape(-1))
+        self.dates = np.array([date_number(date) for date in self.date], dtype=np.int64).reshape(-1)
+
+        # {field: {value: int64 array of positions}}, and {field: int64 array, the code of the value of each video}
+        # with the value of code k being the k-th key of the hash
+        self.hashes = {}
+        self.codes = {}
+        for field in HASH_FIELDS:
+            positions = {}
+            for i, value in enumerate(self.video_ids if field == "video_id" else getattr(self, field)):
+                positions.setdefault(value, []).append(i)
+            self.hashes[field] = {value: np.array(p, dtype=np.int64) for (value, p) in positions.items()}
+            codes = np.zeros(len(self.video_ids), dtype=np.int64)
+            for code, p in enumerate(self.hashes[field].values()):
+                codes[p] = code
+            self.codes[field] = codes
+        self.code_of = {field: {value: code for (code, value) in enumerate(self.hashes[field])}
+                        for field in HASH_FIELDS}
+        # {field: (positions sorted by value, the values in that order)}
+        self.sorted = {}
+        for field in NUMERIC_FIELDS + ("date",):
+            values = self.dates if field == "date" else getattr(self, field)
+            order = np.argsort(values, kind="stable")
+            self.sorted[field] = (order, values[order])
+
+    def __len__(self):
+        return len(self.video_ids)
+
+    def __contains__(self, video_id):
+        return video_id in self.hashes["video_id"]
+
+    def entry(self, video_id):
+        """
+        :param video_id: string
+        :return: dictionary, the metadata of the video (a data entry without its comments)
+        """
+        i = int(self.hashes["video_id"][video_id][0])
+        entry = {field: getattr(self, field)[i] for field in STRING_FIELDS}
+        entry.update({field: int(getattr(self, field)[i]) for field in NUMERIC_FIELDS})
+        return entry
+
+    def plan(self, video_ids=None, category_id=None, channel_title=None, dates=None, ranges=None):
+        """
+        The filters of a query, see select() for the parameters. Finding the candidates of a filter only takes a hash
+        lookup or two binary searches, the candidates are a view of the index.
+
+        :return: list of tuples of (field, int64 array of the positions of the videos that match the filter, function
+                 of an int64 array of positions that returns a bool array, whether each of them matches), the
+                 filter with the fewest candidates first
+        """
+        filters = []
+        if video_ids is not None:
+            hits = [video_id for video_id in video_ids if video_id in self.hashes["video_id"]]
+            positions = [self.hashes["video_id"][video_id] for video_id in hits]
+            filters.append(("video_id", np.unique(np.concatenate(positions)) if hits else np.zeros(0, dtype=np.int64),
+                            self.hash_check("video_id", [self.code_of["video_id"][video_id] for video_id in hits])))
+        for field, value in (("category_id", category_id), ("channel_title", channel_title)):
+            if value is not None:
+                code = self.code_of[field].get(value)
+                filters.append((field, self.hashes[field].get(value, np.zeros(0, dtype=np.int64)),
+                                self.hash_check(field, [] if code is None else [code])))
+        if dates is not None:
+            # malformed dates (-1) are never in a range
+            low = 0 if dates[0] is None else date_number(dates[0])
+            high = None if dates[1] is None else date_number(dates[1])
+            filters.append(("date", self.range_positions("date", low, high), self.range_check(self.dates, low, high)))
+        for field, (low, high) in (ranges or {}).items():
+            filters.append((field, self.range_positions(field, low, high),
+                            self.range_check(getattr(self, field), low, high)))
+        return sorted(filters, key=lambda f: len(f[1]))
+
+    def range_positions(self, field, low, high):
+        """
+        :param field: string, "date" or one of NUMERIC_FIELDS
+        :param low: int, smallest value (included), or None
+        :param high: int, largest value (included), or None
+        :return: int64 array, the positions of the videos with a value in the range
+        """
+        order, values = self.sorted[field]
+        start = 0 if low is None else np.searchsorted(values, low, side="left")
+        end = len(values) if high is None else np.searchsorted(values, high, side="right")
+        return order[start:end]
+
+    def hash_check(self, field, codes):
+        """
+        :return: function of an int64 array of positions, whether the value of field of each video is one of codes
+        """
+        codes = np.array(codes, dtype=np.int64)
+        return lambda positions: np.isin(self.codes[field][positions], codes)
+
+    @staticmethod
+    def range_check(values, low, high):
+        """
+        :return: function of an int64 array of positions, whether the value of each video is in [low, high]
+        """
+        def check(positions):
+            selected = values[positions]
+            matches = np.ones(len(positions), dtype=bool)
+            if low is not None:
+                matches &= selected >= low
+            if high is not None:
+                matches &= selected <= high
+            return matches
+        return check
+
+    def select(self, video_ids=None, category_id=None, channel_title=None, dates=None, ranges=None):
+        """
+        Select the videos that match every filter that is given.
+
+        :param video_ids: list of strings, or None
+        :param category_id: string, or None
+        :param channel_title: string, or None
+        :param dates: tuple of (first date, last date), "DD.MM" strings or None for an open end, or None
+        :param ranges: dictionary of {field: (smallest value, largest value)}, for NUMERIC_FIELDS, None for an open
+                       end, or None
+        :return: list of strings, the video ids, in data order
+        """
+        filters = self.plan(video_ids, category_id, channel_title, dates, ranges)
+        if not filters:
+            return list(self.video_ids)
+
+        # the other filters are only checked on the candidates of the most selective one
+        positions = np.sort(filters[0][1])
+        for field, candidates, check in filters[1:]:
+            positions = positions[check(positions)]
+        return [self.video_ids[i] for i in positions.tolist()]
+
+
+def load_video_index(path):
+    """
+    :param path: string, the .json file or columnar store directory
+    :return: VideoIndex of the data at path
+    """
+    index = data_store.load_index(path)
+    if index is not None and "table" in index:
+        return VideoIndex(index["table"])
+    # an index written before the table was added to it, or no index at all
+    return VideoIndex(data_store.video_table(data_store.load_data(path)))
+
+
+def select_videos(path, filters=None, **more_filters):
+    """
+    :param path: string, the .json file or columnar store directory
+    :param filters: dictionary of filters (see VideoIndex.select()), from filters_from_arguments(), or None
+    :param more_filters: more filters, see VideoIndex.select()
+    :return: list of strings, the ids of the videos that match all of the filters, in data order
+    """
+    return load_video_index(path).select(**dict(filters or {}, **more_filters))
+
+
+def parse_date(text):
+    """
+    :param text: string, "DD.MM"
+    :return: the same string
+    """
+    if date_number(text) < 0:
+        raise argparse.ArgumentTypeError("expected a DD.MM date: %s" % text)
+    return text
+
+
+def parse_range(text):
+    """
+    :param text: string, "FIELD:MIN:MAX", MIN or MAX can be left empty
+    :return: tuple of (field, (smallest value, largest value))
+    """
+    parts = text.split(":")
+    if len(parts) != 3 or parts[0] not in NUMERIC_FIELDS:
+        raise argparse.ArgumentTypeError("expected FIELD:MIN:MAX with FIELD one of %s" % ", ".join(NUMERIC_FIELDS))
+    try:
+        low, high = [int(part) if part else None for part in parts[1:]]
+    except ValueError:
+        raise argparse.ArgumentTypeError("MIN and MAX must be integers: %s" % text)
+    return parts[0], (low, high)
+
+
+def add_arguments(parser):
+    """
+    Add the flags that filter the videos to a script's argparse parser.
+
+    :param parser: argparse.ArgumentParser
+    """
+    parser.add_argument("--channel", help="Only use the videos of this channel", required=False)
+    parser.add_argument("--from", dest="date_from", help="Only use the videos last trending on or after this date "
+                                                         "(DD.MM)", type=parse_date, required=False)
+    parser.add_argument("--to", dest="date_to", help="Only use the videos last trending on or before this date "
+                                                     "(DD.MM)", type=parse_date, required=False)
+    parser.add_argument("--range", dest="ranges", help="Only use the videos with a value in this range (both ends "
+                        "included, either can be left empty), FIELD is one of %s. Can be given several times"
+                        % ", ".join(NUMERIC_FIELDS), metavar="FIELD:MIN:MAX", type=parse_range, action="append")
+
+
+def filters_from_arguments(args):
+    """
+    :param args: parsed command line arguments, with the flags of add_arguments()
+    :return: dictionary of filters for VideoIndex.select()
+    """
+    filters = {"channel_title": args.channel}
+    if args.date_from is not None or args.date_to is not None:
+        filters["dates"] = (args.date_from, args.date_to)
+    if args.ranges:
+        filters["ranges"] = dict(args.ranges)
+    return filters
@@ -0,0 +1,157 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import unittest
+import data_store
+import video_query
+
+
+def make_data(num_videos, seed=0):
+    """
+    :return: dictionary of data entries, with random metadata (and a few malformed dates) and no comment text
+    """
+    rng = random.Random(seed)
+    data = {}
+    for i in range(num_videos):
+        date = rng.choice(["%02d.%02d" % (rng.randint(1, 28), rng.randint(1, 12)), "", "31.2x"])
+        data["v%d" % i] = {"title": "t%d" % i, "channel_title": "c%d" % rng.randint(0, 5),
+                           "category_id": str(rng.choice([1, 10, 24])), "category_name": "n", "tags": "",
+                           "views": str(rng.randint(0, 1000)), "likes": str(rng.randint(0, 50)),
+                           "dislikes": str(rng.randint(0, 10)), "comment_total": str(rng.randint(0, 5)),
+                           "thumbnail_link": "", "date": date,
+                           "comments": [{"comment_text": "", "likes": "0", "replies": "0"}] * rng.randint(0, 3)}
+    return data
+
+
+def brute_force(data, video_ids=None, category_id=None, channel_title=None, dates=None, ranges=None):
+    """
+    :return: list of strings, the ids of the videos that match every filter, checked one video at a time
+    """
+    def matches(video_id, entry):
+        if video_ids is not None and video_id not in video_ids:
+            return False
+        if category_id is not None and entry["category_id"] != category_id:
+            return False
+        if channel_title is not None and entry["channel_title"] != channel_title:
+            return False
+        if dates is not None:
+            date = video_query.date_number(entry["date"])
+            if date < 0:
+                return False
+            if dates[0] is not None and date < video_query.date_number(dates[0]):
+                return False
+            if dates[1] is not None and date > video_query.date_number(dates[1]):
+                return False
+        for field, (low, high) in (ranges or {}).items():
+            value = len(entry["comments"]) if field == "num_comments" else int(entry[field])
+            if (low is not None and value < low) or (high is not None and value > high):
+                return False
+        return True
+    return [video_id for (video_id, entry) in data.items() if matches(video_id, entry)]
+
+
+class TestVideoIndex(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.data = make_data(300)
+        cls.index = video_query.VideoIndex(data_store.video_table(cls.data))
+
+    def test_random_queries(self):
+        rng = random.Random(1)
+        for k in range(200):
+            filters = {}
+            if rng.random() < 0.2:
+                filters["video_ids"] = ["v%d" % rng.randint(0, 320) for j in range(rng.randint(0, 20))]
+            if rng.random() < 0.4:
+                filters["category_id"] = rng.choice(["1", "10", "24", "99"])
+            if rng.random() < 0.4:
+                filters["channel_title"] = rng.choice(["c0", "c3", "c9"])
+            if rng.random() < 0.3:
+                filters["dates"] = (rng.choice([None, "01.03", "15.06"]), rng.choice([None, "30.06", "31.12"]))
+            if rng.random() < 0.5:
+                field = rng.choice(video_query.NUMERIC_FIELDS)
+                low = rng.choice([None, rng.randint(0, 500)])
+                filters["ranges"] = {field: (low, rng.choice([None, rng.randint(0, 1000)]))}
+            self.assertEqual(brute_force(self.data, **filters), self.index.select(**filters), filters)
+
+    def test_no_filter(self):
+        self.assertEqual(list(self.data), self.index.select())
+
+    def test_plan_order(self):
+        plan = self.index.plan(category_id="10", ranges={"views": (990, None)}, video_ids=["v1", "v2"])
+        self.assertEqual(["video_id", "views", "category_id"], [field for (field, candidates, check) in plan])
+        self.assertEqual(sorted(len(candidates) for (field, candidates, check) in plan),
+                         [len(candidates) for (field, candidates, check) in plan])
+
+    def test_entry(self):
+        entry = self.index.entry("v7")
+        self.assertEqual(self.data["v7"]["title"], entry["title"])
+        self.assertEqual(int(self.data["v7"]["views"]), entry["views"])
+        self.assertEqual(len(self.data["v7"]["comments"]), entry["num_comments"])
+        self.assertIn("v7", self.index)
+        self.assertNotIn("v300", self.index)
+
+    def test_date_number(self):
+        self.assertEqual(913, video_query.date_number("13.09"))
+        self.assertEqual(-1, video_query.date_number(""))
+        self.assertEqual(-1, video_query.date_number("31.2x"))
+
+
+class TestArguments(unittest.TestCase):
+    def parse(self, argv):
+        parser = argparse.ArgumentParser()
+        video_query.add_arguments(parser)
+        return video_query.filters_from_arguments(parser.parse_args(argv))
+
+    def test_filters(self):
+        self.assertEqual({"channel_title": None}, self.parse([]))
+        self.assertEqual({"channel_title": "c1", "dates": ("01.09", None),
+                          "ranges": {"views": (10, None), "likes": (None, 5)}},
+                         self.parse(["--channel", "c1", "--from", "01.09", "--range", "views:10:",
+                                     "--range", "likes::5"]))
+
+    def test_errors(self):
+        for text in ("views:1", "title:1:2", "views:a:2"):
+            with self.assertRaises(argparse.ArgumentTypeError):
+                video_query.parse_range(text)
+        with self.assertRaises(argparse.ArgumentTypeError):
+            video_query.parse_date("2017-09-13")
+
+
+class TestLoad(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_index_table(self):
+        data = make_data(20)
+        for data_format, name in (("json", "data.json"), ("columnar", "store")):
+            path = os.path.join(self.dir, name)
+            data_store.write_data(data, path, data_format)
+            self.assertIn("table", data_store.load_index(path))
+            self.assertEqual(brute_force(data, category_id="10"), video_query.select_videos(path, category_id="10"))
+
+    def test_without_table(self):
+        # an index written before the table was added to it
+        data = make_data(20)
+        path = os.path.join(self.dir, "data.json")
+        data_store.write_data(data, path)
+        index_path = data_store.index_path(path)
+        with open(index_path) as f:
+            index = json.load(f)
+        del index["table"]
+        with open(index_path, "w") as f:
+            json.dump(index, f)
+
+        self.assertNotIn("table", data_store.load_index(path))
+        filters = {"channel_title": "c2", "ranges": {"views": (100, 800)}}
+        self.assertEqual(brute_force(data, **filters), video_query.select_videos(path, filters))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+"""
+video_trends.py
+
+A script that prints out how the statistics of the trending videos changed over time, using the time series written
+by extract.py.
+With -c, only the videos of a category are used. The filters of video_query.py select among the videos in the data
+(a video that only trended in earlier snapshots is left out when any of them is given).
+"""
+import argparse
+import time_series
+import video_query
+
+NUM_VIDEOS = 10
+
+
+def build_parser():
+    """
+    :return: argparse.ArgumentParser, for the command line flags of this script
+    """
+    parser = argparse.ArgumentParser(description="Video statistics over time")
+    parser.add_argument("-i", "--input", help="Specify the input file to use", required=True)
+    parser.add_argument("-c", "--cat", help="Only print the totals of this category id", required=False)
+    parser.add_argument("-f", "--field", help="Statistic to use", choices=time_series.FIELDS, default="views")
+    parser.add_argument("--start", help="First date (DD.MM), defaults to the first snapshot", required=False)
+    parser.add_argument("--end", help="Last date (DD.MM), defaults to the last snapshot", required=False)
+    video_query.add_arguments(parser)
+    return parser
+
+
+def main(args):
+    series = time_series.load_time_series(args.input)
+    if series is None:
+        print("No time series found for %s, run extract.py again" % args.input)
+        exit(1)
+    start = args.start if args.start is not None else series.dates[0]
+    end = args.end if args.end is not None else series.dates[-1]
+    for date in (start, end):
+        if date not in series.date_index:
+            print("No snapshot on %s, the snapshots go from %s to %s" % (date, series.dates[0], series.dates[-1]))
+            exit(1)
+
+    # the videos are only selected when there is a filter, so that the data is not needed otherwise
+    filters = {k: v for (k, v) in video_query.filters_from_arguments(args).items() if v is not None}
+    video_ids = video_query.select_videos(args.input, filters, category_id=args.cat) if filters else None
+
+    # Daily totals per category
+    totals = series.category_totals(args.field, video_ids)
+    for category_id in sorted(totals, key=int):
+        if args.cat is not None and category_id != args.cat:
+            continue
+        print("category %s, daily %s:" % (category_id, args.field))
+        for date, total in zip(series.dates, totals[category_id].tolist()):
+            print("  %s %d" % (date, total))
+
+    # Biggest growth between the two snapshots
+    growth = series.growth(args.field, start, end)
+    if args.cat is not None:
+        growth = {video_id: value for (video_id, value) in growth.items()
+                  if series.category_ids[series.video_index[video_id]] == args.cat}
+    if video_ids is not None:
+        selected = set(video_ids)
+        growth = {video_id: value for (video_id, value) in growth.items() if video_id in selected}
+    print("top %d videos by %s growth from %s to %s:" % (NUM_VIDEOS, args.field, start, end))
+    for video_id in sorted(growth, key=lambda v: growth[v], reverse=True)[:NUM_VIDEOS]:
+        print("  %s +%d" % (video_id, growth[video_id]))
+
+
+if __name__ == "__main__":
+    main(build_parser().parse_args())
@@ -3,6 +3,9 @@ wordcloud_by_category.py
 
 Generates a wordcloud for each category id.
 
+The token counts come from the term matrix of the input (see term_matrix.py) when there is one, instead of
+tokenizing the comments.
+
 Input file comes from the output of extract.py, which generates a .json file with data entries.
 Format of a data entry:
 {
@@ -25,9 +28,14 @@ Format of a data entry:
 """
 
 import argparse
-import json
 import os
+import data_store
+import metrics
+import render_cache
 import extract_helpers
+import term_matrix
+import token_counter
+import video_query
 import wordcloud_helper
 
 ###########
@@ -42,101 +50,120 @@ GB_CATEGORIES = "GB_category_id.json"
 ###########
 # HELPERS #
 ###########
-def wordcloud_for_specific_category_id(input_filename, output_dir, category_id):
+def wordcloud_for_specific_category_id(input_filename, output_dir, category_id, category_data, cache=None,
+                                       capacity=None, filters=None):
     """
     Generate a word cloud for the category_id.
 
     :param input_filename: string, the filename of the input data file
     :param output_dir: string, the name of the output dir
     :param category_id: string, category id
+    :param category_data: dictionary of {category id: category name}
+    :param cache: render_cache.RenderCache, or None
+    :param capacity: int, number of tokens kept to approximate the counts (see heavy_hitters.py), or None for exact
+                     counts
+    :param filters: dictionary of video filters, see video_query.py, or None
     """
     print("Starting: Generate a word cloud for category id (%s)" % category_id)
 
-    with open(input_filename, "r") as input_file:
-        all_data_entries = json.load(input_file)
-
-        # get all videos with specified category
-        relevant_data_entries = {k:v for (k,v) in all_data_entries.items() if v["category_id"] == category_id}
-
-        if len(relevant_data_entries) == 0:
-            print("There were no videos for this category, continuing")
-            return
+    # get all videos with specified category
+    video_ids = video_query.select_videos(input_filename, filters, category_id=category_id)
+    if len(video_ids) == 0:
+        print("There were no videos for this category, continuing")
+        return
 
+    # approximate counts are computed from the comments, in bounded memory
+    matrix = term_matrix.load_matrix(input_filename) if capacity is None else None
+    if matrix is not None:
+        word_counts = matrix.term_counts(matrix.video_rows(video_ids))
+    else:
         # prepare to generate a word cloud
-        word_counts = get_token_counts(relevant_data_entries)
-        counts_text = counts_to_text(word_counts)
-        output_filename = category_id + "-" + category_data[category_id]
+        relevant_data_entries = data_store.load_video_entries(input_filename, video_ids)
+        word_counts = token_counter.count_comment_tokens(relevant_data_entries, capacity=capacity)
+        word_counts = token_counter.counts_to_render(word_counts, "category id (%s)" % category_id)
+    output_filename = category_id + "-" + category_data[category_id]
 
-        # generate the word cloud
-        wordcloud_helper.generate_wordcloud(counts_text, output_filename, output_dir)
+    # generate the word cloud
+    wordcloud_helper.generate_wordcloud_from_counts(word_counts, output_filename, output_dir, cache=cache)
 
 
-def get_token_counts(data_entries):
+def wordclouds_for_all_category_ids(input_filename, output_dir, category_data, jobs=1, cache=None, capacity=None,
+                                    filters=None):
     """
-    Go through all the data entries in data. Each data entry represents a single video.
-    Count the occurrences of every token/word.
+    Generate a word cloud for every category id.
+    The input file is only loaded once, and the token counts of every category are computed in a single scan over
+    the data entries (or summed from the term matrix). The word clouds are then rendered in jobs processes.
+    Only the videos selected by the filters are used.
 
-    :param data_entries: dictionary of data entries
-    :return: dictionary of {token: count}
-    """
-    counts = {}
-    # Iterate over all data entries
-    for video_id in data_entries:
-        # Iterate over all the comments for this data entry
-        entry = data_entries[video_id]
-        for comment in entry["comments"]:
-            comment_text = comment["comment_text"]
-            comment_split = comment_text.split()
-            for word in comment_split:
-                if word in counts:
-                    counts[word] += 1
-                else:
-                    counts[word] = 1
-    return counts
-
-
-def counts_to_text(counts):
+    :param input_filename: string, the filename of the input data file
+    :param output_dir: string, the name of the output dir
+    :param category_data: dictionary of {category id: category name}
+    :param jobs: int, number of processes used to render the word clouds
+    :param cache: render_cache.RenderCache, or None
+    :param capacity: int, number of tokens kept for each category to approximate the counts (see heavy_hitters.py), or
+                     None for exact counts
+    :param filters: dictionary of video filters, see video_query.py, or None
     """
-    Given a dictionary of the format,
-    {
-        "token": count
-    }
-    return a space-separated string representing the dictionary's token counts.
-
-    Example:
-    {"hello": 2, "hey": 1, "apple": 2}
-    should result in,
-    "hello hello hey apple apple"
+    video_ids = video_query.select_videos(input_filename, filters)
+    matrix = term_matrix.load_matrix(input_filename) if capacity is None else None
+    if matrix is not None:
+        counts_by_category = matrix.counts_by("category_id", video_ids)
+    else:
+        all_data_entries = data_store.load_video_entries(input_filename, video_ids)
+        counts_by_category = token_counter.count_tokens_by_group(
+            ((entry["category_id"], (comment["comment_text"] for comment in entry["comments"]))
+             for entry in all_data_entries.values()), capacity=capacity)
+
+    render_jobs = []
+    for category_id in category_data:
+        print("Starting: Generate a word cloud for category id (%s)" % category_id)
+        if category_id not in counts_by_category:
+            print("There were no videos for this category, continuing")
+            continue
 
-    :param counts: dictionary of {token: count}
-    :return: string
-    """
-    str_list = []
-    for token in counts:
-        token_count = counts[token]
-        for i in range(token_count):
-            str_list.append(token)
-    return " ".join(str_list)
+        output_filename = category_id + "-" + category_data[category_id]
+        word_counts = token_counter.counts_to_render(counts_by_category[category_id], "category id (%s)" % category_id)
+        render_jobs.append((word_counts, output_filename, output_dir))
+    wordcloud_helper.generate_wordclouds_from_counts(render_jobs, jobs, cache=cache)
 
 
-if __name__ == "__main__":
-    # Command line parsing
+def build_parser():
+    """
+    :return: argparse.ArgumentParser, for the command line flags of this script
+    """
     parser = argparse.ArgumentParser(description="Preprocess CSV files")
     parser.add_argument("-i", "--input", help="Specify the input file to use", required=True)
     parser.add_argument("-o", "--output", help="Specify the output directory to use", required=True)
     parser.add_argument("-s", "--set", help="Specify the data set to use", required=True, choices=set(("US", "GB")))
     parser.add_argument("-c", "--cat", help="Category id to generate wordclouds for", required=False)
-    args = parser.parse_args()
+    parser.add_argument("-j", "--jobs", help="Number of processes used to render the wordclouds", type=int, default=1)
+    parser.add_argument("--approximate", help="Approximate the token counts of each wordcloud, keeping at most this "
+                        "many tokens in memory", type=int, metavar="TOKENS")
+    video_query.add_arguments(parser)
+    render_cache.add_arguments(parser)
+    metrics.add_arguments(parser)
+    return parser
+
+
+def main(args):
+    with metrics.run("wordcloud_by_category", args.metrics, args.profile, vars(args)):
+        # Preliminary parsing - get category id and names
+        category_filename = US_CATEGORIES if args.set == "US" else GB_CATEGORIES
+        with open(os.path.join(os.getcwd(), DATA_DIR, category_filename), "r") as category_file:
+            category_data = extract_helpers.extract_categories_data(category_file)
+
+        cache = render_cache.from_arguments(args)
+        filters = video_query.filters_from_arguments(args)
+
+        # If command line argument contains -c option, only generate a word cloud for that category id.
+        # If -c option not provided, generate a word cloud for every category id.
+        if args.cat is not None:
+            wordcloud_for_specific_category_id(args.input, args.output, args.cat, category_data, cache,
+                                               args.approximate, filters)
+        else:
+            wordclouds_for_all_category_ids(args.input, args.output, category_data, args.jobs, cache, args.approximate,
+                                            filters)
 
-    # Preliminary parsing - get category id and names
-    category_filename = US_CATEGORIES if args.set == "US" else GB_CATEGORIES
-    with open(os.path.join(os.getcwd(), DATA_DIR, category_filename), "r") as category_file:
-        category_data = extract_helpers.extract_categories_data(category_file)
 
-    # If command line argument contains -c option, only generate a word cloud for that category id.
-    # If -c option not provided, generate a word cloud for every category id.
-    if args.cat is not None:
-        wordcloud_for_specific_category_id(args.input, args.output, args.cat)
-    else:
-        for cat_id in category_data:
-            wordcloud_for_specific_category_id(args.input, args.output, cat_id)
+if __name__ == "__main__":
+    main(build_parser().parse_args())
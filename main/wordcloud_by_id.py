@@ -2,56 +2,78 @@
 wordcloud_by_id.py
 
 A wordcloud is generated for all of the comments for a specfic video id.
+Several video ids can be given, their wordclouds are then rendered in parallel (-j).
+The token counts come from the term matrix of the input (see term_matrix.py) when there is one.
 """
 
 import argparse
-import json
+import data_store
+import metrics
+import render_cache
+import term_matrix
+import token_counter
+import video_query
 import wordcloud_helper
 
 
-if __name__ == "__main__":
-    # Command line parsing
+def build_parser():
+    """
+    :return: argparse.ArgumentParser, for the command line flags of this script
+    """
     parser = argparse.ArgumentParser(description="Preprocess CSV files")
     parser.add_argument("-i", "--input", help="Specify the input file to use", required=True)
     parser.add_argument("-o", "--output", help="Specify the output directory to use", required=True)
-    parser.add_argument("-v", "--videoId", help="The video id to use", required=True)
-    args = parser.parse_args()
-
-    with open(args.input, "r") as data_file:
-        data_entries = json.load(data_file)
-        data_entry = {k: v for (k, v) in data_entries.items() if k == args.videoId}
-
-        if len(data_entry) == 0:
-            print("Video id (%s) not found. Nothing happened." % args.videoId)
-            exit(0)
-
-        entry = data_entry[args.videoId]
-
-        # count all the words for all the comments of this video
-        counts = {}
-        for comment in entry["comments"]:
-            comment_text = comment["comment_text"]
-            tokens = comment_text.split()
-            for token in tokens:
-                if token in counts:
-                    counts[token] += 1
-                else:
-                    counts[token] = 1
-
-        # construct a string out of the counts
-        str_list = []
-        for token in counts:
-            for i in range(counts[token]):
-                str_list.append(token)
-
-        wordcloud_text = " ".join(str_list)
-        wordcloud_helper.generate_wordcloud(wordcloud_text, args.videoId, args.output)
+    parser.add_argument("-v", "--videoId", help="The video id to use, can be given several times", required=True,
+                        nargs="+", action="extend")
+    parser.add_argument("-j", "--jobs", help="Number of processes used to render the wordclouds", type=int, default=1)
+    parser.add_argument("--approximate", help="Approximate the token counts of each wordcloud, keeping at most this "
+                        "many tokens in memory", type=int, metavar="TOKENS")
+    video_query.add_arguments(parser)
+    render_cache.add_arguments(parser)
+    metrics.add_arguments(parser)
+    return parser
+
+
+def main(args):
+    with metrics.run("wordcloud_by_id", args.metrics, args.profile, vars(args)):
+        video_ids = list(dict.fromkeys(args.videoId))
+        video_index = video_query.load_video_index(args.input)
+        selected = set(video_index.select(video_ids=video_ids, **video_query.filters_from_arguments(args)))
+        for video_id in video_ids:
+            if video_id not in video_index:
+                print("Video id (%s) not found. Nothing happened." % video_id)
+            elif video_id not in selected:
+                print("Video id (%s) does not match the filters. Nothing happened." % video_id)
+        # only the entries of these videos are read, thanks to the index written by extract.py
+        entries = data_store.load_video_entries(args.input,
+                                                [video_id for video_id in video_ids if video_id in selected])
+
+        # count all the words for all the comments of each video, and render all of the wordclouds at once
+        matrix = term_matrix.load_matrix(args.input) if args.approximate is None else None
+        if matrix is not None:
+            counts_by_video = matrix.counts_of_videos(list(entries))
+        render_jobs = []
+        for video_id, entry in entries.items():
+            if matrix is not None:
+                word_counts = counts_by_video[video_id]
+            else:
+                word_counts = token_counter.count_tokens((comment["comment_text"] for comment in entry["comments"]),
+                                                         capacity=args.approximate)
+                word_counts = token_counter.counts_to_render(word_counts, "video id (%s)" % video_id)
+            render_jobs.append((word_counts, video_id, args.output))
+        wordcloud_helper.generate_wordclouds_from_counts(render_jobs, args.jobs,
+                                                         cache=render_cache.from_arguments(args))
 
         # some print output
-        print("Generated a wordcloud for video id (%s) at (%s/%s)" % (args.videoId, args.output, args.videoId))
-        print("video id: %s, video title: %s, channel title: %s, views: %s, likes: %s, "
-              "dislikes: %s, category_id: %s, "
-              "category name: %s" % (args.videoId, entry["title"], entry["channel_title"], entry["views"],
-                                     entry["likes"], entry["dislikes"], entry["category_id"],
-                                     entry["category_name"]))
+        for video_id, entry in entries.items():
+            print("Generated a wordcloud for video id (%s) at (%s/%s)" % (video_id, args.output, video_id))
+            print("video id: %s, video title: %s, channel title: %s, views: %s, likes: %s, "
+                  "dislikes: %s, category_id: %s, "
+                  "category name: %s" % (video_id, entry["title"], entry["channel_title"], entry["views"],
+                                         entry["likes"], entry["dislikes"], entry["category_id"],
+                                         entry["category_name"]))
+
+
+if __name__ == "__main__":
+    main(build_parser().parse_args())
 
@@ -3,9 +3,33 @@ wordcloud_helper.py
 
 Main functionality to generate a wordcloud.
 (uses the library from amueller, https://github.com/amueller/word_cloud)
+
+Importing wordcloud pulls in matplotlib and PIL, which takes longer than most scripts take to run, so it is only
+imported when a wordcloud is actually rendered. The stopwords are read from the list shipped with wordcloud, without
+importing it.
+
+Many wordclouds can be rendered at once, in a pool of processes (generate_wordclouds_from_counts). Each worker
+imports wordcloud, and builds the stopwords and a WordCloud class that caches its fonts once (init_renderer). Renders
+can also be kept between runs, see render_cache.py.
 """
-from wordcloud import WordCloud, STOPWORDS
+from operator import itemgetter
+import heapq
+import importlib.util
 import os
+import types
+from multiprocessing import Pool
+
+import metrics
+
+# maximum number of words shown in a wordcloud
+MAX_WORDS = 150
+# the parameters of the wordclouds rendered from counts, besides max_words
+RENDER_PARAMETERS = {"background_color": "white", "width": 700, "height": 500}
+
+# the stopwords, once construct_stopwords() has been called
+stopwords_set = None
+# the WordCloud class used to render, once init_renderer() has been called
+word_cloud_class = None
 
 
 def construct_stopwords():
@@ -25,21 +49,193 @@ def construct_stopwords():
         "nugga"
     ]
 
-    new_stopwords = STOPWORDS
-    for word in extra_words_to_exclude:
-        STOPWORDS.add(word)
-    return new_stopwords
+    global stopwords_set
+    if stopwords_set is None:
+        new_stopwords = load_wordcloud_stopwords()
+        for word in extra_words_to_exclude:
+            new_stopwords.add(word)
+        stopwords_set = new_stopwords
+    return stopwords_set
 
 
-def generate_wordcloud(text, name, output_dir):
+def load_wordcloud_stopwords():
     """
-    Generate a word cloud, given text.
+    The STOPWORDS of wordcloud are read from a file in the wordcloud package. Read that file directly, so that
+    wordcloud does not have to be imported.
 
-    :param text: str, tokens have to be space-separated
+    :return: set of strings
+    """
+    spec = importlib.util.find_spec("wordcloud")
+    try:
+        with open(os.path.join(os.path.dirname(spec.origin), "stopwords")) as stopwords_file:
+            return set(line.strip() for line in stopwords_file if line.strip())
+    except (AttributeError, TypeError, OSError):
+        # not where it is expected, import it after all
+        from wordcloud import STOPWORDS
+        return set(STOPWORDS)
+
+
+@metrics.stage("wordcloud")
+def generate_wordcloud_from_counts(counts, name, output_dir, max_words=MAX_WORDS, cache=None):
+    """
+    Generate a word cloud, given a table of token counts.
+    The counts never get expanded back into text, so memory use depends on the size of the vocabulary rather than on
+    the size of the corpus.
+
+    :param counts: dictionary of {token: count}
     :param name: str, filename to output
     :param output_dir: str, output directory name
+    :param max_words: int, maximum number of words to show
+    :param cache: render_cache.RenderCache, or None
+    """
+    generate_wordclouds_from_counts([(counts, name, output_dir)], 1, max_words, cache)
+
+
+@metrics.stage("wordcloud")
+def generate_wordclouds_from_counts(jobs, processes=1, max_words=MAX_WORDS, cache=None):
+    """
+    Generate many word clouds, see generate_wordcloud_from_counts(). Rendering is CPU bound, so the word clouds are
+    rendered in a pool of processes. The counts are pruned to max_words tokens before they are handed to the
+    workers, so that only small tables have to be sent over.
+    With a cache, the word clouds whose pruned counts were already rendered are taken from the cache instead, and
+    only the others are rendered (and added to the cache).
+
+    :param jobs: list of tuples of (counts, name, output_dir), see generate_wordcloud_from_counts()
+    :param processes: int, number of worker processes, 1 to render in this process
+    :param max_words: int, maximum number of words to show
+    :param cache: render_cache.RenderCache, or None
+    :return: list of strings, the filenames of the word clouds, in the same order as jobs
+    """
+    filenames = []
+    render_jobs = []
+    for (counts, name, output_dir) in jobs:
+        frequencies = prune_counts(counts, max_words)
+        filename = os.path.join(output_dir, name) + ".png"
+        filenames.append(filename)
+        key = None
+        if cache is not None:
+            key = cache.key(frequencies, render_parameters(max_words))
+            if cache.get(key, filename):
+                continue
+        render_jobs.append((frequencies, filename, max_words, cache, key))
+
+    if processes <= 1 or len(render_jobs) <= 1:
+        for job in render_jobs:
+            render_job(job)
+    else:
+        with Pool(min(processes, len(render_jobs)), initializer=init_renderer) as pool:
+            # one job at a time, a word cloud takes long enough
+            pool.map(render_job, render_jobs, chunksize=1)
+    metrics.count("clouds_rendered", len(render_jobs))
+    if cache is not None:
+        metrics.count("clouds_cached", len(jobs) - len(render_jobs))
+        cache.evict()
+    return filenames
+
+
+class CachedFonts(object):
+    """
+    Stands in for PIL.ImageFont in the methods of WordCloud that load fonts (see font_caching_word_cloud()). WordCloud
+    loads its font again for every size it tries, for every word of every cloud; here a font is only loaded once per
+    size.
+    """
+    def __init__(self, image_font):
+        self.image_font = image_font
+        self.fonts = {}
+
+    def truetype(self, font_path, size):
+        key = (font_path, size)
+        if key not in self.fonts:
+            self.fonts[key] = self.image_font.truetype(font_path, size)
+        return self.fonts[key]
+
+    def __getattr__(self, name):
+        return getattr(self.image_font, name)
+
+
+def font_caching_word_cloud():
+    """
+    Build a subclass of WordCloud that caches its fonts, without changing the wordcloud module.
+    The methods of WordCloud that load fonts look PIL.ImageFont up in the globals of their module, which is an
+    implementation detail of wordcloud (checked with 1.9). The subclass gets copies of these methods that look it up
+    in a copy of those globals instead, where it is a CachedFonts. A method that does not look ImageFont up (in another
+    version of wordcloud) is left as it is, the fonts are then simply not cached.
+
+    :return: class
+    """
+    from wordcloud import wordcloud as wordcloud_module
+    namespace = dict(vars(wordcloud_module), ImageFont=CachedFonts(wordcloud_module.ImageFont))
+    methods = {}
+    for name in ("generate_from_frequencies", "to_image"):
+        method = getattr(wordcloud_module.WordCloud, name)
+        code = getattr(method, "__code__", None)
+        if code is not None and "ImageFont" in code.co_names:
+            methods[name] = types.FunctionType(code, namespace, method.__name__, method.__defaults__,
+                                               method.__closure__)
+            methods[name].__kwdefaults__ = method.__kwdefaults__
+    return type("FontCachingWordCloud", (wordcloud_module.WordCloud,), methods)
+
+
+def init_renderer():
+    """
+    Prepare this process for rendering word clouds: import wordcloud, build a WordCloud class that caches its fonts
+    and build the stopwords.
+    Called once in every worker process of generate_wordclouds_from_counts(), and before every render in this
+    process (it only does something the first time).
+    """
+    global word_cloud_class
+    if word_cloud_class is None:
+        word_cloud_class = font_caching_word_cloud()
+    construct_stopwords()
+
+
+def render_parameters(max_words=MAX_WORDS):
+    """
+    :param max_words: int, maximum number of words to show
+    :return: dictionary of the WordCloud parameters used by render_frequencies()
+    """
+    parameters = dict(RENDER_PARAMETERS)
+    parameters["max_words"] = max_words
+    return parameters
+
+
+def render_frequencies(frequencies, filename, max_words=MAX_WORDS, cache=None, key=None):
+    """
+    :param frequencies: dictionary of {token: count}, already pruned
+    :param filename: str, the .png file to write
+    :param max_words: int, maximum number of words to show
+    :param cache: render_cache.RenderCache to store the word cloud in, or None
+    :param key: string, the cache key of the word cloud
+    """
+    init_renderer()
+    wc = word_cloud_class(**render_parameters(max_words))
+    wc.generate_from_frequencies(frequencies)
+    # the file may be a link to a cached word cloud, which must not be written over
+    if os.path.exists(filename):
+        os.remove(filename)
+    wc.to_file(filename)
+    if cache is not None:
+        cache.put(key, filename)
+
+
+def render_job(job):
+    """
+    :param job: tuple of (frequencies, filename, max_words, cache, key), see render_frequencies()
+    """
+    render_frequencies(*job)
+
+
+def prune_counts(counts, max_words, stopwords=None):
+    """
+    Remove the stopwords from a table of token counts (case insensitively, the same way WordCloud does it for text),
+    and keep only the max_words most frequent tokens.
+
+    :param counts: dictionary of {token: count}
+    :param max_words: int, number of tokens to keep
+    :param stopwords: set of strings, defaults to construct_stopwords()
+    :return: dictionary of {token: count}
     """
-    wc = WordCloud(background_color="white", width=700, height=500, collocations=False, max_words=150,
-                   stopwords=construct_stopwords())
-    wc.generate(text)
-    wc.to_file(os.path.join(output_dir, name) + ".png")
+    if stopwords is None:
+        stopwords = construct_stopwords()
+    kept = ((token, count) for (token, count) in counts.items() if token.lower() not in stopwords)
+    return dict(heapq.nlargest(max_words, kept, key=itemgetter(1)))
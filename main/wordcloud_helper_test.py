@@ -0,0 +1,55 @@
+import os
+import shutil
+import tempfile
+import unittest
+import wordcloud_helper
+
+
+class TestPruneCounts(unittest.TestCase):
+    def test_removes_stopwords(self):
+        counts = {"the": 10, "The": 3, "love": 2, "song": 1}
+        expected = {"love": 2, "song": 1}
+        actual = wordcloud_helper.prune_counts(counts, 10)
+        self.assertEqual(expected, actual)
+
+    def test_keeps_most_frequent(self):
+        counts = {"a1": 1, "b2": 5, "c3": 3, "d4": 4}
+        expected = {"b2": 5, "d4": 4}
+        actual = wordcloud_helper.prune_counts(counts, 2, stopwords=set())
+        self.assertEqual(expected, actual)
+
+
+class TestBatchRender(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_render_in_processes(self):
+        jobs = [({"love": 5, "song": 3, "name%d" % i: 2}, "cloud%d" % i, self.dir) for i in range(3)]
+        filenames = wordcloud_helper.generate_wordclouds_from_counts(jobs, processes=2)
+        self.assertEqual([os.path.join(self.dir, "cloud%d.png" % i) for i in range(3)], filenames)
+        for filename in filenames:
+            self.assertGreater(os.path.getsize(filename), 0)
+
+    def test_fonts_loaded_once(self):
+        from wordcloud import wordcloud as wordcloud_module
+        image_font = wordcloud_module.ImageFont
+        wordcloud_helper.init_renderer()
+        word_cloud_class = wordcloud_helper.word_cloud_class
+        fonts = word_cloud_class.generate_from_frequencies.__globals__["ImageFont"]
+        self.assertIsInstance(fonts, wordcloud_helper.CachedFonts)
+        self.assertIs(fonts, word_cloud_class.to_image.__globals__["ImageFont"])
+        self.assertIs(fonts.truetype(wordcloud_module.FONT_PATH, 20), fonts.truetype(wordcloud_module.FONT_PATH, 20))
+        # the wordcloud module itself is left alone
+        self.assertIs(image_font, wordcloud_module.ImageFont)
+        self.assertIsNot(fonts, wordcloud_module.WordCloud.generate_from_frequencies.__globals__["ImageFont"])
+
+        # built once only
+        wordcloud_helper.init_renderer()
+        self.assertIs(word_cloud_class, wordcloud_helper.word_cloud_class)
+
+
+if __name__ == '__main__':
+    unittest.main()